@@ -0,0 +1,650 @@
+(function () {
+  function esc(s) {
+    return String(s || "")
+      .replace(/&/g, "&amp;")
+      .replace(/</g, "&lt;")
+      .replace(/>/g, "&gt;")
+      .replace(/\"/g, "&quot;")
+      .replace(/'/g, "&#039;");
+  }
+
+  function stripOrderPrefix(text) {
+    const s = String(text || "").trim();
+    return s.replace(/^\s*\d+\s*[-_. )]+\s*/i, "").trim() || s;
+  }
+
+  function menuTitleFor(slug, title) {
+    return String(slug || "").toLowerCase() === "readme" ? "Home" : stripOrderPrefix(title || slug);
+  }
+
+  const BOOKMARKS_KEY = "pinballctl.docs.bookmarks.v1";
+  const EXPANDED_KEY = "pinballctl.docs.expanded.v1";
+  const SEARCH_DEBOUNCE_MS = 120;
+  const SEARCH_RENDER_BATCH = 20;
+
+  const state = {
+    tree: [],
+    pagesBySlug: new Map(),
+    activeSlug: "",
+    bookmarks: [],
+    expanded: new Set(),
+    searchTerm: "",
+    lastResults: [],
+    lastTrackedSearchTerm: "",
+    searchIndexUrl: "",
+    searchCoreUrl: "",
+    searchWorkerUrl: "",
+  };
+
+  const search = {
+    // Worker once started; false when workers are unavailable and search runs here instead.
+    worker: null,
+    // Id of the newest query; results carrying any other id are dropped.
+    seq: 0,
+    query: "",
+    pending: [],
+    frame: 0,
+    index: null,
+    indexLoading: null,
+  };
+
+  function trackEvent(eventName, params) {
+    try {
+      if (typeof window.gtag === "function") {
+        window.gtag("event", eventName, params || {});
+        return;
+      }
+      if (Array.isArray(window.dataLayer)) {
+        window.dataLayer.push(Object.assign({ event: eventName }, params || {}));
+      }
+    } catch (_) {}
+  }
+
+  function getSearchInputs() {
+    return Array.from(document.querySelectorAll("[data-docs-search]"));
+  }
+
+  function getSearchStatuses() {
+    return Array.from(document.querySelectorAll("[data-docs-search-status]"));
+  }
+
+  function wireHeaderMenu() {
+    const menuBtn = document.querySelector(".menu-toggle");
+    const nav = document.querySelector(".site-nav");
+    if (!(menuBtn instanceof HTMLElement) || !(nav instanceof HTMLElement)) return;
+
+    function setOpen(open) {
+      nav.classList.toggle("open", open);
+      document.body.classList.toggle("menu-open", open);
+      menuBtn.setAttribute("aria-expanded", open ? "true" : "false");
+    }
+
+    menuBtn.addEventListener("click", () => {
+      setOpen(!nav.classList.contains("open"));
+    });
+
+    document.addEventListener("click", (e) => {
+      const t = e.target;
+      if (!(t instanceof Element)) return;
+      if (!nav.classList.contains("open")) return;
+      if (t.closest(".site-nav") || t.closest(".menu-toggle")) return;
+      setOpen(false);
+    });
+
+    window.addEventListener("resize", () => {
+      if (window.innerWidth > 920) setOpen(false);
+    });
+  }
+
+  function wireDocsSidebarMenu() {
+    const toggleBtn = document.getElementById("docs-sidebar-toggle");
+    const sidebar = document.getElementById("docs-sidebar");
+    const closeBtn = document.getElementById("docs-sidebar-close");
+    if (!(toggleBtn instanceof HTMLElement) || !(sidebar instanceof HTMLElement)) return;
+
+    function setOpen(open) {
+      sidebar.classList.toggle("open", open);
+      toggleBtn.setAttribute("aria-expanded", open ? "true" : "false");
+      document.body.classList.toggle("docs-sidebar-open", open && window.innerWidth <= 1080);
+    }
+
+    toggleBtn.addEventListener("click", () => {
+      setOpen(!sidebar.classList.contains("open"));
+    });
+
+    closeBtn?.addEventListener("click", () => setOpen(false));
+
+    document.addEventListener("click", (e) => {
+      const t = e.target;
+      if (!(t instanceof Element)) return;
+      if (!sidebar.classList.contains("open")) return;
+      if (window.innerWidth > 1080) return;
+      if (t.closest("#docs-sidebar") || t.closest("#docs-sidebar-toggle")) return;
+      setOpen(false);
+    });
+
+    document.addEventListener("click", (e) => {
+      const t = e.target;
+      if (!(t instanceof Element)) return;
+      if (!t.closest("[data-doc-slug]")) return;
+      if (window.innerWidth <= 1080) setOpen(false);
+    });
+
+    document.addEventListener("keydown", (e) => {
+      if (e.key === "Escape" && window.innerWidth <= 1080) setOpen(false);
+    });
+
+    window.addEventListener("resize", () => {
+      if (window.innerWidth > 1080) setOpen(false);
+    });
+  }
+
+  function hashSlug() {
+    const m = (window.location.hash || "").match(/doc=([^&]+)/);
+    return m ? decodeURIComponent(m[1]) : "";
+  }
+
+  function setHashSlug(slug) {
+    const clean = encodeURIComponent(slug);
+    if (window.location.hash !== `#doc=${clean}`) {
+      window.location.hash = `doc=${clean}`;
+    }
+  }
+
+  function loadState() {
+    try {
+      const b = JSON.parse(localStorage.getItem(BOOKMARKS_KEY) || "[]");
+      state.bookmarks = Array.isArray(b) ? b.filter((x) => x && x.slug) : [];
+    } catch (_) {
+      state.bookmarks = [];
+    }
+    try {
+      const e = JSON.parse(localStorage.getItem(EXPANDED_KEY) || "[]");
+      state.expanded = new Set(Array.isArray(e) ? e : []);
+    } catch (_) {
+      state.expanded = new Set();
+    }
+  }
+
+  function persistBookmarks() {
+    try {
+      localStorage.setItem(BOOKMARKS_KEY, JSON.stringify(state.bookmarks));
+    } catch (_) {}
+  }
+
+  function persistExpanded() {
+    try {
+      localStorage.setItem(EXPANDED_KEY, JSON.stringify(Array.from(state.expanded)));
+    } catch (_) {}
+  }
+
+  function isBookmarked(slug) {
+    return state.bookmarks.some((b) => b.slug === slug);
+  }
+
+  function renderBookmarks() {
+    const wrap = document.getElementById("docs-bookmarks-wrap");
+    const el = document.getElementById("docs-bookmarks");
+    if (!wrap || !el) return;
+
+    if (!state.bookmarks.length) {
+      wrap.classList.add("hidden");
+      el.innerHTML = "";
+      return;
+    }
+    wrap.classList.remove("hidden");
+    el.innerHTML = state.bookmarks.map((b) => `
+      <div class="docs-bookmark-item">
+        <a href="#doc=${encodeURIComponent(b.slug)}" data-doc-slug="${esc(b.slug)}" class="docs-page-link${state.activeSlug === b.slug ? " active" : ""}">${esc(menuTitleFor(b.slug, b.title || b.slug))}</a>
+        <button type="button" class="docs-bookmark-remove" data-bookmark-remove="${esc(b.slug)}" aria-label="Remove bookmark">x</button>
+      </div>
+    `).join("");
+  }
+
+  function refreshBookmarkToggle() {
+    const btn = document.getElementById("docs-bookmark-toggle");
+    if (!btn) return;
+    const active = !!state.activeSlug && isBookmarked(state.activeSlug);
+    btn.classList.toggle("active", active);
+    btn.setAttribute("aria-pressed", active ? "true" : "false");
+    btn.setAttribute("aria-label", active ? "Remove bookmark" : "Bookmark current page");
+    btn.setAttribute("title", active ? "Remove bookmark" : "Bookmark current page");
+  }
+
+  function renderTreeNodes(nodes) {
+    if (!Array.isArray(nodes) || !nodes.length) return "";
+    return `<ul>${nodes.map((n) => {
+      if (n.type === "folder") {
+        const path = String(n.path || "");
+        const open = state.expanded.has(path);
+        return `<li class="docs-folder ${open ? "is-open" : ""}">
+          <button type="button" class="docs-folder-toggle" data-folder-path="${esc(path)}" aria-expanded="${open ? "true" : "false"}">
+            <span class="chev">${open ? "▾" : "▸"}</span>${esc(stripOrderPrefix(n.name || path))}
+          </button>
+          <div class="docs-folder-children ${open ? "" : "hidden"}">${renderTreeNodes(n.children || [])}</div>
+        </li>`;
+      }
+      return `<li><a href="#doc=${encodeURIComponent(n.slug)}" data-doc-slug="${esc(n.slug)}" class="docs-page-link${state.activeSlug === n.slug ? " active" : ""}">${esc(menuTitleFor(n.slug, n.title || n.slug))}</a></li>`;
+    }).join("")}</ul>`;
+  }
+
+  function renderTree() {
+    const el = document.getElementById("docs-tree");
+    if (!el) return;
+    el.innerHTML = renderTreeNodes(state.tree);
+  }
+
+  function attachImageModal(articleEl) {
+    const modal = document.getElementById("img-modal");
+    const modalImg = modal?.querySelector(".img-modal__img");
+    const closeBtn = modal?.querySelector(".img-modal__close");
+    if (!modal || !modalImg) return;
+
+    function close() {
+      modal.classList.remove("open");
+      modal.setAttribute("aria-hidden", "true");
+      modalImg.src = "";
+    }
+
+    closeBtn?.addEventListener("click", close);
+    modal.addEventListener("click", (e) => {
+      const t = e.target;
+      if (!(t instanceof Element)) return;
+      if (t === modal || t.classList.contains("img-modal__backdrop")) close();
+    });
+
+    articleEl.querySelectorAll("img").forEach((img) => {
+      const src = img.getAttribute("src") || "";
+      if (!src) return;
+      img.classList.add("shot-click");
+      img.addEventListener("click", () => {
+        modalImg.src = src;
+        modal.classList.add("open");
+        modal.setAttribute("aria-hidden", "false");
+      });
+    });
+  }
+
+  function loadPageContent(page) {
+    // Sharded builds ship page html/plain separately; fetch once and keep it on the page.
+    if (typeof page.html === "string" || !page.shard) return Promise.resolve(page);
+    if (!page.loading) {
+      page.loading = fetch(page.shard)
+        .then((res) => {
+          if (!res.ok) throw new Error(`HTTP ${res.status}`);
+          return res.json();
+        })
+        .then((shard) => {
+          page.html = String(shard.html || "");
+          page.plain = String(shard.plain || "");
+          return page;
+        })
+        .catch((err) => {
+          page.loading = null;
+          throw err;
+        });
+    }
+    return page.loading;
+  }
+
+  async function renderArticle(slug) {
+    const article = document.getElementById("docs-article");
+    if (!article) return;
+    const page = state.pagesBySlug.get(slug);
+    if (!page) return;
+
+    state.activeSlug = slug;
+    if (typeof page.html !== "string" && page.shard) {
+      article.innerHTML = `<h1>${esc(page.title || slug)}</h1><p class="docs-loading">Loading...</p>`;
+      try {
+        await loadPageContent(page);
+      } catch (_) {
+        if (state.activeSlug === slug) {
+          article.innerHTML = `<h1>${esc(page.title || slug)}</h1><p>Could not load this page. Check your connection and try again.</p>`;
+        }
+        return;
+      }
+      // Another page may have been opened while this one was loading.
+      if (state.activeSlug !== slug) return;
+    }
+    article.innerHTML = page.html || `<h1>${esc(page.title || slug)}</h1><p>No content.</p>`;
+    attachImageModal(article);
+
+    article.querySelectorAll('a[href^="#doc="]').forEach((a) => {
+      a.addEventListener("click", (e) => {
+        e.preventDefault();
+        const h = a.getAttribute("href") || "";
+        const s = (h.split("#doc=")[1] || "").trim();
+        if (s) setHashSlug(decodeURIComponent(s));
+      });
+    });
+
+    renderTree();
+    renderBookmarks();
+    refreshBookmarkToggle();
+    window.scrollTo({ top: 0, behavior: "auto" });
+  }
+
+  function searchPages() {
+    return Array.from(state.pagesBySlug.values(), (p) => ({
+      slug: p.slug,
+      title: p.title,
+      excerpt: p.excerpt,
+      plain: typeof p.plain === "string" ? p.plain : "",
+    }));
+  }
+
+  function substringSearch(pages, query) {
+    // index.html built before search-core.js existed doesn't load it: match substrings.
+    const q = query.trim().toLowerCase();
+    return pages
+      .map((p) => {
+        const title = String(p.title || "").toLowerCase();
+        let score = 0;
+        if (title.includes(q)) score += 100;
+        if (p.plain.toLowerCase().includes(q)) score += 30;
+        if (String(p.excerpt || "").toLowerCase().includes(q)) score += 20;
+        return { slug: p.slug, title, score };
+      })
+      .filter((x) => x.score > 0)
+      .sort((a, b) => b.score - a.score || a.title.localeCompare(b.title))
+      .slice(0, 120)
+      .map((x) => x.slug);
+  }
+
+  function startSearchWorker() {
+    if (search.worker !== null) return search.worker;
+    search.worker = false;
+    if (typeof Worker !== "function" || !state.searchWorkerUrl || !state.searchCoreUrl) return false;
+    try {
+      const worker = new Worker(state.searchWorkerUrl);
+      worker.addEventListener("message", (e) => queueSearchResults(e.data || {}));
+      worker.addEventListener("error", () => {
+        // Blocked or broken worker: search on the main thread from now on.
+        worker.terminate();
+        search.worker = false;
+        runSearch();
+      });
+      worker.postMessage({
+        type: "init",
+        core: new URL(state.searchCoreUrl, window.location.href).href,
+        index: state.searchIndexUrl ? new URL(state.searchIndexUrl, window.location.href).href : "",
+        pages: searchPages(),
+      });
+      search.worker = worker;
+    } catch (_) {
+      // Workers cannot be started from file:// pages in most browsers.
+    }
+    return search.worker;
+  }
+
+  function loadSearchIndex() {
+    if (search.index || !state.searchIndexUrl) return Promise.resolve(search.index);
+    if (!search.indexLoading) {
+      search.indexLoading = fetch(state.searchIndexUrl)
+        .then((res) => {
+          if (!res.ok) throw new Error(`HTTP ${res.status}`);
+          return res.json();
+        })
+        .then((data) => {
+          search.index = window.DocsSearch.prepareIndex(data);
+          return search.index;
+        })
+        .catch(() => {
+          // Opened from disk or index missing: fall back to scanning page text.
+          return null;
+        });
+    }
+    return search.indexLoading;
+  }
+
+  function cancelSearch() {
+    search.seq += 1;
+    search.pending = [];
+  }
+
+  function queueSearchResults(msg) {
+    if (msg.type !== "results" || msg.id !== search.seq) return;
+    search.pending.push(msg);
+    if (!search.frame) search.frame = window.requestAnimationFrame(flushSearchResults);
+  }
+
+  function flushSearchResults() {
+    // One batch per frame keeps typing responsive while long result lists fill in.
+    search.frame = 0;
+    const msg = search.pending.shift();
+    if (msg && msg.id === search.seq) {
+      const pages = msg.slugs.map((slug) => state.pagesBySlug.get(slug)).filter(Boolean);
+      if (msg.offset === 0) state.lastResults = [];
+      state.lastResults.push(...pages);
+      renderSearchResults(pages, msg.offset > 0, msg.total);
+      if (msg.done && search.query !== state.lastTrackedSearchTerm) {
+        trackEvent("search", {
+          search_term: search.query,
+          results_count: msg.total,
+          search_provider: "pinballctl_docs_inline",
+        });
+        state.lastTrackedSearchTerm = search.query;
+      }
+    }
+    if (search.pending.length) search.frame = window.requestAnimationFrame(flushSearchResults);
+  }
+
+  function searchResultHtml(p) {
+    return `
+      <a href="#doc=${encodeURIComponent(p.slug)}" data-doc-slug="${esc(p.slug)}" class="docs-search-result docs-page-link${state.activeSlug === p.slug ? " active" : ""}">
+        <div class="docs-search-result-title">${esc(stripOrderPrefix(p.title || p.slug))}</div>
+        <div class="docs-result-excerpt">${esc(p.excerpt || "")}</div>
+      </a>
+    `;
+  }
+
+  function renderSearchResults(results, append, total) {
+    const tree = document.getElementById("docs-tree");
+    const resultsEl = document.getElementById("docs-search-results");
+    const statusEls = getSearchStatuses();
+    if (!tree || !resultsEl) return;
+
+    if (!state.searchTerm || state.searchTerm.length < 2) {
+      tree.classList.remove("hidden");
+      resultsEl.classList.add("hidden");
+      resultsEl.innerHTML = "";
+      statusEls.forEach((el) => {
+        el.textContent = "";
+      });
+      return;
+    }
+
+    tree.classList.add("hidden");
+    resultsEl.classList.remove("hidden");
+    const count = typeof total === "number" ? total : results.length;
+    const statusText = `${count} result${count === 1 ? "" : "s"}`;
+    statusEls.forEach((el) => {
+      el.textContent = statusText;
+    });
+
+    const html = results.map(searchResultHtml).join("");
+    if (append) resultsEl.insertAdjacentHTML("beforeend", html);
+    else resultsEl.innerHTML = html;
+  }
+
+  async function runSearch() {
+    const query = state.searchTerm;
+    cancelSearch();
+    const id = search.seq;
+    if (!query || query.length < 2) {
+      state.lastResults = [];
+      state.lastTrackedSearchTerm = "";
+      renderSearchResults([]);
+      return;
+    }
+    search.query = query;
+    const worker = startSearchWorker();
+    if (worker) {
+      worker.postMessage({ type: "query", id, query });
+      return;
+    }
+    const core = window.DocsSearch;
+    const index = core ? await loadSearchIndex() : null;
+    // A newer keystroke replaced this query while the index was loading.
+    if (id !== search.seq) return;
+    const slugs = core ? core.search(index, searchPages(), query) : substringSearch(searchPages(), query);
+    let offset = 0;
+    do {
+      const end = Math.min(offset + SEARCH_RENDER_BATCH, slugs.length);
+      queueSearchResults({
+        type: "results",
+        id,
+        slugs: slugs.slice(offset, end),
+        offset,
+        total: slugs.length,
+        done: end >= slugs.length,
+      });
+      offset = end;
+    } while (offset < slugs.length);
+  }
+
+  function wireEvents(defaultSlug) {
+    document.addEventListener("click", (e) => {
+      const target = e.target;
+      if (!(target instanceof Element)) return;
+
+      const remove = target.closest("[data-bookmark-remove]");
+      if (remove) {
+        e.preventDefault();
+        const slug = remove.getAttribute("data-bookmark-remove") || "";
+        state.bookmarks = state.bookmarks.filter((b) => b.slug !== slug);
+        persistBookmarks();
+        renderBookmarks();
+        refreshBookmarkToggle();
+        return;
+      }
+
+      const folder = target.closest("[data-folder-path]");
+      if (folder) {
+        e.preventDefault();
+        const path = folder.getAttribute("data-folder-path") || "";
+        if (state.expanded.has(path)) state.expanded.delete(path);
+        else state.expanded.add(path);
+        persistExpanded();
+        renderTree();
+        return;
+      }
+
+      const link = target.closest("[data-doc-slug]");
+      if (link) {
+        e.preventDefault();
+        const slug = link.getAttribute("data-doc-slug") || "";
+        if (link.classList.contains("docs-search-result")) {
+          trackEvent("select_content", {
+            content_type: "docs_search_result",
+            item_id: slug,
+            search_term: state.searchTerm || "",
+          });
+        }
+        if (slug) setHashSlug(slug);
+      }
+    });
+
+    const bookmarkBtn = document.getElementById("docs-bookmark-toggle");
+    bookmarkBtn?.addEventListener("click", () => {
+      const slug = state.activeSlug;
+      if (!slug) return;
+      if (isBookmarked(slug)) {
+        state.bookmarks = state.bookmarks.filter((b) => b.slug !== slug);
+      } else {
+        const page = state.pagesBySlug.get(slug);
+        state.bookmarks.unshift({ slug, title: page?.title || slug });
+      }
+      persistBookmarks();
+      renderBookmarks();
+      refreshBookmarkToggle();
+    });
+
+    const searchEls = getSearchInputs();
+    let t = null;
+    searchEls.forEach((el) => {
+      el.addEventListener("input", () => {
+        const value = String(el.value || "").trim();
+        state.searchTerm = value;
+        searchEls.forEach((other) => {
+          if (other !== el && other.value !== value) other.value = value;
+        });
+        // Stop rendering the previous query now; the new one runs once typing pauses.
+        cancelSearch();
+        startSearchWorker();
+        window.clearTimeout(t);
+        t = window.setTimeout(runSearch, SEARCH_DEBOUNCE_MS);
+      });
+    });
+
+    window.addEventListener("hashchange", () => {
+      const slug = hashSlug() || defaultSlug;
+      if (slug) renderArticle(slug);
+    });
+
+    document.addEventListener("keydown", (e) => {
+      if (e.key === "Escape") {
+        const modal = document.getElementById("img-modal");
+        modal?.classList.remove("open");
+      }
+      const target = e.target;
+      const inField = target instanceof Element && !!target.closest("input,textarea,select,[contenteditable='true']");
+      if (!inField && e.key === "/") {
+        e.preventDefault();
+        const mobileOpen = window.innerWidth <= 1080 && document.getElementById("docs-sidebar")?.classList.contains("open");
+        const desktopSearch = document.getElementById("docs-search");
+        const mobileSearch = document.getElementById("docs-search-mobile");
+        const searchEl = mobileOpen ? mobileSearch : desktopSearch;
+        searchEl?.focus();
+        searchEl?.select();
+      }
+    });
+  }
+
+  function readInlineData() {
+    const el = document.getElementById("site-data-inline");
+    if (!el) return null;
+    const raw = String(el.textContent || "").trim();
+    if (!raw) return null;
+    try {
+      return JSON.parse(raw);
+    } catch (_) {
+      return null;
+    }
+  }
+
+  function loadSiteData() {
+    const inline = readInlineData();
+    if (inline && typeof inline === "object") return inline;
+    throw new Error("Missing inline docs data (#site-data-inline). Re-run build-docs.py.");
+  }
+
+  async function init() {
+    loadState();
+    wireHeaderMenu();
+    wireDocsSidebarMenu();
+
+    const data = await loadSiteData();
+    state.tree = Array.isArray(data.tree) ? data.tree : [];
+    state.searchIndexUrl = String(data.search_index || "");
+    state.searchCoreUrl = String(data.search_core || "");
+    state.searchWorkerUrl = String(data.search_worker || "");
+    const pages = Array.isArray(data.pages) ? data.pages : [];
+    pages.forEach((p) => state.pagesBySlug.set(String(p.slug || ""), p));
+
+    renderTree();
+    renderBookmarks();
+
+    const hasReadme = state.pagesBySlug.has("README");
+    const defaultSlug = hasReadme ? "README" : String(data.default_slug || pages[0]?.slug || "");
+    wireEvents(defaultSlug);
+
+    const hash = hashSlug();
+    const slug = hash || defaultSlug;
+    if (!hash && slug) setHashSlug(slug);
+    if (slug) renderArticle(slug);
+  }
+
+  document.addEventListener("DOMContentLoaded", init);
+})();
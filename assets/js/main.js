@@ -19,6 +19,8 @@
 
   const BOOKMARKS_KEY = "pinballctl.docs.bookmarks.v1";
   const EXPANDED_KEY = "pinballctl.docs.expanded.v1";
+  const SEARCH_DEBOUNCE_MS = 120;
+  const SEARCH_RENDER_BATCH = 20;
 
   const state = {
     tree: [],
@@ -29,6 +31,21 @@
     searchTerm: "",
     lastResults: [],
     lastTrackedSearchTerm: "",
+    searchIndexUrl: "",
+    searchCoreUrl: "",
+    searchWorkerUrl: "",
+  };
+
+  const search = {
+    // Worker once started; false when workers are unavailable and search runs here instead.
+    worker: null,
+    // Id of the newest query; results carrying any other id are dropped.
+    seq: 0,
+    query: "",
+    pending: [],
+    frame: 0,
+    index: null,
+    indexLoading: null,
   };
 
   function trackEvent(eventName, params) {
@@ -248,13 +265,48 @@
     });
   }
 
-  function renderArticle(slug) {
+  function loadPageContent(page) {
+    // Sharded builds ship page html/plain separately; fetch once and keep it on the page.
+    if (typeof page.html === "string" || !page.shard) return Promise.resolve(page);
+    if (!page.loading) {
+      page.loading = fetch(page.shard)
+        .then((res) => {
+          if (!res.ok) throw new Error(`HTTP ${res.status}`);
+          return res.json();
+        })
+        .then((shard) => {
+          page.html = String(shard.html || "");
+          page.plain = String(shard.plain || "");
+          return page;
+        })
+        .catch((err) => {
+          page.loading = null;
+          throw err;
+        });
+    }
+    return page.loading;
+  }
+
+  async function renderArticle(slug) {
     const article = document.getElementById("docs-article");
     if (!article) return;
     const page = state.pagesBySlug.get(slug);
     if (!page) return;
 
     state.activeSlug = slug;
+    if (typeof page.html !== "string" && page.shard) {
+      article.innerHTML = `<h1>${esc(page.title || slug)}</h1><p class="docs-loading">Loading...</p>`;
+      try {
+        await loadPageContent(page);
+      } catch (_) {
+        if (state.activeSlug === slug) {
+          article.innerHTML = `<h1>${esc(page.title || slug)}</h1><p>Could not load this page. Check your connection and try again.</p>`;
+        }
+        return;
+      }
+      // Another page may have been opened while this one was loading.
+      if (state.activeSlug !== slug) return;
+    }
     article.innerHTML = page.html || `<h1>${esc(page.title || slug)}</h1><p>No content.</p>`;
     attachImageModal(article);
 
@@ -273,25 +325,121 @@
     window.scrollTo({ top: 0, behavior: "auto" });
   }
 
-  function scorePage(page, query) {
-    const q = String(query || "").trim().toLowerCase();
-    if (!q) return 0;
-    const title = String(page.title || "").toLowerCase();
-    const body = String(page.plain || "").toLowerCase();
-    const excerpt = String(page.excerpt || "").toLowerCase();
-    let s = 0;
-    if (title.includes(q)) s += 100;
-    if (body.includes(q)) s += 30;
-    if (excerpt.includes(q)) s += 20;
-    const tokens = q.match(/[a-z0-9][a-z0-9_-]*/g) || [];
-    tokens.forEach((t) => {
-      if (title.includes(t)) s += 22;
-      if (body.includes(t)) s += 7;
-    });
-    return s;
+  function searchPages() {
+    return Array.from(state.pagesBySlug.values(), (p) => ({
+      slug: p.slug,
+      title: p.title,
+      excerpt: p.excerpt,
+      plain: typeof p.plain === "string" ? p.plain : "",
+    }));
+  }
+
+  function substringSearch(pages, query) {
+    // index.html built before search-core.js existed doesn't load it: match substrings.
+    const q = query.trim().toLowerCase();
+    return pages
+      .map((p) => {
+        const title = String(p.title || "").toLowerCase();
+        let score = 0;
+        if (title.includes(q)) score += 100;
+        if (p.plain.toLowerCase().includes(q)) score += 30;
+        if (String(p.excerpt || "").toLowerCase().includes(q)) score += 20;
+        return { slug: p.slug, title, score };
+      })
+      .filter((x) => x.score > 0)
+      .sort((a, b) => b.score - a.score || a.title.localeCompare(b.title))
+      .slice(0, 120)
+      .map((x) => x.slug);
+  }
+
+  function startSearchWorker() {
+    if (search.worker !== null) return search.worker;
+    search.worker = false;
+    if (typeof Worker !== "function" || !state.searchWorkerUrl || !state.searchCoreUrl) return false;
+    try {
+      const worker = new Worker(state.searchWorkerUrl);
+      worker.addEventListener("message", (e) => queueSearchResults(e.data || {}));
+      worker.addEventListener("error", () => {
+        // Blocked or broken worker: search on the main thread from now on.
+        worker.terminate();
+        search.worker = false;
+        runSearch();
+      });
+      worker.postMessage({
+        type: "init",
+        core: new URL(state.searchCoreUrl, window.location.href).href,
+        index: state.searchIndexUrl ? new URL(state.searchIndexUrl, window.location.href).href : "",
+        pages: searchPages(),
+      });
+      search.worker = worker;
+    } catch (_) {
+      // Workers cannot be started from file:// pages in most browsers.
+    }
+    return search.worker;
+  }
+
+  function loadSearchIndex() {
+    if (search.index || !state.searchIndexUrl) return Promise.resolve(search.index);
+    if (!search.indexLoading) {
+      search.indexLoading = fetch(state.searchIndexUrl)
+        .then((res) => {
+          if (!res.ok) throw new Error(`HTTP ${res.status}`);
+          return res.json();
+        })
+        .then((data) => {
+          search.index = window.DocsSearch.prepareIndex(data);
+          return search.index;
+        })
+        .catch(() => {
+          // Opened from disk or index missing: fall back to scanning page text.
+          return null;
+        });
+    }
+    return search.indexLoading;
   }
 
-  function renderSearchResults(results) {
+  function cancelSearch() {
+    search.seq += 1;
+    search.pending = [];
+  }
+
+  function queueSearchResults(msg) {
+    if (msg.type !== "results" || msg.id !== search.seq) return;
+    search.pending.push(msg);
+    if (!search.frame) search.frame = window.requestAnimationFrame(flushSearchResults);
+  }
+
+  function flushSearchResults() {
+    // One batch per frame keeps typing responsive while long result lists fill in.
+    search.frame = 0;
+    const msg = search.pending.shift();
+    if (msg && msg.id === search.seq) {
+      const pages = msg.slugs.map((slug) => state.pagesBySlug.get(slug)).filter(Boolean);
+      if (msg.offset === 0) state.lastResults = [];
+      state.lastResults.push(...pages);
+      renderSearchResults(pages, msg.offset > 0, msg.total);
+      if (msg.done && search.query !== state.lastTrackedSearchTerm) {
+        trackEvent("search", {
+          search_term: search.query,
+          results_count: msg.total,
+          search_provider: "pinballctl_docs_inline",
+        });
+        state.lastTrackedSearchTerm = search.query;
+      }
+    }
+    if (search.pending.length) search.frame = window.requestAnimationFrame(flushSearchResults);
+  }
+
+  function searchResultHtml(p) {
+    return `
+      <a href="#doc=${encodeURIComponent(p.slug)}" data-doc-slug="${esc(p.slug)}" class="docs-search-result docs-page-link${state.activeSlug === p.slug ? " active" : ""}">
+        <div class="docs-search-result-title">${esc(stripOrderPrefix(p.title || p.slug))}</div>
+        <div class="docs-result-excerpt">${esc(p.excerpt || "")}</div>
+      </a>
+    `;
+  }
+
+  function renderSearchResults(results, append, total) {
     const tree = document.getElementById("docs-tree");
     const resultsEl = document.getElementById("docs-search-results");
     const statusEls = getSearchStatuses();
@@ -309,43 +457,51 @@
 
     tree.classList.add("hidden");
     resultsEl.classList.remove("hidden");
-    const statusText = `${results.length} result${results.length === 1 ? "" : "s"}`;
+    const count = typeof total === "number" ? total : results.length;
+    const statusText = `${count} result${count === 1 ? "" : "s"}`;
     statusEls.forEach((el) => {
       el.textContent = statusText;
     });
 
-    resultsEl.innerHTML = results.map((p) => `
-      <a href="#doc=${encodeURIComponent(p.slug)}" data-doc-slug="${esc(p.slug)}" class="docs-search-result docs-page-link${state.activeSlug === p.slug ? " active" : ""}">
-        <div class="docs-search-result-title">${esc(stripOrderPrefix(p.title || p.slug))}</div>
-        <div class="docs-result-excerpt">${esc(p.excerpt || "")}</div>
-      </a>
-    `).join("");
+    const html = results.map(searchResultHtml).join("");
+    if (append) resultsEl.insertAdjacentHTML("beforeend", html);
+    else resultsEl.innerHTML = html;
   }
 
-  function runSearch() {
+  async function runSearch() {
     const query = state.searchTerm;
+    cancelSearch();
+    const id = search.seq;
     if (!query || query.length < 2) {
       state.lastResults = [];
       state.lastTrackedSearchTerm = "";
       renderSearchResults([]);
       return;
     }
-    const scored = Array.from(state.pagesBySlug.values())
-      .map((p) => ({ p, score: scorePage(p, query) }))
-      .filter((x) => x.score > 0)
-      .sort((a, b) => b.score - a.score || String(a.p.title).localeCompare(String(b.p.title)))
-      .map((x) => x.p)
-      .slice(0, 120);
-    state.lastResults = scored;
-    if (query !== state.lastTrackedSearchTerm) {
-      trackEvent("search", {
-        search_term: query,
-        results_count: scored.length,
-        search_provider: "pinballctl_docs_inline",
-      });
-      state.lastTrackedSearchTerm = query;
+    search.query = query;
+    const worker = startSearchWorker();
+    if (worker) {
+      worker.postMessage({ type: "query", id, query });
+      return;
     }
-    renderSearchResults(scored);
+    const core = window.DocsSearch;
+    const index = core ? await loadSearchIndex() : null;
+    // A newer keystroke replaced this query while the index was loading.
+    if (id !== search.seq) return;
+    const slugs = core ? core.search(index, searchPages(), query) : substringSearch(searchPages(), query);
+    let offset = 0;
+    do {
+      const end = Math.min(offset + SEARCH_RENDER_BATCH, slugs.length);
+      queueSearchResults({
+        type: "results",
+        id,
+        slugs: slugs.slice(offset, end),
+        offset,
+        total: slugs.length,
+        done: end >= slugs.length,
+      });
+      offset = end;
+    } while (offset < slugs.length);
   }
 
   function wireEvents(defaultSlug) {
@@ -414,8 +570,11 @@
         searchEls.forEach((other) => {
           if (other !== el && other.value !== value) other.value = value;
         });
+        // Stop rendering the previous query now; the new one runs once typing pauses.
+        cancelSearch();
+        startSearchWorker();
         window.clearTimeout(t);
-        t = window.setTimeout(runSearch, 120);
+        t = window.setTimeout(runSearch, SEARCH_DEBOUNCE_MS);
       });
     });
 
@@ -468,6 +627,9 @@
 
     const data = await loadSiteData();
     state.tree = Array.isArray(data.tree) ? data.tree : [];
+    state.searchIndexUrl = String(data.search_index || "");
+    state.searchCoreUrl = String(data.search_core || "");
+    state.searchWorkerUrl = String(data.search_worker || "");
     const pages = Array.isArray(data.pages) ? data.pages : [];
     pages.forEach((p) => state.pagesBySlug.set(String(p.slug || ""), p));
 
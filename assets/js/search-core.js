@@ -0,0 +1,103 @@
+// Docs search scoring, shared by search-worker.js and the main-thread fallback in main.js.
+(function (root) {
+  const RESULT_LIMIT = 120;
+
+  function searchTokens(text) {
+    // Keep in sync with _search_tokens() in utils/build-docs.py.
+    const tokens = [];
+    (String(text || "").toLowerCase().match(/[a-z0-9][a-z0-9_-]*/g) || []).forEach((t) => {
+      tokens.push(t);
+      if (/[-_]/.test(t)) t.split(/[-_]+/).forEach((part) => { if (part) tokens.push(part); });
+    });
+    return tokens;
+  }
+
+  function prepareIndex(data) {
+    // Sorted term list for prefix expansion of the last query token.
+    return { data, terms: Object.keys(data.postings || {}).sort() };
+  }
+
+  function expandTerm(index, token, prefix) {
+    const matches = index.data.postings[token] ? [[token, 1]] : [];
+    if (!prefix) return matches;
+    const terms = index.terms;
+    let lo = 0;
+    let hi = terms.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (terms[mid] < token) lo = mid + 1;
+      else hi = mid;
+    }
+    for (let i = lo; i < terms.length && i <= lo + 40; i += 1) {
+      const term = terms[i];
+      if (!term.startsWith(token)) break;
+      if (term !== token) matches.push([term, 0.5]);
+    }
+    return matches;
+  }
+
+  function queryIndex(index, query) {
+    // BM25F over the prebuilt postings; mirrors search_index() in utils/build-docs.py.
+    const q = String(query || "").trim().toLowerCase();
+    const tokens = Array.from(new Set(searchTokens(q)));
+    if (!tokens.length) return [];
+    const data = index.data;
+    const docs = data.docs || [];
+    const { lengths, avg, weights, k1, b } = data;
+    const scores = new Map();
+    tokens.forEach((token, pos) => {
+      expandTerm(index, token, pos === tokens.length - 1).forEach(([term, boost]) => {
+        const flat = data.postings[term];
+        const df = flat.length / 4;
+        const idf = Math.log(1 + (docs.length - df + 0.5) / (df + 0.5));
+        for (let i = 0; i < flat.length; i += 4) {
+          const doc = flat[i];
+          let tf = 0;
+          for (let f = 0; f < 3; f += 1) {
+            const raw = flat[i + 1 + f];
+            if (raw) tf += (weights[f] * raw) / (1 - b + (b * lengths[doc][f]) / avg[f]);
+          }
+          scores.set(doc, (scores.get(doc) || 0) + (boost * idf * tf) / (k1 + tf));
+        }
+      });
+    });
+    return Array.from(scores, ([doc, score]) => {
+      const title = String(docs[doc].title || "");
+      return { slug: docs[doc].slug, title, score: title.toLowerCase().includes(q) ? score + 10 : score };
+    }).sort((x, y) => y.score - x.score || x.title.toLowerCase().localeCompare(y.title.toLowerCase()));
+  }
+
+  function scorePage(page, query) {
+    const q = String(query || "").trim().toLowerCase();
+    if (!q) return 0;
+    const title = String(page.title || "").toLowerCase();
+    const body = String(page.plain || "").toLowerCase();
+    const excerpt = String(page.excerpt || "").toLowerCase();
+    let s = 0;
+    if (title.includes(q)) s += 100;
+    if (body.includes(q)) s += 30;
+    if (excerpt.includes(q)) s += 20;
+    const tokens = q.match(/[a-z0-9][a-z0-9_-]*/g) || [];
+    tokens.forEach((t) => {
+      if (title.includes(t)) s += 22;
+      if (body.includes(t)) s += 7;
+    });
+    return s;
+  }
+
+  function scanPages(pages, query) {
+    // Used when the search index could not be loaded (for example, opened from disk).
+    return pages
+      .map((p) => ({ p, score: scorePage(p, query) }))
+      .filter((x) => x.score > 0)
+      .sort((a, b) => b.score - a.score || String(a.p.title).localeCompare(String(b.p.title)))
+      .map((x) => ({ slug: x.p.slug, title: x.p.title, score: x.score }));
+  }
+
+  function search(index, pages, query) {
+    const ranked = index ? queryIndex(index, query) : scanPages(pages, query);
+    return ranked.slice(0, RESULT_LIMIT).map((r) => r.slug);
+  }
+
+  root.DocsSearch = { RESULT_LIMIT, searchTokens, prepareIndex, queryIndex, scanPages, search };
+})(typeof self !== "undefined" ? self : this);
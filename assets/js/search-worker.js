@@ -0,0 +1,58 @@
+// Runs docs search off the main thread. Protocol (all messages are plain objects):
+//   in:  {type: "init", core, index, pages}  core/index are absolute URLs, pages [{slug, title, excerpt, plain}]
+//   in:  {type: "query", id, query}          a newer id supersedes any query still streaming
+//   out: {type: "results", id, slugs, offset, total, done}  ranked slugs, BATCH_SIZE at a time
+const BATCH_SIZE = 20;
+
+let pages = [];
+let index = null;
+let indexLoading = null;
+let latestId = 0;
+
+function loadIndex(url) {
+  if (!url) return Promise.resolve(null);
+  return fetch(url)
+    .then((res) => {
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      return res.json();
+    })
+    .then((data) => {
+      index = self.DocsSearch.prepareIndex(data);
+      return index;
+    })
+    .catch(() => null);
+}
+
+function stream(id, slugs, offset) {
+  // Yield between batches so a newer query can be picked up and this one dropped.
+  if (id !== latestId) return;
+  const end = Math.min(offset + BATCH_SIZE, slugs.length);
+  self.postMessage({
+    type: "results",
+    id,
+    slugs: slugs.slice(offset, end),
+    offset,
+    total: slugs.length,
+    done: end >= slugs.length,
+  });
+  if (end < slugs.length) setTimeout(() => stream(id, slugs, end), 0);
+}
+
+async function runQuery(id, query) {
+  await indexLoading;
+  if (id !== latestId) return;
+  stream(id, self.DocsSearch.search(index, pages, query), 0);
+}
+
+self.addEventListener("message", (e) => {
+  const msg = e.data || {};
+  if (msg.type === "init") {
+    importScripts(msg.core);
+    pages = Array.isArray(msg.pages) ? msg.pages : [];
+    indexLoading = loadIndex(msg.index);
+  } else if (msg.type === "query") {
+    latestId = msg.id;
+    // Let queued messages drain first; only the newest query is scored.
+    setTimeout(() => runQuery(msg.id, msg.query), 0);
+  }
+});
@@ -0,0 +1,32 @@
+"""Load the hyphenated utils/ scripts as modules for the tests."""
+from __future__ import annotations
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+UTILS = Path(__file__).resolve().parents[1] / "utils"
+sys.path.insert(0, str(UTILS))
+
+
+def load_script(name: str):
+    module_name = name.replace("-", "_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, UTILS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def build_docs():
+    return load_script("build-docs")
+
+
+@pytest.fixture(scope="session")
+def build_screenshots():
+    return load_script("build-screenshots")
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+import time
+
+
+def test_tag_re_unclosed_tag_is_linear(build_docs):
+    # A truncated raw-HTML tag used to backtrack exponentially in the attribute count.
+    text = "<img " + 'x="y" ' * 200 + "'"
+    started = time.perf_counter()
+    assert build_docs._TAG_RE.findall(text) == []
+    assert time.perf_counter() - started < 1.0
+
+
+def test_tag_re_attribute_forms(build_docs):
+    tag = """<img src=a.png alt="x" data-x='q' hidden>"""
+    assert build_docs._TAG_RE.findall(f"<p>{tag}</p>") == ["<p>", tag]
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import math
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _real_plans(build_screenshots):
+    return [
+        build_screenshots.build_plan(
+            spec=spec,
+            source=source,
+            line=line,
+            docs_root=ROOT,
+            default_domain=build_screenshots.DEFAULT_DOMAIN,
+            default_username="admin",
+            default_password="password",
+        )
+        for spec, source, line in build_screenshots.parse_directives(ROOT / "pages", ROOT)
+    ]
+
+
+def test_capture_units_one_worker_keeps_chains_whole(build_screenshots):
+    plans = _real_plans(build_screenshots)
+    units = build_screenshots._capture_units(plans, 10000, True)
+    assert sorted(i for unit in units for i in unit.indexes) == list(range(len(plans)))
+    assert max(len(unit.indexes) for unit in units if unit.chained) > len(plans) // 2
+
+
+def test_capture_units_split_chains_across_workers(build_screenshots):
+    plans = _real_plans(build_screenshots)
+    units = build_screenshots._capture_units(plans, 10000, True, workers=4)
+    assert sorted(i for unit in units for i in unit.indexes) == list(range(len(plans)))
+    chained = [unit for unit in units if unit.chained]
+    limit = math.ceil(sum(len(unit.indexes) for unit in chained) / 4)
+    assert max(len(unit.indexes) for unit in chained) <= limit
+    assert sum(1 for unit in chained if len(unit.indexes) > 1) >= 4
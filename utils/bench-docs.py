@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""Benchmark build-docs.py on synthetic page trees of increasing size.
+
+For every size in --sizes a deterministic pages/ tree is generated (nested
+sections, images, cross-links, data-source and pinballctl-shot directives),
+then built without the page cache. Each phase of build() is timed with the
+same Profiler that backs `build-docs.py --profile`, and one extra build runs
+under tracemalloc to record peak memory.
+
+Results go to a JSON baseline (.cache/bench/build-docs.json by default).
+`--compare OLD.json` prints per-phase ratios against an earlier baseline and
+exits 1 when a phase or the peak memory regressed past --threshold.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from build_profile import Profiler
+
+UTILS_DIR = Path(__file__).resolve().parent
+DEFAULT_ROOT = UTILS_DIR.parent
+DEFAULT_OUTPUT = Path(".cache") / "bench" / "build-docs.json"
+DEFAULT_SIZES = "100,1000,10000"
+# Phases shorter than this are too noisy to call a regression.
+MIN_REGRESSION_S = 0.005
+
+# Smallest valid PNG (1x1, transparent); every generated screenshot is a copy.
+_PNG_1X1 = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c63000100000500010d0a2db40000000049454e44ae426082"
+)
+_WORDS = (
+    "bridge rules lighting audio cue fixture playfield switch coil solenoid score combo mode "
+    "dashboard settings firmware upload device network wifi service entry filter layout stage "
+    "media display runtime event sync trigger output channel volume profile backup import export"
+).split()
+_CLICKS = ("[data-menu-toggle]", "#save", "text=Apply", "button[type=\"submit\"]", ".tab-advanced")
+
+
+def _load_build_docs():
+    spec = importlib.util.spec_from_file_location("build_docs", UTILS_DIR / "build-docs.py")
+    module = importlib.util.module_from_spec(spec)
+    # Registered so worker processes (--jobs) can pickle _render_page by name.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _directive(rng: random.Random, output: str | None = None) -> dict:
+    shot: dict = {"url": f"/{rng.choice(_WORDS)}", "settle_ms": rng.choice((120, 220, 320))}
+    if rng.random() < 0.5:
+        shot["dark_mode"] = True
+    if rng.random() < 0.6:
+        shot["click"] = [
+            {"action": "click", "selector": rng.choice(_CLICKS), "wait_for": "body"}
+            for _ in range(rng.randint(1, 3))
+        ]
+    if output:
+        shot["output"] = output
+    return shot
+
+
+def _page_paths(rng: random.Random, count: int, max_depth: int) -> list[Path]:
+    """Plan `count` page paths spread over sections up to `max_depth` levels deep."""
+    sections: list[Path] = [Path()]
+    entries: dict[Path, int] = {Path(): 0}
+    paths: list[Path] = []
+    while len(paths) < count:
+        parent = rng.choice(sections)
+        entries[parent] += 1
+        name = f"{entries[parent]}-{rng.choice(_WORDS)}-{rng.choice(_WORDS)}"
+        if len(parent.parts) < max_depth and rng.random() < 0.15:
+            section = parent / name
+            sections.append(section)
+            entries[section] = 0
+            paths.append(section / "README.md")
+        else:
+            paths.append(parent / f"{name}.md")
+    return paths
+
+
+def _page_text(
+    rng: random.Random,
+    path: Path,
+    paths: list[Path],
+    images: int,
+    link_density: float,
+    directive_ratio: float,
+) -> tuple[str, list[str]]:
+    """Markdown for one page, plus the media files (relative to its folder) it references."""
+    title = " ".join(w.capitalize() for w in path.stem.split("-")[1:]) or "Overview"
+    out = [f"# {title}", "", _sentence(rng, rng.randint(8, 20)), ""]
+    media: list[str] = []
+
+    def _link() -> str:
+        target = rng.choice(paths)
+        if rng.random() < 0.2:
+            return f"[{rng.choice(_WORDS)} reference](https://example.com/{rng.choice(_WORDS)})"
+        rel = os.path.relpath(target, path.parent).replace(os.sep, "/")
+        if not rel.startswith("."):
+            rel = "./" + rel
+        return f"[{rng.choice(_WORDS)} {rng.choice(_WORDS)}]({rel})"
+
+    for section in range(rng.randint(2, 6)):
+        out += [f"## {_sentence(rng, rng.randint(2, 4))[:-1]}", ""]
+        for _ in range(rng.randint(1, 3)):
+            sentences = []
+            for _ in range(rng.randint(2, 5)):
+                sentence = _sentence(rng, rng.randint(6, 16))
+                if rng.random() < link_density:
+                    sentence = f"{sentence[:-1]}, see {_link()}."
+                if rng.random() < 0.3:
+                    sentence = f"Use `{rng.choice(_WORDS)}` and **{rng.choice(_WORDS)}**. {sentence}"
+                sentences.append(sentence)
+            out += [" ".join(sentences), ""]
+        shape = rng.random()
+        if shape < 0.4:
+            out += [f"- {_sentence(rng, rng.randint(2, 6))}" for _ in range(rng.randint(2, 6))] + [""]
+        elif shape < 0.55:
+            out += ["| Field | Meaning |", "|---|---|"]
+            out += [f"| `{rng.choice(_WORDS)}` | {_sentence(rng, 5)} |" for _ in range(rng.randint(2, 5))] + [""]
+        elif shape < 0.65:
+            out += ["```json", json.dumps({w: rng.randint(0, 99) for w in rng.sample(_WORDS, 4)}, indent=2), "```", ""]
+        if section == 0 and rng.random() < directive_ratio:
+            shot = _directive(rng, output=f"assets/screenshots/{path.stem}-{section}.png")
+            out += [f"<!-- pinballctl-shot {json.dumps(shot, separators=(',', ':'))} -->", ""]
+    for n in range(rng.randint(0, images)):
+        name = f"media/screenshot-{path.stem}-{n}.png"
+        media.append(name)
+        alt = _sentence(rng, 3)[:-1]
+        if rng.random() < directive_ratio:
+            source = json.dumps(_directive(rng), separators=(",", ":"))
+            out += [f"<img src=\"./{name}\" data-source='{source}' alt=\"{alt}\" style=\"width: 100%;height: auto;\">", ""]
+        else:
+            out += [f"![{alt}](./{name})", ""]
+    return "\n".join(out), media
+
+
+def generate_corpus(
+    root: Path,
+    pages: int,
+    seed: int = 1,
+    max_depth: int = 3,
+    images: int = 3,
+    link_density: float = 0.2,
+    directive_ratio: float = 0.3,
+) -> int:
+    """Write a synthetic docs tree (pages/ plus the assets build() needs) under `root`.
+
+    Returns the total size of the generated markdown in bytes.
+    """
+    rng = random.Random(f"{seed}:{pages}")
+    if root.exists():
+        shutil.rmtree(root)
+    for sub in ("css", "js"):
+        shutil.copytree(DEFAULT_ROOT / "assets" / sub, root / "assets" / sub)
+    (root / "assets" / "screenshots").mkdir(parents=True)
+    pages_root = root / "pages"
+    paths = _page_paths(rng, pages, max_depth)
+    total = 0
+    for path in paths:
+        text, media = _page_text(rng, path, paths, images, link_density, directive_ratio)
+        md_path = pages_root / path
+        md_path.parent.mkdir(parents=True, exist_ok=True)
+        data = text.encode("utf-8")
+        md_path.write_bytes(data)
+        total += len(data)
+        for name in media:
+            image = md_path.parent / name
+            image.parent.mkdir(exist_ok=True)
+            image.write_bytes(_PNG_1X1)
+    return total
+
+
+def _build_once(build_docs, root: Path, jobs: int, profiler: Profiler) -> None:
+    # build() reports every file it writes; keep the benchmark output to the results.
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_docs.build(
+            root,
+            cache_dir=None,
+            jobs=jobs,
+            profiler=profiler,
+            fingerprints=True,
+            compress=True,
+        )
+
+
+def bench_size(build_docs, root: Path, pages: int, args: argparse.Namespace) -> dict:
+    corpus_bytes = generate_corpus(
+        root,
+        pages,
+        seed=args.seed,
+        max_depth=args.max_depth,
+        images=args.images,
+        link_density=args.link_density,
+        directive_ratio=args.directive_ratio,
+    )
+    phases: dict[str, float] = {}
+    walls: list[float] = []
+    for _ in range(args.repeat):
+        profiler = Profiler("build-docs")
+        started = time.perf_counter()
+        _build_once(build_docs, root, args.jobs, profiler)
+        walls.append(time.perf_counter() - started)
+        # Keep the fastest time per phase: the least disturbed by the rest of the machine.
+        for name, entry in profiler.phases.items():
+            phases[name] = min(phases.get(name, entry["wall_s"]), entry["wall_s"])
+    peak_bytes = None
+    if not args.no_memory:
+        tracemalloc.start()
+        try:
+            _build_once(build_docs, root, args.jobs, Profiler("build-docs", enabled=False))
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        "pages": pages,
+        "corpus_bytes": corpus_bytes,
+        "wall_s": round(min(walls), 6),
+        "peak_bytes": peak_bytes,
+        "phases": {name: round(seconds, 6) for name, seconds in phases.items()},
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Describe regressions of `current` against `baseline`, printing a ratio table as it goes."""
+    regressions: list[str] = []
+    changed = sorted(k for k, v in current["params"].items() if baseline.get("params", {}).get(k) != v)
+    if changed:
+        print(f"Baseline was generated with different parameters ({', '.join(changed)}); ratios are not like for like")
+    previous = {run["pages"]: run for run in baseline.get("runs", [])}
+    for run in current["runs"]:
+        old = previous.get(run["pages"])
+        if old is None:
+            print(f"{run['pages']} pages: not in baseline")
+            continue
+        print(f"{run['pages']} pages vs baseline:")
+        rows = [("total", run["wall_s"], old["wall_s"])]
+        rows += [(name, s, old["phases"][name]) for name, s in run["phases"].items() if name in old.get("phases", {})]
+        for name, new_s, old_s in rows:
+            ratio = new_s / old_s if old_s else 1.0
+            flag = ""
+            if ratio > 1 + threshold and new_s - old_s > MIN_REGRESSION_S:
+                flag = "  REGRESSION"
+                regressions.append(f"{run['pages']} pages {name}: {old_s:.3f}s -> {new_s:.3f}s ({ratio:.2f}x)")
+            print(f"  {name:<24} {old_s:9.3f}s -> {new_s:9.3f}s  {ratio:5.2f}x{flag}")
+        if run.get("peak_bytes") and old.get("peak_bytes"):
+            ratio = run["peak_bytes"] / old["peak_bytes"]
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions.append(
+                    f"{run['pages']} pages peak memory: {_mb(old['peak_bytes'])} -> {_mb(run['peak_bytes'])} ({ratio:.2f}x)"
+                )
+            print(f"  {'peak memory':<24} {_mb(old['peak_bytes']):>10} -> {_mb(run['peak_bytes']):>10}  {ratio:5.2f}x{flag}")
+    return regressions
+
+
+def _mb(nbytes: int) -> str:
+    return f"{nbytes / (1024 * 1024):.1f} MB"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark build-docs.py on synthetic page trees.")
+    parser.add_argument("--root", type=Path, default=DEFAULT_ROOT, help="Docs repo root (relative --output is under it)")
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma-separated page counts to benchmark (default {DEFAULT_SIZES})",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the corpus generator")
+    parser.add_argument("--max-depth", type=int, default=3, help="Deepest section nesting under pages/")
+    parser.add_argument("--images", type=int, default=3, help="Most images on one page")
+    parser.add_argument(
+        "--link-density",
+        type=float,
+        default=0.2,
+        help="Chance that a sentence links to another page (0-1)",
+    )
+    parser.add_argument(
+        "--directive-ratio",
+        type=float,
+        default=0.3,
+        help="Share of images with a data-source directive, and of pages with a pinballctl-shot comment",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Builds per size; the fastest time per phase is kept")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Passed to build() (0 = one per CPU)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory build")
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        default=None,
+        help="Keep the generated trees here instead of a temporary directory",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=DEFAULT_OUTPUT,
+        help="Where to write the JSON results (default .cache/bench/build-docs.json)",
+    )
+    parser.add_argument("--compare", type=Path, default=None, metavar="BASELINE", help="Earlier results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Slowdown (or memory growth) that counts as a regression under --compare (default 0.25 = 25%%)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    if not sizes or min(sizes) < 1:
+        raise SystemExit("--sizes needs positive page counts")
+    args.repeat = max(1, args.repeat)
+    args.jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    root = args.root.resolve()
+    output = args.output if args.output.is_absolute() else root / args.output
+    baseline = None
+    if args.compare is not None:
+        try:
+            baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            raise SystemExit(f"Cannot read baseline {args.compare}: {exc}") from exc
+
+    build_docs = _load_build_docs()
+    results = {
+        "tool": "bench-docs",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "seed": args.seed,
+            "max_depth": args.max_depth,
+            "images": args.images,
+            "link_density": args.link_density,
+            "directive_ratio": args.directive_ratio,
+            "repeat": args.repeat,
+            "jobs": args.jobs,
+        },
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="bench-docs-") as tmp:
+        workdir = args.workdir.resolve() if args.workdir is not None else Path(tmp)
+        for pages in sizes:
+            run = bench_size(build_docs, workdir / f"pages-{pages}", pages, args)
+            results["runs"].append(run)
+            peak = f", peak {_mb(run['peak_bytes'])}" if run["peak_bytes"] is not None else ""
+            print(f"Benchmarked {pages} pages ({_mb(run['corpus_bytes'])} markdown): {run['wall_s']:.3f}s{peak}")
+            for name, seconds in sorted(run["phases"].items(), key=lambda item: -item[1])[:8]:
+                print(f"  {name:<24} {seconds:9.3f}s")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_output = output.with_name(output.name + ".tmp")
+    tmp_output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    tmp_output.replace(output)
+    print(f"Results written to {output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) past {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,41 @@
 #!/usr/bin/env python3
-"""Build docs site, then build screenshots."""
+"""Build screenshots, then the docs site that embeds them."""
 
 from __future__ import annotations
 
 import argparse
+import json
+import os
 import subprocess
 import sys
+import time
 from pathlib import Path
 
+from build_profile import Profiler, profile_path
+from shot_selection import add_selection_args, selection_args
+
 UTILS_DIR = Path(__file__).resolve().parent
 DEFAULT_ROOT = UTILS_DIR.parent
 DEFAULT_WEBSITE_ROOT = DEFAULT_ROOT.parent / "pinballctl-website"
 
 
-def _run(cmd: list[str]) -> None:
+def _run(cmd: list[str], profiler: Profiler | None = None, phase: str = "") -> None:
     print("$ " + " ".join(cmd))
-    subprocess.run(cmd, check=True)
+    wall = time.perf_counter()
+    before = os.times()
+    try:
+        subprocess.run(cmd, check=True)
+    finally:
+        if profiler is not None:
+            after = os.times()
+            cpu = (after.children_user - before.children_user) + (
+                after.children_system - before.children_system
+            )
+            profiler.add_phase(phase or Path(cmd[1]).stem, time.perf_counter() - wall, cpu)
 
 
 def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Run build-docs.py then build-screenshots.py")
+    parser = argparse.ArgumentParser(description="Run build-screenshots.py then build-docs.py")
     parser.add_argument("--root", type=Path, default=DEFAULT_ROOT, help="Docs repo root")
     parser.add_argument(
         "--website-root",
@@ -34,6 +50,36 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--headed", action="store_true", help="Run screenshot browser headed")
     parser.add_argument("--dry-run", action="store_true", help="Screenshot dry-run")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing screenshots")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Recapture only screenshots whose directive or app build changed",
+    )
+    parser.add_argument("--app-build", default="", metavar="ID", help="App version/build id for screenshots")
+    parser.add_argument(
+        "--replay-har",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Capture screenshots from a recorded HAR fixture instead of the device",
+    )
+    add_selection_args(parser)
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Write a combined JSON timing report (default .cache/profile/build-all.json)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        type=Path,
+        default=None,
+        metavar="DIR",
+        help="Dump cProfile stats for each step into DIR",
+    )
     return parser.parse_args()
 
 
@@ -71,9 +117,45 @@ def main() -> None:
         build_shots.append("--dry-run")
     if args.overwrite:
         build_shots.append("--overwrite")
+    if args.incremental:
+        build_shots.append("--incremental")
+    if args.app_build:
+        build_shots += ["--app-build", args.app_build]
+    if args.replay_har is not None:
+        build_shots += ["--replay-har", args.replay_har] if args.replay_har else ["--replay-har"]
+    build_shots += selection_args(args)
+
+    report_path = profile_path(args.profile, root, "build-all")
+    profiler = Profiler("build-all", enabled=report_path is not None)
+    child_reports: dict[str, Path] = {}
+    if report_path is not None:
+        child_reports = {
+            "build-docs": report_path.with_name(f"{report_path.stem}.build-docs.json"),
+            "build-screenshots": report_path.with_name(f"{report_path.stem}.build-screenshots.json"),
+        }
+        build_docs += ["--profile", str(child_reports["build-docs"])]
+        build_shots += ["--profile", str(child_reports["build-screenshots"])]
+    if args.cprofile is not None:
+        cprofile_dir = args.cprofile.resolve()
+        build_docs += ["--cprofile", str(cprofile_dir / "build-docs.prof")]
+        build_shots += ["--cprofile", str(cprofile_dir / "build-screenshots.prof")]
 
-    _run(build_docs)
-    _run(build_shots)
+    try:
+        try:
+            _run(build_shots, profiler, "build-screenshots")
+        except subprocess.CalledProcessError as exc:
+            # Still publish the docs with the images already on disk, then report the failure.
+            _run(build_docs, profiler, "build-docs")
+            raise SystemExit(f"build-screenshots.py failed (exit {exc.returncode}); docs built with existing images")
+        _run(build_docs, profiler, "build-docs")
+    finally:
+        if report_path is not None:
+            children = {}
+            for name, path in child_reports.items():
+                if path.exists():
+                    children[name] = json.loads(path.read_text(encoding="utf-8"))
+            profiler.extra["children"] = children
+            profiler.write(report_path)
 
 
 if __name__ == "__main__":
@@ -4,28 +4,64 @@
 Source of truth:
 - pages/**/*.md
 - assets/**
+- image-manifest.json (optional; written by build-screenshots.py)
 
 Generated:
 - index.html
 - site-data.json
+- search-index.json
+- site-data/pages/**.json (only with --shards)
+- assets/css/*.<hash>.css, assets/js/main.<hash>.js, search-index.<hash>.json
+- .gz/.br siblings of every text artifact
 """
 from __future__ import annotations
 
 import argparse
+import bisect
+import hashlib
 import html
 import json
+import math
+import os
 import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from urllib.parse import quote
+from urllib.parse import quote, unquote
+
+import markdown_render
+import static_assets
+from build_profile import Profiler, profile_path, run_profiled
+from file_index import FileIndex
+from image_pipeline import IMAGE_MANIFEST, load_image_manifest, prune_image_manifest
 
 try:
-    import markdown as _markdown  # type: ignore
+    from inotify_simple import INotify as _INotify, flags as _inotify_flags  # type: ignore
 except Exception:
-    _markdown = None
+    _INotify = None
+    _inotify_flags = None
 
 _ORDERED_NAME_RE = re.compile(r"^\s*(\d+)\s*[-_. )]+\s*(.*)$")
 
+# Bump when the cached page payload shape changes.
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = Path(".cache") / "build-docs"
+
+# Keep in sync with searchTokens() in assets/js/search-core.js.
+_SEARCH_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_-]*")
+_SEARCH_PART_RE = re.compile(r"[-_]+")
+SEARCH_INDEX_VERSION = 1
+SEARCH_FIELDS = ("title", "excerpt", "body")
+SEARCH_FIELD_WEIGHTS = (5.0, 2.0, 1.0)
+SEARCH_BM25_K1 = 1.2
+SEARCH_BM25_B = 0.75
+SEARCH_PREFIX_WEIGHT = 0.5
+SEARCH_PREFIX_LIMIT = 40
+
 
 def _ordered_name(raw: str) -> tuple[int, str]:
     text = str(raw or "").strip()
@@ -39,10 +75,12 @@ def _ordered_name(raw: str) -> tuple[int, str]:
     return (order, clean)
 
 
-def _title_from_markdown(md_path: Path) -> str:
+def _title_from_markdown(md_path: Path, md_text: str | None = None) -> str:
     stem = _ordered_name(md_path.stem)[1].title()
     try:
-        for line in md_path.read_text(encoding="utf-8").splitlines():
+        if md_text is None:
+            md_text = md_path.read_text(encoding="utf-8")
+        for line in md_text.splitlines():
             s = line.strip()
             if s.startswith("# "):
                 heading = _ordered_name(s[2:].strip())[1]
@@ -56,17 +94,24 @@ def _slug_for(md_path: Path, root: Path) -> str:
     return md_path.relative_to(root).with_suffix("").as_posix()
 
 
-def _scan_pages(root: Path) -> list[dict]:
+def _scan_pages(root: Path, file_index: FileIndex | None = None) -> list[dict]:
     pages = []
     if not root.exists():
         return pages
-    for md_path in sorted(root.rglob("*.md")):
+    if file_index is None:
+        file_index = FileIndex(root)
+    for entry in file_index.files(root, ".md"):
+        md_path = entry.path
         slug = _slug_for(md_path, root)
+        try:
+            md_text = entry.read_text()
+        except (OSError, UnicodeDecodeError):
+            md_text = ""
         pages.append(
             {
                 "slug": slug,
                 "path": md_path.relative_to(root).as_posix(),
-                "title": _title_from_markdown(md_path),
+                "title": _title_from_markdown(md_path, md_text),
                 "order": _ordered_name(md_path.stem)[0],
                 "md_path": md_path,
             }
@@ -186,20 +231,86 @@ def _extract_excerpt(content: str, query: str = "") -> str:
     return snippet
 
 
-def _safe_resolve(base: Path, rel_path: str) -> Path | None:
-    try:
-        resolved = (base / rel_path).resolve()
-    except Exception:
-        return None
-    try:
-        resolved.relative_to(base)
-    except Exception:
-        return None
-    return resolved
+# One scan over the document: comments pass through, start tags get rewritten.
+_TAG_RE = re.compile(
+    r"""<!--.*?-->|<[a-zA-Z][^\s/>]*(?:\s+[^\s"'>/=]+(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'=<>`]+))?)*\s*/?>""",
+    re.DOTALL,
+)
+_LINK_ATTR_RE = re.compile(r'(href|src)="([^"]+)"')
+_DATA_SOURCE_ATTR_RE = re.compile(
+    r"""\sdata-source\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'=<>`]+)""", re.IGNORECASE
+)
+_STYLE_ATTR_RE = re.compile(r"""\sstyle=(["'])(.*?)\1""", re.IGNORECASE)
+_LEGACY_MAX_WIDTH_RE = re.compile(r"max-width\s*:\s*800px\s*;?", re.IGNORECASE)
+_DOUBLE_SEMICOLON_RE = re.compile(r"\s*;\s*;\s*")
+_MULTI_SPACE_RE = re.compile(r"\s{2,}")
+_IMG_SRC_RE = re.compile(r'\ssrc="([^"]+)"')
+_IMG_SIZE_ATTR_RE = re.compile(r"\s(?:width|height)\s*=", re.IGNORECASE)
+_TAG_END_RE = re.compile(r"\s*/?>$")
+# Matches `.doc-panel img { width: min(100%, 980px) }` in docs.css.
+IMAGE_SIZES = "(max-width: 1080px) 100vw, 980px"
+
+
+def _clean_style(match: re.Match) -> str:
+    # Remove legacy inline image sizing from authored HTML; docs.css owns defaults.
+    quote_char = match.group(1)
+    style = match.group(2)
+    style = _LEGACY_MAX_WIDTH_RE.sub("", style)
+    style = _DOUBLE_SEMICOLON_RE.sub("; ", style)
+    style = _MULTI_SPACE_RE.sub(" ", style).strip()
+    style = style.strip(";").strip()
+    if not style:
+        return ""
+    if not style.endswith(";"):
+        style = f"{style};"
+    return f" style={quote_char}{style}{quote_char}"
+
+
+def _picture(tag: str, entry: dict) -> str:
+    """Wrap an <img> listed in image-manifest.json in <picture> with srcset and size attrs."""
+    if not _IMG_SIZE_ATTR_RE.search(tag):
+        end = _TAG_END_RE.search(tag)
+        tag = (
+            f'{tag[:end.start()]} width="{int(entry["width"])}" height="{int(entry["height"])}"'
+            f"{tag[end.start():]}"
+        )
+    by_type: dict[str, list[str]] = {}
+    for variant in entry.get("variants", []):
+        by_type.setdefault(variant["type"], []).append(
+            f'./{quote(variant["path"], safe="/")} {int(variant["width"])}w'
+        )
+    if not by_type:
+        return tag
+    sources = "".join(
+        f'<source type="{html.escape(kind, quote=True)}" srcset="{html.escape(", ".join(srcset), quote=True)}" '
+        f'sizes="{IMAGE_SIZES}">'
+        for kind, srcset in by_type.items()
+    )
+    return f"<picture>{sources}{tag}</picture>"
 
 
-def _rewrite_links(html_text: str, doc_md: Path, pages_root: Path, assets_root: Path) -> str:
-    doc_dir = doc_md.parent
+def _rewrite_links(
+    html_text: str,
+    doc_md: Path,
+    pages_root: Path,
+    assets_root: Path,
+    deps: dict[str, bool] | None = None,
+    tree_index: dict[str, bool] | None = None,
+    images: dict[str, dict] | None = None,
+) -> str:
+    """Rewrite href/src targets, drop data-source and tidy style in one pass.
+
+    Local targets resolve against `tree_index` (FileIndex.kinds; built on demand
+    when omitted). When `deps` is given it collects every local target that was
+    checked, mapped to whether it existed, so cached output can be revalidated.
+    Images listed in `images` (image-manifest.json) become <picture> elements.
+    """
+    if tree_index is None:
+        tree_index = FileIndex(pages_root, assets_root).kinds
+    doc_dir = os.path.normpath(doc_md.parent)
+    doc_prefix = doc_dir + os.sep
+    pages_prefix = os.path.normpath(pages_root) + os.sep
+    assets_prefix = os.path.normpath(assets_root) + os.sep
 
     def _replace(match: re.Match) -> str:
         attr = match.group(1)
@@ -217,192 +328,365 @@ def _rewrite_links(html_text: str, doc_md: Path, pages_root: Path, assets_root:
         if url.startswith("/"):
             return match.group(0)
 
-        target = _safe_resolve(doc_dir, url)
-        if target is None:
+        target = os.path.normpath(os.path.join(doc_dir, url))
+        if not target.startswith(doc_prefix) and target != doc_dir:
+            return match.group(0)
+
+        is_file = tree_index.get(target)
+        if deps is not None and target.startswith(pages_prefix):
+            deps[target[len(pages_prefix):].replace(os.sep, "/")] = is_file is not None
+
+        if is_file is None:
             return match.group(0)
 
-        if target.suffix.lower() == ".md" and target.exists():
-            slug = _slug_for(target, pages_root)
+        if target.lower().endswith(".md") and target.startswith(pages_prefix):
+            slug = Path(target[len(pages_prefix):]).with_suffix("").as_posix()
             return f'{attr}="#doc={html.escape(slug)}"'
 
-        if target.exists() and target.is_file():
-            if target.is_relative_to(assets_root):
-                rel = target.relative_to(assets_root).as_posix()
+        if is_file:
+            if target.startswith(assets_prefix):
+                rel = target[len(assets_prefix):].replace(os.sep, "/")
                 return f'{attr}="./assets/{quote(rel, safe="/")}"'
-            try:
-                rel_page = target.relative_to(pages_root).as_posix()
+            if target.startswith(pages_prefix):
+                rel_page = target[len(pages_prefix):].replace(os.sep, "/")
                 return f'{attr}="./pages/{quote(rel_page, safe="/")}"'
-            except Exception:
-                return match.group(0)
 
         return match.group(0)
 
-    rewritten = re.sub(r'(href|src)="([^"]+)"', _replace, html_text)
-    # Strip screenshot build directives from compiled output.
-    rewritten = re.sub(
-        r"""\sdata-source\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""",
-        "",
-        rewritten,
-        flags=re.IGNORECASE,
-    )
-    # Remove legacy inline image sizing from authored HTML; docs.css owns defaults.
-    def _clean_style(match: re.Match) -> str:
-        quote = match.group(1)
-        style = match.group(2)
-        style = re.sub(r"max-width\s*:\s*800px\s*;?", "", style, flags=re.IGNORECASE)
-        style = re.sub(r"\s*;\s*;\s*", "; ", style)
-        style = re.sub(r"\s{2,}", " ", style).strip()
-        style = style.strip(";").strip()
-        if not style:
-            return ""
-        if not style.endswith(";"):
-            style = f"{style};"
-        return f" style={quote}{style}{quote}"
-
-    rewritten = re.sub(r"""\sstyle=(["'])(.*?)\1""", _clean_style, rewritten, flags=re.IGNORECASE)
-    return rewritten
-
-
-def _render_markdown(md_text: str, md_path: Path, pages_root: Path, assets_root: Path) -> str:
-    if _markdown is not None:
-        rendered = _markdown.markdown(md_text, extensions=["fenced_code", "tables", "toc"])
-        return _rewrite_links(rendered, md_path, pages_root, assets_root)
-
-    def _inline(s: str) -> str:
-        out = html.escape(s)
-        out = re.sub(r"`([^`]+)`", lambda m: f"<code>{m.group(1)}</code>", out)
-        out = re.sub(r"\*\*([^*]+)\*\*", r"<strong>\1</strong>", out)
-        out = re.sub(r"\*([^*]+)\*", r"<em>\1</em>", out)
-        out = re.sub(
-            r"!\[([^\]]*)\]\(([^)]+)\)",
-            lambda m: f'<img alt="{html.escape(m.group(1), quote=True)}" src="{html.escape(m.group(2), quote=True)}">',
-            out,
-        )
-        out = re.sub(
-            r"\[([^\]]+)\]\(([^)]+)\)",
-            lambda m: f'<a href="{html.escape(m.group(2), quote=True)}">{m.group(1)}</a>',
-            out,
-        )
-        return out
-
-    lines = md_text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
-    out: list[str] = []
-    paragraph: list[str] = []
-    in_ul = False
-    in_ol = False
-    in_code = False
-    code_lines: list[str] = []
-    in_raw_html = False
-    raw_html_lines: list[str] = []
-
-    def flush_paragraph() -> None:
-        nonlocal paragraph
-        if paragraph:
-            out.append(f"<p>{_inline(' '.join(paragraph).strip())}</p>")
-            paragraph = []
-
-    def close_list() -> None:
-        nonlocal in_ul, in_ol
-        if in_ul:
-            out.append("</ul>")
-            in_ul = False
-        if in_ol:
-            out.append("</ol>")
-            in_ol = False
-
-    for raw in lines:
-        line = raw.rstrip()
-        if line.strip().startswith("```"):
-            flush_paragraph()
-            close_list()
-            if not in_code:
-                in_code = True
-                code_lines = []
-            else:
-                out.append(f"<pre><code>{html.escape(chr(10).join(code_lines))}</code></pre>")
-                in_code = False
-                code_lines = []
-            continue
+    def _rewrite_tag(match: re.Match) -> str:
+        tag = match.group(0)
+        if tag.startswith("<!--"):
+            return tag
+        lower = tag.lower()
+        if "href=" in tag or "src=" in tag:
+            tag = _LINK_ATTR_RE.sub(_replace, tag)
+        if "data-source" in lower:
+            # Strip screenshot build directives from compiled output.
+            tag = _DATA_SOURCE_ATTR_RE.sub("", tag)
+        if "style=" in lower:
+            tag = _STYLE_ATTR_RE.sub(_clean_style, tag)
+        if images and lower.startswith("<img"):
+            src = _IMG_SRC_RE.search(tag)
+            if src:
+                entry = images.get(unquote(html.unescape(src.group(1))).removeprefix("./"))
+                if entry:
+                    tag = _picture(tag, entry)
+        return tag
+
+    return _TAG_RE.sub(_rewrite_tag, html_text)
+
+
+def _render_markdown(
+    md_text: str,
+    md_path: Path,
+    pages_root: Path,
+    assets_root: Path,
+    deps: dict[str, bool] | None = None,
+    tree_index: dict[str, bool] | None = None,
+    images: dict[str, dict] | None = None,
+) -> str:
+    rendered = _markdown_to_html(md_text)
+    return _rewrite_links(rendered, md_path, pages_root, assets_root, deps, tree_index, images)
 
-        if in_code:
-            code_lines.append(line)
-            continue
 
-        if in_raw_html:
-            raw_html_lines.append(line)
-            if ">" in line:
-                flush_paragraph()
-                close_list()
-                out.append("\n".join(raw_html_lines))
-                in_raw_html = False
-                raw_html_lines = []
-            continue
+def _markdown_to_html(md_text: str) -> str:
+    return markdown_render.render(md_text)
 
-        if not line.strip():
-            flush_paragraph()
-            close_list()
-            continue
 
-        heading = re.match(r"^(#{1,6})\s+(.*)$", line.strip())
-        if heading:
-            flush_paragraph()
-            close_list()
-            level = len(heading.group(1))
-            out.append(f"<h{level}>{_inline(heading.group(2).strip())}</h{level}>")
-            continue
+def check_markdown(root: Path) -> int:
+    """Compare the built-in renderer with python-markdown on every page; return the mismatch count."""
+    try:
+        import markdown  # type: ignore
+    except ImportError:
+        raise SystemExit("--check-markdown needs python-markdown: pip install markdown") from None
+    pages = _scan_pages(root / "pages")
+    mismatches = 0
+    for page in pages:
+        md_text = page["md_path"].read_text(encoding="utf-8")
+        expected = markdown.markdown(md_text, extensions=["fenced_code", "tables", "toc"])
+        if markdown_render.render(md_text) != expected:
+            mismatches += 1
+            print(f"Differs from python-markdown: pages/{page['path']}")
+    print(f"Checked {len(pages)} pages against python-markdown {markdown.__version__}: {mismatches} differ")
+    return mismatches
+
+
+# (pages_root, assets_root, tree_index, images) shared by every page of one render phase.
+_render_context: tuple[Path, Path, dict[str, bool], dict[str, dict]] | None = None
+
+
+def _init_render_worker(
+    pages_root: Path, assets_root: Path, tree_index: dict[str, bool], images: dict[str, dict]
+) -> None:
+    """Set what every page render shares; the --jobs pool runs this once per worker process."""
+    global _render_context
+    _render_context = (pages_root, assets_root, tree_index, images)
+
+
+def _render_page(task: tuple[str, Path]) -> tuple[dict, dict]:
+    """Render one page's html/plain/excerpt; a pure function so it can run in a worker process.
+
+    Needs _init_render_worker first. Returns the page fields plus
+    `{stage: (wall_s, cpu_s)}` timings for --profile.
+    """
+    md_text, md_path = task
+    pages_root, assets_root, tree_index, images = _render_context
+    deps: dict[str, bool] = {}
+    timings: dict[str, tuple[float, float]] = {}
+    clock = [time.perf_counter(), time.process_time()]
+
+    def _lap(stage: str) -> None:
+        wall, cpu = time.perf_counter(), time.process_time()
+        timings[stage] = (wall - clock[0], cpu - clock[1])
+        clock[0], clock[1] = wall, cpu
+
+    rendered = _markdown_to_html(md_text)
+    _lap("render.markdown")
+    page_html = _rewrite_links(rendered, md_path, pages_root, assets_root, deps, tree_index, images)
+    _lap("render.rewrite_links")
+    plain = _plain_text_from_markdown(md_text)
+    _lap("render.plain_text")
+    excerpt = _extract_excerpt(md_text)
+    _lap("render.excerpt")
+    fields = {"html": page_html, "plain": plain, "excerpt": excerpt, "deps": deps}
+    return fields, timings
 
-        bullet = re.match(r"^\s*[-*]\s+(.*)$", line)
-        if bullet:
-            flush_paragraph()
-            if in_ol:
-                out.append("</ol>")
-                in_ol = False
-            if not in_ul:
-                out.append("<ul>")
-                in_ul = True
-            out.append(f"<li>{_inline(bullet.group(1).strip())}</li>")
-            continue
 
-        ordered = re.match(r"^\s*\d+\.\s+(.*)$", line)
-        if ordered:
-            flush_paragraph()
-            if in_ul:
-                out.append("</ul>")
-                in_ul = False
-            if not in_ol:
-                out.append("<ol>")
-                in_ol = True
-            out.append(f"<li>{_inline(ordered.group(1).strip())}</li>")
-            continue
+def _build_tree(pages: list[dict]) -> list[dict]:
+    raw_tree: dict = {"children": {}, "pages": []}
+    for page in pages:
+        rel = Path(page["path"])
+        _insert_node(raw_tree, list(rel.parts), page)
+    return _normalize_tree(raw_tree)
 
-        if line.strip().startswith("<") and line.strip().endswith(">"):
-            flush_paragraph()
-            close_list()
-            out.append(line)
-            continue
 
-        if line.strip().startswith("<") and not line.strip().endswith(">"):
-            in_raw_html = True
-            raw_html_lines = [line]
-            continue
+def _renderer_fingerprint(images: dict[str, dict] | None = None) -> str:
+    """Identify everything besides page content that affects rendered output."""
+    h = hashlib.sha256()
+    h.update(f"cache-v{CACHE_VERSION}".encode("utf-8"))
+    h.update(Path(__file__).read_bytes())
+    h.update(Path(markdown_render.__file__).read_bytes())
+    if images:
+        h.update(json.dumps(images, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+@dataclass
+class PageCache:
+    """On-disk cache of rendered page fields keyed by content hash."""
+
+    path: Path | None
+    entries: dict[str, dict] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+
+    @classmethod
+    def load(cls, path: Path | None) -> "PageCache":
+        cache = cls(path=path)
+        if path is None or not path.exists():
+            return cache
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return cache
+        if isinstance(raw, dict) and raw.get("version") == CACHE_VERSION:
+            entries = raw.get("entries")
+            if isinstance(entries, dict):
+                cache.entries = entries
+        return cache
+
+    @staticmethod
+    def key_for(rel_path: str, md_text: str, fingerprint: str) -> str:
+        h = hashlib.sha256()
+        h.update(fingerprint.encode("utf-8"))
+        h.update(b"\0" + rel_path.encode("utf-8") + b"\0")
+        h.update(md_text.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(
+        self, rel_path: str, key: str, pages_root: Path, tree_index: dict[str, bool]
+    ) -> dict | None:
+        entry = self.entries.get(rel_path)
+        if isinstance(entry, dict) and entry.get("key") == key:
+            deps = entry.get("deps") or {}
+            prefix = os.path.normpath(pages_root)
+            # Link rewriting depends on which local targets exist, not just the page text.
+            if all(
+                (os.path.join(prefix, *dep.split("/")) in tree_index) == existed
+                for dep, existed in deps.items()
+            ):
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
 
-        paragraph.append(line.strip())
+    def put(self, rel_path: str, key: str, fields: dict) -> None:
+        self.entries[rel_path] = {"key": key, **fields}
+
+    def save(self, keep: set[str]) -> None:
+        self.entries = {k: v for k, v in self.entries.items() if k in keep}
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {"version": CACHE_VERSION, "entries": self.entries},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ),
+            encoding="utf-8",
+        )
+        tmp.replace(self.path)
 
-    if in_code:
-        out.append(f"<pre><code>{html.escape(chr(10).join(code_lines))}</code></pre>")
-    if in_raw_html and raw_html_lines:
-        out.append("\n".join(raw_html_lines))
-    flush_paragraph()
-    close_list()
-    return _rewrite_links("".join(out), md_path, pages_root, assets_root)
+    def stats_label(self) -> str:
+        if self.path is None:
+            return "cache disabled"
+        return f"cache {self.hits} hit / {self.misses} miss"
 
 
-def _build_tree(pages: list[dict]) -> list[dict]:
-    raw_tree: dict = {"children": {}, "pages": []}
+def _write_page_shards(
+    pages: list[dict], out_dir: Path, root: Path, profiler: Profiler
+) -> list[dict]:
+    """Write one content shard per page and return the slimmed manifest entries."""
+    manifest: list[dict] = []
+    written: set[Path] = set()
     for page in pages:
-        rel = Path(page["path"])
-        _insert_node(raw_tree, list(rel.parts), page)
-    return _normalize_tree(raw_tree)
+        shard_path = out_dir / f"{page['slug']}.json"
+        shard_path.parent.mkdir(parents=True, exist_ok=True)
+        shard_json = json.dumps(
+            {"slug": page["slug"], "html": page["html"], "plain": page["plain"]},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        profiler.write_text(shard_path, shard_json)
+        written.add(shard_path)
+        entry = {k: v for k, v in page.items() if k not in ("html", "plain")}
+        entry["shard"] = "./" + quote(shard_path.relative_to(root).as_posix(), safe="/")
+        manifest.append(entry)
+
+    # Drop shards for pages that were deleted or renamed.
+    for stale in out_dir.rglob("*.json"):
+        if stale not in written:
+            stale.unlink()
+            static_assets.clear_compressed(stale)
+    return manifest
+
+
+def _search_tokens(text: str) -> list[str]:
+    """Lowercase word tokens; hyphen/underscore compounds also yield their parts."""
+    tokens: list[str] = []
+    for token in _SEARCH_TOKEN_RE.findall(str(text or "").lower()):
+        tokens.append(token)
+        if "-" in token or "_" in token:
+            tokens.extend(part for part in _SEARCH_PART_RE.split(token) if part)
+    return tokens
+
+
+def _build_search_index(pages: list[dict]) -> dict:
+    """Build the inverted index shipped as search-index.json.
+
+    `postings` maps each term to a flat list of
+    `[doc, tf_title, tf_excerpt, tf_body, doc, ...]` so the JSON stays compact.
+    """
+    postings: dict[str, list[int]] = {}
+    lengths: list[list[int]] = []
+    for doc, page in enumerate(pages):
+        field_texts = (page.get("title", ""), page.get("excerpt", ""), page.get("plain", ""))
+        counts: dict[str, list[int]] = {}
+        doc_lengths = []
+        for i, text in enumerate(field_texts):
+            tokens = _search_tokens(text)
+            doc_lengths.append(len(tokens))
+            for token in tokens:
+                counts.setdefault(token, [0, 0, 0])[i] += 1
+        lengths.append(doc_lengths)
+        for term, tf in counts.items():
+            postings.setdefault(term, []).extend([doc, *tf])
+
+    n = max(len(pages), 1)
+    avg = [round(sum(row[i] for row in lengths) / n, 3) or 1 for i in range(len(SEARCH_FIELDS))]
+    return {
+        "version": SEARCH_INDEX_VERSION,
+        "fields": list(SEARCH_FIELDS),
+        "weights": list(SEARCH_FIELD_WEIGHTS),
+        "k1": SEARCH_BM25_K1,
+        "b": SEARCH_BM25_B,
+        "docs": [{"slug": p["slug"], "title": p.get("title", "")} for p in pages],
+        "lengths": lengths,
+        "avg": avg,
+        "postings": {term: postings[term] for term in sorted(postings)},
+    }
+
+
+def _search_expand(index: dict, terms: list[str], token: str, prefix: bool) -> list[tuple[str, float]]:
+    postings = index["postings"]
+    matches = [(token, 1.0)] if token in postings else []
+    if prefix:
+        start = bisect.bisect_left(terms, token)
+        for term in terms[start:start + SEARCH_PREFIX_LIMIT + 1]:
+            if not term.startswith(token):
+                break
+            if term != token:
+                matches.append((term, SEARCH_PREFIX_WEIGHT))
+    return matches
+
+
+def search_index(index: dict, query: str, limit: int = 120) -> list[tuple[str, float]]:
+    """Score pages for `query` with BM25F over the prebuilt index.
+
+    Mirrors queryIndex() in assets/js/search-core.js; returns `(slug, score)` pairs,
+    best first. The last query token also matches as a prefix, since the UI
+    searches while the user is typing.
+    """
+    q = str(query or "").strip().lower()
+    tokens = list(dict.fromkeys(_search_tokens(q)))
+    if not tokens:
+        return []
+    docs = index["docs"]
+    lengths = index["lengths"]
+    avg = index["avg"]
+    weights = index["weights"]
+    k1 = index["k1"]
+    b = index["b"]
+    n_docs = len(docs)
+    terms = list(index["postings"])
+
+    scores: dict[int, float] = {}
+    for pos, token in enumerate(tokens):
+        for term, boost in _search_expand(index, terms, token, prefix=pos == len(tokens) - 1):
+            flat = index["postings"][term]
+            df = len(flat) // 4
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for i in range(0, len(flat), 4):
+                doc = flat[i]
+                tf = 0.0
+                for f in range(3):
+                    raw = flat[i + 1 + f]
+                    if raw:
+                        norm = 1 - b + b * lengths[doc][f] / avg[f]
+                        tf += weights[f] * raw / norm
+                scores[doc] = scores.get(doc, 0.0) + boost * idf * tf / (k1 + tf)
+
+    for doc in list(scores):
+        # Whole-query title matches still win, as in the original substring search.
+        if q in str(docs[doc]["title"]).lower():
+            scores[doc] += 10.0
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], str(docs[item[0]]["title"]).lower()))
+    return [(docs[doc]["slug"], round(score, 4)) for doc, score in ranked[:limit]]
+
+
+def _cache_file(root: Path, cache_dir: Path | None) -> Path | None:
+    if cache_dir is None:
+        return None
+    if not cache_dir.is_absolute():
+        cache_dir = root / cache_dir
+    return cache_dir / "pages.json"
+
+
+def _asset_href(asset_urls: dict[str, str] | None, name: str) -> str:
+    """`./<name>`, or its fingerprinted copy when the asset stage produced one."""
+    return "./" + quote((asset_urls or {}).get(name, name), safe="/")
 
 
 def _render_index_html(
@@ -410,6 +694,7 @@ def _render_index_html(
     updated_label: str,
     generated_at_iso: str,
     title: str = "Pinball CTL Docs | Build, Test, and Run Homebrew Pinball",
+    asset_urls: dict[str, str] | None = None,
 ) -> str:
     description = (
         "Official Pinball CTL documentation with setup guides, feature walkthroughs, "
@@ -500,8 +785,8 @@ def _render_index_html(
   <meta name=\"twitter:description\" content=\"{html.escape(description, quote=True)}\">
   <meta name=\"twitter:image\" content=\"{og_image_url}\">
   <meta name=\"twitter:image:alt\" content=\"Pinball CTL Docs icon\">
-  <link rel=\"stylesheet\" href=\"./assets/css/style.css\">
-  <link rel=\"stylesheet\" href=\"./assets/css/docs.css\">
+  <link rel=\"stylesheet\" href=\"{_asset_href(asset_urls, "assets/css/style.css")}\">
+  <link rel=\"stylesheet\" href=\"{_asset_href(asset_urls, "assets/css/docs.css")}\">
   <script type=\"application/ld+json\">{schema_json}</script>
 </head>
 <body>
@@ -585,13 +870,13 @@ def _render_index_html(
     </div>
   </div>
 
-  <script id=\"site-data-inline\" type=\"application/json\">{embedded_data_json}</script>\n  <script src=\"./assets/js/main.js\"></script>
+  <script id=\"site-data-inline\" type=\"application/json\">{embedded_data_json}</script>\n  <script src=\"{_asset_href(asset_urls, "assets/js/search-core.js")}\"></script>\n  <script src=\"{_asset_href(asset_urls, "assets/js/main.js")}\"></script>
 </body>
 </html>
 """
 
 
-def _render_404_html(updated_label: str) -> str:
+def _render_404_html(updated_label: str, asset_urls: dict[str, str] | None = None) -> str:
     return f"""<!DOCTYPE html>
 <html lang=\"en\">
 <head>
@@ -602,8 +887,8 @@ def _render_404_html(updated_label: str) -> str:
   <meta name=\"robots\" content=\"noindex,follow\">
   <meta name=\"theme-color\" content=\"#071019\">
   <link rel=\"icon\" type=\"image/svg+xml\" href=\"./assets/favicon.svg\">
-  <link rel=\"stylesheet\" href=\"./assets/css/style.css\">
-  <link rel=\"stylesheet\" href=\"./assets/css/docs.css\">
+  <link rel=\"stylesheet\" href=\"{_asset_href(asset_urls, "assets/css/style.css")}\">
+  <link rel=\"stylesheet\" href=\"{_asset_href(asset_urls, "assets/css/docs.css")}\">
   <style>
     body {{
       background:
@@ -693,17 +978,34 @@ def _render_404_html(updated_label: str) -> str:
 """
 
 
-def build(root: Path, website_root: Path | None = None) -> None:
+def build(
+    root: Path,
+    website_root: Path | None = None,
+    cache_dir: Path | None = DEFAULT_CACHE_DIR,
+    cache: PageCache | None = None,
+    shards: bool = False,
+    jobs: int = 1,
+    file_index: FileIndex | None = None,
+    profiler: Profiler | None = None,
+    fingerprints: bool = False,
+    compress: bool = False,
+) -> None:
+    if profiler is None:
+        profiler = Profiler("build-docs", enabled=False)
     pages_root = root / "pages"
     assets_root = root / "assets"
     out_html = root / "index.html"
     out_404 = root / "404.html"
     out_data = root / "site-data.json"
+    out_search = root / "search-index.json"
+    out_shards = root / "site-data" / "pages"
     css_dir = root / "assets" / "css"
     js_dir = root / "assets" / "js"
     out_style = css_dir / "style.css"
     out_docs_css = css_dir / "docs.css"
     out_main_js = js_dir / "main.js"
+    out_search_core = js_dir / "search-core.js"
+    out_search_worker = js_dir / "search-worker.js"
 
     if not pages_root.exists():
         raise FileNotFoundError(f"pages directory not found: {pages_root}")
@@ -716,50 +1018,327 @@ def build(root: Path, website_root: Path | None = None) -> None:
     if website_root is not None:
         website_style = website_root / "style.css"
         if website_style.exists():
-            out_style.write_text(website_style.read_text(encoding="utf-8"), encoding="utf-8")
+            style_text = website_style.read_text(encoding="utf-8")
+            # Only touch the synced copy when it differs so --watch does not see its own writes.
+            if not out_style.exists() or out_style.read_text(encoding="utf-8") != style_text:
+                out_style.write_text(style_text, encoding="utf-8")
 
     if not out_docs_css.exists():
         raise FileNotFoundError(f"docs.css missing: {out_docs_css}")
-    if not out_main_js.exists():
-        raise FileNotFoundError(f"main.js missing: {out_main_js}")
-
-    pages = _scan_pages(pages_root)
+    for script in (out_main_js, out_search_core, out_search_worker):
+        if not script.exists():
+            raise FileNotFoundError(f"{script.name} missing: {script}")
+
+    with profiler.phase("scan"):
+        if file_index is None:
+            file_index = FileIndex(pages_root, assets_root)
+        pages = _scan_pages(pages_root, file_index)
     if not pages:
         raise RuntimeError("No markdown files found under pages/")
 
+    with profiler.phase("cache.lookup"):
+        if cache is None:
+            cache = PageCache.load(_cache_file(root, cache_dir))
+        cache.hits = cache.misses = 0
+        # Only advertise variants that exist, e.g. not while rebuild-all.py has cleared media/.
+        images = prune_image_manifest(load_image_manifest(root / IMAGE_MANIFEST), root)
+        fingerprint = _renderer_fingerprint(images)
+        tree_index = file_index.kinds
+
+        misses: list[tuple[dict, str, str]] = []
+        for page in pages:
+            md_text = file_index.read_text(page["md_path"])
+            key = PageCache.key_for(page["path"], md_text, fingerprint)
+            cached = cache.get(page["path"], key, pages_root, tree_index)
+            if cached is not None:
+                page["html"] = cached["html"]
+                page["plain"] = cached["plain"]
+                page["excerpt"] = cached["excerpt"]
+                if "render_s" in cached:
+                    # Keeps the slowest-pages report meaningful on warm-cache builds.
+                    profiler.record("pages", f"{page['path']} (cached)", cached["render_s"])
+            else:
+                misses.append((page, key, md_text))
+
+    tasks = [(md_text, page["md_path"]) for page, _key, md_text in misses]
+    # Sent once per worker rather than pickled into every task.
+    context = (pages_root, assets_root, tree_index, images)
+    with profiler.phase("render"):
+        if jobs > 1 and len(tasks) > 1:
+            workers = min(jobs, len(tasks))
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_render_worker, initargs=context
+            ) as pool:
+                # map() yields in submission order, so output matches a serial build.
+                rendered = list(pool.map(_render_page, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+        else:
+            _init_render_worker(*context)
+            rendered = [_render_page(task) for task in tasks]
+
+    for (page, key, _md_text), (fields, timings) in zip(misses, rendered):
+        page["html"] = fields["html"]
+        page["plain"] = fields["plain"]
+        page["excerpt"] = fields["excerpt"]
+        render_s = sum(wall for wall, _cpu in timings.values())
+        cache.put(page["path"], key, {**fields, "render_s": round(render_s, 6)})
+        for stage, (wall_s, cpu_s) in timings.items():
+            profiler.add_phase(stage, wall_s, cpu_s)
+        profiler.record("pages", page["path"], render_s)
     for page in pages:
-        md_text = page["md_path"].read_text(encoding="utf-8")
-        page["html"] = _render_markdown(md_text, page["md_path"], pages_root, assets_root)
-        page["plain"] = _plain_text_from_markdown(md_text)
-        page["excerpt"] = _extract_excerpt(md_text)
         page.pop("md_path", None)
+    with profiler.phase("cache.save"):
+        cache.save({page["path"] for page in pages})
 
-    tree = _build_tree(pages)
+    with profiler.phase("tree"):
+        tree = _build_tree(pages)
     default = next((p for p in pages if p["slug"] == "README"), None)
     if default is None:
         default = next((p for p in pages if p["slug"].split("/")[-1].lower() == "readme"), None)
     default_slug = (default or pages[0])["slug"]
 
+    if shards:
+        with profiler.phase("write.shards"):
+            manifest_pages = _write_page_shards(pages, out_shards, root, profiler)
+    else:
+        manifest_pages = pages
+        # Shards from an earlier --shards build would otherwise be published stale.
+        if out_shards.exists():
+            shutil.rmtree(out_shards)
+            if not any(out_shards.parent.iterdir()):
+                out_shards.parent.rmdir()
+
+    with profiler.phase("search_index"):
+        search = _build_search_index(pages)
+        profiler.write_text(out_search, json.dumps(search, ensure_ascii=False, separators=(",", ":")))
+
+    # Referenced assets, keyed by site-relative path; values are what pages link to.
+    asset_urls: dict[str, str] = {}
+    with profiler.phase("assets.fingerprint"):
+        for src in (out_style, out_docs_css, out_main_js, out_search_core, out_search_worker, out_search):
+            name = src.relative_to(root).as_posix()
+            if fingerprints and src.exists():
+                asset_urls[name] = static_assets.fingerprint(src).relative_to(root).as_posix()
+            else:
+                static_assets.clear_fingerprints(src)
+                asset_urls[name] = name
+
     build_now = datetime.now(timezone.utc)
     payload = {
         "generated_at": build_now.isoformat(),
         "default_slug": default_slug,
         "tree": tree,
-        "pages": pages,
+        "pages": manifest_pages,
+        "search_index": _asset_href(asset_urls, "search-index.json"),
+        "search_core": _asset_href(asset_urls, "assets/js/search-core.js"),
+        "search_worker": _asset_href(asset_urls, "assets/js/search-worker.js"),
     }
 
-    payload_json = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
-    out_data.write_text(payload_json, encoding="utf-8")
+    with profiler.phase("write.site_data"):
+        payload_json = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        profiler.write_text(out_data, payload_json)
     updated_label = build_now.strftime("%Y-%m-%d %H:%M UTC")
-    out_html.write_text(
-        _render_index_html(payload_json, updated_label, build_now.isoformat()),
-        encoding="utf-8",
-    )
-    out_404.write_text(_render_404_html(updated_label), encoding="utf-8")
+    with profiler.phase("write.html"):
+        profiler.write_text(
+            out_html,
+            _render_index_html(payload_json, updated_label, build_now.isoformat(), asset_urls=asset_urls),
+        )
+        profiler.write_text(out_404, _render_404_html(updated_label, asset_urls))
+
+    text_outputs = [out_html, out_404, out_data] + [root / name for name in asset_urls.values()]
+    if shards:
+        text_outputs.extend(sorted(out_shards.rglob("*.json")))
+    compressed = {".gz": 0, ".br": 0}
+    with profiler.phase("assets.compress"):
+        for path in text_outputs:
+            if not path.exists():
+                continue
+            if not compress:
+                static_assets.clear_compressed(path)
+                continue
+            for suffix, size in static_assets.precompress(path).items():
+                compressed[suffix] += size
+                profiler.wrote(path.with_name(path.name + suffix), size)
+    profiler.extra["pages"] = {"total": len(pages), "cache_hits": cache.hits, "cache_misses": cache.misses}
 
     print(f"Built {out_html}")
     print(f"Built {out_404}")
-    print(f"Built {out_data} ({len(pages)} pages)")
+    print(f"Built {out_data} ({len(pages)} pages, {cache.stats_label()})")
+    if shards:
+        print(f"Built {out_shards} ({len(pages)} shards)")
+    print(f"Built {out_search} ({len(search['postings'])} terms)")
+    if fingerprints:
+        hashed = [url for name, url in asset_urls.items() if url != name]
+        print(f"Fingerprinted {len(hashed)} assets: {', '.join(Path(url).name for url in hashed)}")
+    if compress:
+        raw = sum(p.stat().st_size for p in text_outputs if p.exists())
+        br = f", br {compressed['.br'] // 1024} KB" if static_assets.brotli_available() else " (brotli not installed)"
+        print(f"Precompressed {len(text_outputs)} files: {raw // 1024} KB -> gz {compressed['.gz'] // 1024} KB{br}")
+
+
+def _is_watched_file(path: Path) -> bool:
+    name = path.name
+    if name.startswith((".", "#")) or name.endswith(("~", ".swp", ".swx", ".tmp")):
+        return False
+    # Hashed copies and .gz/.br siblings are build outputs, not edits.
+    return not static_assets.is_derived(name)
+
+
+def _snapshot(dirs: list[Path], files: list[Path] = ()) -> dict[Path, tuple[int, int]]:
+    snap: dict[Path, tuple[int, int]] = {}
+    for path in files:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        snap[path] = (st.st_mtime_ns, st.st_size)
+    for base in dirs:
+        for dirpath, _dirnames, filenames in os.walk(base):
+            for name in filenames:
+                path = Path(dirpath) / name
+                if not _is_watched_file(path):
+                    continue
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                snap[path] = (st.st_mtime_ns, st.st_size)
+    return snap
+
+
+def _snapshot_diff(old: dict, new: dict) -> set[Path]:
+    return {p for p in old.keys() | new.keys() if old.get(p) != new.get(p)}
+
+
+def _watch_polling(dirs: list[Path], interval: float, debounce: float, files: list[Path] = ()):
+    prev = _snapshot(dirs, files)
+    while True:
+        time.sleep(interval)
+        cur = _snapshot(dirs, files)
+        changed = _snapshot_diff(prev, cur)
+        if not changed:
+            continue
+        # Coalesce bursts of saves: wait until the tree has been quiet for `debounce`.
+        quiet_since = time.monotonic()
+        while time.monotonic() - quiet_since < debounce:
+            time.sleep(min(interval, debounce))
+            nxt = _snapshot(dirs, files)
+            more = _snapshot_diff(cur, nxt)
+            if more:
+                changed |= more
+                cur = nxt
+                quiet_since = time.monotonic()
+        prev = cur
+        yield changed
+
+
+def _watch_inotify(dirs: list[Path], debounce: float, files: list[Path] = ()):
+    inotify = _INotify()
+    mask = (
+        _inotify_flags.CREATE
+        | _inotify_flags.CLOSE_WRITE
+        | _inotify_flags.DELETE
+        | _inotify_flags.MOVED_FROM
+        | _inotify_flags.MOVED_TO
+    )
+    watched: dict[int, Path] = {}
+
+    def _add_tree(base: Path) -> None:
+        for dirpath, _dirnames, _filenames in os.walk(base):
+            watched[inotify.add_watch(dirpath, mask)] = Path(dirpath)
+
+    for base in dirs:
+        _add_tree(base)
+    # Single files are watched through their directory, without descending into it.
+    single: dict[int, set[str]] = {}
+    for path in files:
+        wd = inotify.add_watch(str(path.parent), mask)
+        if wd in watched and wd not in single:
+            continue  # already watched as part of a tree
+        single.setdefault(wd, set()).add(path.name)
+        watched[wd] = path.parent
+
+    while True:
+        changed: set[Path] = set()
+        events = inotify.read()
+        while events:
+            for event in events:
+                parent = watched.get(event.wd)
+                if parent is None or not event.name:
+                    continue
+                path = parent / event.name
+                if event.wd in single and event.name not in single[event.wd]:
+                    continue
+                if event.mask & _inotify_flags.ISDIR:
+                    if event.mask & (_inotify_flags.CREATE | _inotify_flags.MOVED_TO):
+                        _add_tree(path)
+                    changed.add(path)
+                elif _is_watched_file(path):
+                    changed.add(path)
+            events = inotify.read(timeout=int(debounce * 1000))
+        if changed:
+            yield changed
+
+
+def watch(
+    root: Path,
+    website_root: Path | None = None,
+    cache_dir: Path | None = DEFAULT_CACHE_DIR,
+    interval: float = 0.25,
+    debounce: float = 0.15,
+    shards: bool = False,
+    jobs: int = 1,
+    fingerprints: bool = False,
+    compress: bool = False,
+) -> None:
+    """Build once, then rebuild whenever pages/ or docs css/js change.
+
+    The page cache stays in memory between rebuilds, so only edited pages are
+    re-rendered.
+    """
+    cache = PageCache.load(_cache_file(root, cache_dir))
+    file_index = FileIndex(root / "pages", root / "assets")
+
+    def _rebuild() -> None:
+        build(
+            root,
+            website_root=website_root,
+            cache=cache,
+            shards=shards,
+            jobs=jobs,
+            file_index=file_index,
+            fingerprints=fingerprints,
+            compress=compress,
+        )
+
+    _rebuild()
+
+    dirs = [root / "pages", root / "assets" / "css", root / "assets" / "js"]
+    dirs = [d for d in dirs if d.exists()]
+    # Only style.css is read from the website repo; don't walk its node_modules/.git.
+    files = [website_root / "style.css"] if website_root is not None and website_root.is_dir() else []
+    if _INotify is not None:
+        mode = "inotify"
+        changes = _watch_inotify(dirs, debounce, files)
+    else:
+        mode = "polling"
+        changes = _watch_polling(dirs, interval, debounce, files)
+    print(f"Watching {', '.join(str(p) for p in dirs + files)} ({mode}); Ctrl+C to stop")
+
+    try:
+        for changed in changes:
+            labels = sorted(str(p.relative_to(root)) if p.is_relative_to(root) else str(p) for p in changed)
+            shown = ", ".join(labels[:5]) + (f" (+{len(labels) - 5} more)" if len(labels) > 5 else "")
+            print(f"Changed: {shown}")
+            started = time.perf_counter()
+            file_index.refresh(changed)
+            try:
+                _rebuild()
+            except Exception as exc:
+                print(f"Build failed: {exc}", file=sys.stderr)
+                continue
+            print(f"Rebuilt in {(time.perf_counter() - started) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        print("Stopped watching")
 
 
 def main() -> None:
@@ -771,10 +1350,111 @@ def main() -> None:
         default=Path(__file__).resolve().parents[2] / "pinballctl-website",
         help="Website repo root used to copy style.css for matching layout",
     )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help="Rendered page cache directory (relative paths are under --root)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Render every page from scratch")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and rebuild when pages/ or assets/css|js change",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=0.25,
+        help="Seconds between scans when inotify is unavailable (--watch)",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.15,
+        help="Quiet period in seconds that ends a burst of changes (--watch)",
+    )
+    parser.add_argument(
+        "--shards",
+        action="store_true",
+        help="Emit a small manifest plus one content shard per page (loaded on demand)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Render pages in N worker processes (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--no-fingerprint",
+        action="store_true",
+        help="Link css/js/search index under their plain names instead of content-hashed copies",
+    )
+    parser.add_argument(
+        "--no-precompress",
+        action="store_true",
+        help="Skip writing .gz/.br siblings of the generated files",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Write a JSON timing report (default .cache/profile/build-docs.json)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Also dump cProfile stats for the build to PATH",
+    )
+    parser.add_argument(
+        "--check-markdown",
+        action="store_true",
+        help="Render every page with python-markdown too and report pages whose HTML differs",
+    )
     args = parser.parse_args()
 
+    if args.check_markdown:
+        raise SystemExit(1 if check_markdown(args.root.resolve()) else 0)
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
     website_root = args.website_root if args.website_root.exists() else None
-    build(args.root.resolve(), website_root=website_root)
+    cache_dir = None if args.no_cache else args.cache_dir
+    if args.watch:
+        watch(
+            args.root.resolve(),
+            website_root=website_root,
+            cache_dir=cache_dir,
+            interval=args.poll_interval,
+            debounce=args.debounce,
+            shards=args.shards,
+            jobs=jobs,
+            fingerprints=not args.no_fingerprint,
+            compress=not args.no_precompress,
+        )
+        return
+    root = args.root.resolve()
+    report_path = profile_path(args.profile, root, "build-docs")
+    profiler = Profiler("build-docs", enabled=report_path is not None)
+    run_profiled(
+        lambda: build(
+            root,
+            website_root=website_root,
+            cache_dir=cache_dir,
+            shards=args.shards,
+            jobs=jobs,
+            profiler=profiler,
+            fingerprints=not args.no_fingerprint,
+            compress=not args.no_precompress,
+        ),
+        args.cprofile,
+    )
+    if report_path is not None:
+        profiler.write(report_path)
 
 
 if __name__ == "__main__":
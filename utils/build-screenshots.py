@@ -26,18 +26,46 @@ Supported keys:
     - value: value for type action
     - timeout_ms: optional wait timeout override
     - wait_for: optional selector to wait for after step
+- mask: selector or list of selectors for volatile regions (clocks, counters)
+  that --compare ignores when deciding whether a shot changed
 """
 from __future__ import annotations
 
 import argparse
+import asyncio
+import fnmatch
+import hashlib
+import hmac
 import html
 import json
+import math
+import os
+import queue
 import re
+import secrets
+import subprocess
 import sys
-from dataclasses import dataclass
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Any
-from urllib.parse import urljoin
+from typing import Any, Awaitable, Callable, Iterator
+from urllib.error import URLError
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request, urlopen
+
+from build_profile import Profiler, profile_path, run_profiled
+from file_index import FileIndex
+from image_pipeline import (
+    IMAGE_MANIFEST,
+    avif_supported,
+    image_diff,
+    optimize_images,
+    pillow_available,
+)
 
 ROOT = Path(__file__).resolve().parents[1]
 PAGES = ROOT / "pages"
@@ -51,6 +79,23 @@ DEFAULT_PASSWORD = "password"
 DEFAULT_TIMEOUT_MS = 10000
 DEFAULT_VIEWPORT_WIDTH = 1440
 DEFAULT_VIEWPORT_HEIGHT = 900
+DEFAULT_DIFF_THRESHOLD = 0.001
+DEFAULT_SHOT_BUDGET_MS = 60000
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF_S = 0.5
+# Consecutive shots failing to load before the rest fail fast, and how long until one may probe again.
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN_S = 30.0
+SESSION_CACHE = Path(".cache") / "build-screenshots" / "sessions.json"
+DAEMON_STATE = Path(".cache") / "build-screenshots" / "daemon.json"
+DEFAULT_RERUN = Path(".cache") / "build-screenshots" / "rerun.json"
+DEFAULT_REPORT = Path(".cache") / "build-screenshots" / "report.json"
+REPORT_VERSION = 1
+DEFAULT_MANIFEST = Path(".cache") / "build-screenshots" / "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_HAR = Path(".cache") / "build-screenshots" / "fixtures.har"
+# DOM must be free of mutations this long before a shot counts as settled.
+READY_QUIET_MS = 100
 
 
 @dataclass
@@ -71,6 +116,7 @@ class ShotPlan:
     dark_toggle: str | None
     settle_ms: int
     highlight: list[dict[str, str]]
+    mask: list[str]
     click: list[Any]
     username_selector: str
     password_selector: str
@@ -118,10 +164,17 @@ def _parse_data_source(raw_value: str, source: str, line: int) -> dict[str, Any]
     return {"url": value}
 
 
-def parse_directives(pages_root: Path, docs_root: Path) -> list[tuple[dict[str, Any], str, int]]:
+def parse_directives(
+    pages_root: Path,
+    docs_root: Path,
+    file_index: FileIndex | None = None,
+) -> list[tuple[dict[str, Any], str, int]]:
     plans: list[tuple[dict[str, Any], str, int]] = []
-    for md in sorted(pages_root.rglob("*.md")):
-        text = md.read_text(encoding="utf-8")
+    if file_index is None:
+        file_index = FileIndex(pages_root)
+    for entry in file_index.files(pages_root, ".md"):
+        md = entry.path
+        text = entry.read_text()
         source = md.relative_to(docs_root).as_posix()
 
         for match in SHOT_RE.finditer(text):
@@ -238,6 +291,12 @@ def build_plan(
         style = entry.get("style") or "border: 4px solid red;"
         highlight.append({"selector": str(selector), "style": str(style)})
 
+    mask_raw = spec.get("mask", [])
+    if isinstance(mask_raw, str):
+        mask_raw = [mask_raw]
+    if not isinstance(mask_raw, list) or not all(isinstance(m, str) and m for m in mask_raw):
+        raise ValueError(f"{source}:{line} 'mask' must be a selector or list of selectors")
+
     click = spec.get("click", [])
     if not isinstance(click, list):
         raise ValueError(f"{source}:{line} 'click' must be a list")
@@ -259,6 +318,7 @@ def build_plan(
         dark_toggle=dark_toggle,
         settle_ms=settle_ms,
         highlight=highlight,
+        mask=list(mask_raw),
         click=click,
         username_selector=str(spec.get("username_selector", "input[name='username']")),
         password_selector=str(spec.get("password_selector", "input[name='password']")),
@@ -267,63 +327,217 @@ def build_plan(
     )
 
 
-def _first_visible_selector(page: Any, selectors: list[str], timeout_ms: int) -> str | None:
+def _changed_sources(docs_root: Path, ref: str) -> set[str]:
+    """Markdown files under pages/ that differ from `ref` (committed, staged, unstaged or untracked)."""
+    commands = [
+        ["git", "diff", "--name-only", "--relative", ref, "--", "pages"],
+        ["git", "ls-files", "--others", "--exclude-standard", "--", "pages"],
+    ]
+    changed: set[str] = set()
+    for cmd in commands:
+        proc = subprocess.run(cmd, cwd=docs_root, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise SystemExit(f"--changed-since {ref}: {' '.join(cmd[:2])} failed: {proc.stderr.strip()}")
+        changed.update(line for line in proc.stdout.splitlines() if line.endswith(".md"))
+    return changed
+
+
+def _source_matches(source: str, only: list[Path], docs_root: Path) -> bool:
+    path = (docs_root / source).resolve()
+    return any(path == o or path.is_relative_to(o) for o in only)
+
+
+def select_plans(
+    plans: list[ShotPlan],
+    docs_root: Path,
+    only: list[str] | None = None,
+    output_globs: list[str] | None = None,
+    changed_since: str | None = None,
+    rerun: set[tuple[str, int]] | None = None,
+) -> list[ShotPlan]:
+    """Narrow plans to the requested pages/outputs; every filter given must match.
+
+    `only` takes markdown files or directories (relative to the cwd or the
+    docs root), `output_globs` fnmatch patterns against root-relative outputs,
+    `rerun` (source, line) pairs from a rerun file.
+    Directives that write an output shared with a selected one are kept too,
+    so multi-step outputs are never half rebuilt.
+    """
+    selected = plans
+    if only:
+        paths = []
+        for value in only:
+            path = Path(value)
+            if not path.is_absolute() and not path.exists():
+                path = docs_root / path
+            paths.append(path.resolve())
+        selected = [plan for plan in selected if _source_matches(plan.source, paths, docs_root)]
+    if output_globs:
+
+        def _name(plan: ShotPlan) -> str:
+            try:
+                return plan.output.resolve().relative_to(docs_root).as_posix()
+            except ValueError:
+                return plan.output.as_posix()
+
+        selected = [
+            plan
+            for plan in selected
+            if any(fnmatch.fnmatchcase(_name(plan), pattern) for pattern in output_globs)
+        ]
+    if changed_since:
+        changed = _changed_sources(docs_root, changed_since)
+        selected = [plan for plan in selected if plan.source in changed]
+    if rerun is not None:
+        selected = [plan for plan in selected if (plan.source, plan.line) in rerun]
+    outputs = {plan.output.resolve() for plan in selected}
+    return [plan for plan in plans if plan.output.resolve() in outputs]
+
+
+def _read_rerun(path: Path) -> list[dict[str, Any]]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    shots = data.get("shots") if isinstance(data, dict) else None
+    return shots if isinstance(shots, list) else []
+
+
+def load_rerun(path: Path) -> set[tuple[str, int]]:
+    try:
+        shots = _read_rerun(path)
+    except (OSError, ValueError) as exc:
+        raise SystemExit(f"Cannot read rerun file {path}: {exc}") from exc
+    return {(str(shot["source"]), int(shot["line"])) for shot in shots}
+
+
+def write_rerun(path: Path, attempted: list[ShotPlan], failed: list[ShotPlan]) -> None:
+    """Update the rerun file: attempted directives drop out unless they failed again.
+
+    Entries for directives this run did not attempt (outside a --only
+    selection, or skipped as existing or unchanged) are kept; the file is
+    removed once nothing is left to rerun.
+    """
+    try:
+        previous = _read_rerun(path)
+    except (OSError, ValueError):
+        previous = []
+    attempted_keys = {(plan.source, plan.line) for plan in attempted}
+    shots = [shot for shot in previous if (shot.get("source"), shot.get("line")) not in attempted_keys]
+    shots += [{"source": plan.source, "line": plan.line, "output": os.fspath(plan.output)} for plan in failed]
+    if not shots:
+        path.unlink(missing_ok=True)
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"shots": shots}, indent=2) + "\n", encoding="utf-8")
+
+
+async def _first_visible_selector(page: Any, selectors: list[str], timeout_ms: int) -> str | None:
     for sel in selectors:
         try:
-            page.wait_for_selector(sel, timeout=timeout_ms, state="visible")
+            await page.wait_for_selector(sel, timeout=timeout_ms, state="visible")
             return sel
         except Exception:
             continue
     return None
 
 
-def _run_login(page: Any, plan: ShotPlan, timeout_ms: int) -> None:
-    user_sel = _first_visible_selector(
-        page,
-        [
-            plan.username_selector,
-            "#username",
-            "input[type='text']",
-            "input[name='user']",
-        ],
-        timeout_ms,
-    )
-    pass_sel = _first_visible_selector(
-        page,
-        [
-            plan.password_selector,
-            "#password",
-            "input[type='password']",
-            "input[name='pass']",
-        ],
-        timeout_ms,
+_ALT_SUBMIT_SELECTORS = [
+    "button[type='submit']",
+    "button:has-text('Sign in')",
+    "button:has-text('Login')",
+    "input[type='submit']",
+]
+
+
+def _login_field_selectors(plan: ShotPlan) -> tuple[list[str], list[str]]:
+    return (
+        [plan.username_selector, "#username", "input[type='text']", "input[name='user']"],
+        [plan.password_selector, "#password", "input[type='password']", "input[name='pass']"],
     )
+
+
+class NavigationError(RuntimeError):
+    """page.goto failed (refused, reset, DNS, timed out); the shot may be retried."""
+
+
+class ShotTimeout(RuntimeError):
+    """The shot used up its --shot-budget-ms."""
+
+
+class ShotClock:
+    """Wall-clock allowance and step timings for one shot.
+
+    Each wait gets at most what is left of the budget (`ms`), and `step`
+    records how long every part of the shot took, for the capture report.
+    """
+
+    def __init__(self, budget_ms: int) -> None:
+        self.budget_ms = budget_ms
+        self.deadline = time.monotonic() + budget_ms / 1000 if budget_ms > 0 else None
+        self.attempt = 0
+        self.steps: list[dict[str, Any]] = []
+
+    @contextmanager
+    def step(self, name: str, target: str | None = None) -> Iterator[None]:
+        started = time.perf_counter()
+        record: dict[str, Any] = {"step": name}
+        if target:
+            record["target"] = target
+        if self.attempt:
+            record["attempt"] = self.attempt
+        try:
+            yield
+        except BaseException:
+            record["failed"] = True
+            raise
+        finally:
+            record["ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.steps.append(record)
+
+    def remaining_s(self) -> float:
+        if self.deadline is None:
+            return math.inf
+        return self.deadline - time.monotonic()
+
+    def wait_s(self) -> float | None:
+        """Time left as an asyncio.wait_for timeout (None without a budget)."""
+        left = self.remaining_s()
+        return None if math.isinf(left) else max(left, 0.0)
+
+    def ms(self, timeout_ms: int) -> int:
+        """`timeout_ms` capped to the time left; raises ShotTimeout once none is."""
+        left = self.remaining_s()
+        if left <= 0:
+            raise ShotTimeout(f"shot budget of {self.budget_ms} ms exhausted")
+        return int(min(timeout_ms, left * 1000))
+
+
+async def _goto(page: Any, url: str, timeout_ms: int) -> None:
+    try:
+        await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+    except Exception as exc:
+        raise NavigationError(str(exc)) from exc
+
+
+async def _run_login(page: Any, plan: ShotPlan, timeout_ms: int) -> None:
+    user_candidates, pass_candidates = _login_field_selectors(plan)
+    user_sel = await _first_visible_selector(page, user_candidates, timeout_ms)
+    pass_sel = await _first_visible_selector(page, pass_candidates, timeout_ms)
     if not user_sel or not pass_sel:
         raise RuntimeError("Login requested but could not find username/password fields")
 
-    page.fill(user_sel, plan.username or "")
-    page.fill(pass_sel, plan.password or "")
+    await page.fill(user_sel, plan.username or "")
+    await page.fill(pass_sel, plan.password or "")
 
     try:
-        page.click(plan.submit_selector, timeout=timeout_ms)
+        await page.click(plan.submit_selector, timeout=timeout_ms)
     except Exception:
-        alt_submit = _first_visible_selector(
-            page,
-            [
-                "button[type='submit']",
-                "button:has-text('Sign in')",
-                "button:has-text('Login')",
-                "input[type='submit']",
-            ],
-            timeout_ms,
-        )
+        alt_submit = await _first_visible_selector(page, _ALT_SUBMIT_SELECTORS, timeout_ms)
         if not alt_submit:
             raise RuntimeError("Login requested but could not find submit button")
-        page.click(alt_submit, timeout=timeout_ms)
+        await page.click(alt_submit, timeout=timeout_ms)
 
 
-def _run_click_steps(page: Any, plan: ShotPlan, timeout_ms: int) -> None:
-    username_selectors = {
+def _username_selectors(plan: ShotPlan) -> set[str]:
+    return {
         plan.username_selector,
         "input[name='username']",
         'input[name="username"]',
@@ -332,7 +546,10 @@ def _run_click_steps(page: Any, plan: ShotPlan, timeout_ms: int) -> None:
         'input[name="user"]',
         "input[type='text']",
     }
-    password_selectors = {
+
+
+def _password_selectors(plan: ShotPlan) -> set[str]:
+    return {
         plan.password_selector,
         "input[name='password']",
         'input[name="password"]',
@@ -342,10 +559,72 @@ def _run_click_steps(page: Any, plan: ShotPlan, timeout_ms: int) -> None:
         "input[type='password']",
     }
 
-    for idx, step in enumerate(plan.click, start=1):
+
+def _submit_selectors(plan: ShotPlan) -> set[str]:
+    return {
+        plan.submit_selector,
+        "button[type='submit']",
+        'button[type="submit"]',
+        "input[type='submit']",
+        'input[type="submit"]',
+    }
+
+
+def _login_prefix(plan: ShotPlan) -> int:
+    """Length of the leading type-username/type-password/submit steps, or 0.
+
+    Only a prefix whose submit step has a `wait_for` counts: that selector is
+    how a reused session proves the page is already past the login form.
+    """
+    steps = plan.click[:3]
+    if len(steps) < 3 or not all(isinstance(s, dict) for s in steps):
+        return 0
+    user, pwd, submit = steps
+    if (
+        str(user.get("action", "click")).strip().lower() != "type"
+        or user.get("selector") not in _username_selectors(plan)
+        or user.get("value", plan.username) != plan.username
+    ):
+        return 0
+    if (
+        str(pwd.get("action", "click")).strip().lower() != "type"
+        or pwd.get("selector") not in _password_selectors(plan)
+        or pwd.get("value", plan.password) != plan.password
+    ):
+        return 0
+    if (
+        str(submit.get("action", "click")).strip().lower() != "click"
+        or submit.get("selector") not in _submit_selectors(plan)
+        or not submit.get("wait_for")
+    ):
+        return 0
+    return 3
+
+
+@dataclass
+class ClickStep:
+    action: str  # "click" | "wait" | "type" | "hover" | "goto" (selector holds the URL)
+    selector: str
+    timeout_ms: int
+    value: str = ""
+    wait_for: str | None = None
+    wait_visible: bool = False
+
+    @property
+    def key(self) -> tuple[str, str, str, str, bool]:
+        """What the step does to the page; timeouts don't matter for chaining."""
+        return (self.action, self.selector, self.value, self.wait_for or "", self.wait_visible)
+
+
+def _click_steps(plan: ShotPlan, timeout_ms: int, start: int = 0, stop: int | None = None) -> list[ClickStep]:
+    """Validate and normalise `plan.click[start:stop]`."""
+    username_selectors = _username_selectors(plan)
+    password_selectors = _password_selectors(plan)
+    steps: list[ClickStep] = []
+
+    for idx, step in enumerate(plan.click[start:stop], start=start + 1):
         if isinstance(step, str):
-            page.wait_for_selector(step, timeout=timeout_ms, state="visible")
-            page.click(step, timeout=timeout_ms)
+            steps.append(ClickStep("click", step, timeout_ms, wait_visible=True))
             continue
 
         if not isinstance(step, dict):
@@ -355,25 +634,26 @@ def _run_click_steps(page: Any, plan: ShotPlan, timeout_ms: int) -> None:
         selector = step.get("selector")
         local_timeout = int(step.get("timeout_ms", timeout_ms))
 
-        if action == "click":
-            if not selector:
-                raise ValueError(
-                    f"{plan.source}:{plan.line} click step {idx} missing 'selector'"
-                )
-            page.click(str(selector), timeout=local_timeout)
-        elif action == "wait":
+        if action == "wait":
             wait_sel = step.get("wait_for") or selector
             if not wait_sel:
                 raise ValueError(
                     f"{plan.source}:{plan.line} wait step {idx} needs 'wait_for' or 'selector'"
                 )
-            page.wait_for_selector(str(wait_sel), timeout=local_timeout)
-        elif action == "type":
-            if not selector:
-                raise ValueError(
-                    f"{plan.source}:{plan.line} type step {idx} missing 'selector'"
-                )
-            sel = str(selector)
+            steps.append(ClickStep("wait", str(wait_sel), local_timeout))
+            continue
+        if action not in ("click", "type", "hover"):
+            raise ValueError(
+                f"{plan.source}:{plan.line} click step {idx} has unsupported action '{action}'"
+            )
+        if not selector:
+            raise ValueError(
+                f"{plan.source}:{plan.line} {action} step {idx} missing 'selector'"
+            )
+
+        sel = str(selector)
+        fill_value = ""
+        if action == "type":
             if "value" in step:
                 fill_value = str(step["value"])
             elif sel in username_selectors:
@@ -384,59 +664,1632 @@ def _run_click_steps(page: Any, plan: ShotPlan, timeout_ms: int) -> None:
                 raise ValueError(
                     f"{plan.source}:{plan.line} type step {idx} missing 'value'"
                 )
-            page.fill(sel, fill_value, timeout=local_timeout)
-        elif action == "hover":
-            if not selector:
-                raise ValueError(
-                    f"{plan.source}:{plan.line} hover step {idx} missing 'selector'"
-                )
-            page.hover(str(selector), timeout=local_timeout)
-        else:
-            raise ValueError(
-                f"{plan.source}:{plan.line} click step {idx} has unsupported action '{action}'"
+        wait_for = str(step["wait_for"]) if step.get("wait_for") else None
+        steps.append(ClickStep(action, sel, local_timeout, fill_value, wait_for))
+    return steps
+
+
+def _chain_path(plan: ShotPlan, timeout_ms: int) -> list[ClickStep]:
+    """Steps after entering the page (goto, login prefix): the rest of the click path,
+    then next_url and wait_for. Plans that enter the same way are chained on this path."""
+    steps = _click_steps(plan, timeout_ms, start=_login_prefix(plan))
+    if plan.next_url:
+        steps.append(ClickStep("goto", plan.next_url, timeout_ms))
+    if plan.wait_for:
+        steps.append(ClickStep("wait", plan.wait_for, timeout_ms))
+    return steps
+
+
+async def _run_click_steps(
+    page: Any,
+    plan: ShotPlan,
+    timeout_ms: int,
+    clock: ShotClock,
+    start: int = 0,
+    stop: int | None = None,
+) -> None:
+    await _run_steps(page, _click_steps(plan, timeout_ms, start, stop), clock)
+
+
+async def _run_steps(page: Any, steps: list[ClickStep], clock: ShotClock) -> None:
+    for step in steps:
+        with clock.step(step.action, step.selector):
+            await _run_step(page, step, clock)
+
+
+async def _run_step(page: Any, step: ClickStep, clock: ShotClock) -> None:
+    if step.wait_visible:
+        await page.wait_for_selector(step.selector, timeout=clock.ms(step.timeout_ms), state="visible")
+    if step.action == "goto":
+        await _goto(page, step.selector, clock.ms(step.timeout_ms))
+    elif step.action == "click":
+        await page.click(step.selector, timeout=clock.ms(step.timeout_ms))
+    elif step.action == "wait":
+        await page.wait_for_selector(step.selector, timeout=clock.ms(step.timeout_ms))
+    elif step.action == "type":
+        await page.fill(step.selector, step.value, timeout=clock.ms(step.timeout_ms))
+    else:
+        await page.hover(step.selector, timeout=clock.ms(step.timeout_ms))
+    if step.wait_for:
+        await page.wait_for_selector(step.wait_for, timeout=clock.ms(step.timeout_ms))
+
+
+async def _capture(page: Any, plan: ShotPlan, timeout_ms: int) -> bytes:
+    """Take the screenshot into memory; `_finalize_output` decides whether it is written."""
+    if plan.target:
+        locator = page.locator(plan.target).first
+        await locator.wait_for(state="visible", timeout=timeout_ms)
+        return await locator.screenshot()
+    return await page.screenshot(full_page=plan.with_frame and plan.full_page)
+
+
+def _image_boxes(
+    boxes: list[dict[str, float]], origin_x: float, origin_y: float
+) -> list[tuple[int, int, int, int]]:
+    """Playwright bounding boxes -> (left, top, right, bottom) in screenshot pixels."""
+    out: list[tuple[int, int, int, int]] = []
+    for box in boxes:
+        left = box["x"] - origin_x
+        top = box["y"] - origin_y
+        out.append(
+            (
+                math.floor(left),
+                math.floor(top),
+                math.ceil(left + box["width"]),
+                math.ceil(top + box["height"]),
             )
-
-        if step.get("wait_for") and action != "wait":
-            page.wait_for_selector(str(step["wait_for"]), timeout=local_timeout)
+        )
+    return out
 
 
-def _capture(page: Any, plan: ShotPlan, timeout_ms: int) -> None:
+async def _mask_boxes(page: Any, plan: ShotPlan) -> list[tuple[int, int, int, int]]:
+    """Boxes of `plan.mask` elements in screenshot pixel coordinates."""
+    if not plan.mask:
+        return []
+    origin_x = origin_y = 0.0
+    if plan.target:
+        box = await page.locator(plan.target).first.bounding_box()
+        if box:
+            origin_x, origin_y = box["x"], box["y"]
+    elif plan.with_frame and plan.full_page:
+        # bounding_box() is viewport-relative; full-page shots start at the document top.
+        scroll_x, scroll_y = await page.evaluate("() => [window.scrollX, window.scrollY]")
+        origin_x, origin_y = -scroll_x, -scroll_y
+    boxes: list[dict[str, float]] = []
+    for selector in plan.mask:
+        matches = page.locator(selector)
+        for i in range(await matches.count()):
+            box = await matches.nth(i).bounding_box()
+            if box:
+                boxes.append(box)
+    return _image_boxes(boxes, origin_x, origin_y)
+
+
+def _finalize_output(
+    plan: ShotPlan, data: bytes, options: CaptureOptions, masks: list[tuple[int, int, int, int]]
+) -> bool:
+    """Write a captured image unless --compare finds it unchanged; returns whether it was written."""
+    if options.compare and plan.output.exists():
+        old = plan.output.read_bytes()
+        if old == data:
+            return False
+        if pillow_available():
+            if image_diff(old, data, masks) <= options.diff_threshold:
+                return False
     plan.output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = plan.output.with_name(plan.output.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(plan.output)
+    return True
+
+
+_HIGHLIGHT_JS = """(items) => {
+  for (const item of items) {
+    const nodes = document.querySelectorAll(item.selector);
+    nodes.forEach((el) => {
+      const prev = el.getAttribute("style") || "";
+      const next = prev ? `${prev}; ${item.style}` : item.style;
+      el.setAttribute("style", next);
+    });
+  }
+}"""
+
+
+# Installed in every context before the app's own scripts run: counts fetch/XHR
+# requests in flight and notes when the DOM last changed, for _READY_JS.
+_READY_INIT_JS = """(() => {
+  if (window.__shotReady) return;
+  const state = { inflight: 0, lastMutation: performance.now() };
+  window.__shotReady = state;
+  const done = () => { state.inflight = Math.max(0, state.inflight - 1); };
+  const fetch = window.fetch;
+  if (fetch) {
+    window.fetch = function (...args) {
+      state.inflight += 1;
+      return fetch.apply(window, args).finally(done);
+    };
+  }
+  const send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function (...args) {
+    state.inflight += 1;
+    this.addEventListener("loadend", done, { once: true });
+    return send.apply(this, args);
+  };
+  new MutationObserver(() => { state.lastMutation = performance.now(); })
+    .observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+})();"""
+
+# Resolves once nothing is pending, or after opts.timeout ms with what still was.
+# Infinite animations (spinners) and lazy images never finish, so they don't count.
+_READY_JS = """(opts) => new Promise((resolve) => {
+  const start = performance.now();
+  let state = window.__shotReady;
+  if (!state) {
+    state = window.__shotReady = { inflight: 0, lastMutation: start };
+    new MutationObserver(() => { state.lastMutation = performance.now(); })
+      .observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+  }
+  const pending = () => {
+    const left = [];
+    if (document.readyState !== "complete") left.push("load");
+    if (state.inflight > 0) left.push("network");
+    if (document.fonts && document.fonts.status !== "loaded") left.push("fonts");
+    if (Array.from(document.images).some((img) => !img.complete && img.loading !== "lazy")) {
+      left.push("images");
+    }
+    const running = document.getAnimations ? document.getAnimations() : [];
+    if (running.some((a) => a.playState === "running" && a.effect
+        && Number.isFinite(a.effect.getComputedTiming().endTime))) {
+      left.push("animations");
+    }
+    if (performance.now() - state.lastMutation < opts.quiet) left.push("dom");
+    return left;
+  };
+  const tick = () => {
+    const left = pending();
+    const elapsed = performance.now() - start;
+    if (!left.length || elapsed >= opts.timeout) {
+      resolve({ ready: !left.length, elapsed, pending: left });
+    } else {
+      setTimeout(tick, 16);
+    }
+  };
+  tick();
+})"""
 
-    if plan.target:
-        locator = page.locator(plan.target).first
-        locator.wait_for(state="visible", timeout=timeout_ms)
-        locator.screenshot(path=str(plan.output))
+
+def _ready_args(plan: ShotPlan) -> dict[str, int]:
+    return {"timeout": plan.settle_ms, "quiet": min(READY_QUIET_MS, plan.settle_ms)}
+
+
+async def _settle(page: Any, plan: ShotPlan, options: CaptureOptions) -> Settle:
+    """Wait until the page is stable, for at most plan.settle_ms."""
+    if plan.settle_ms <= 0:
+        return Settle()
+    if options.fixed_settle:
+        await page.wait_for_timeout(plan.settle_ms)
+        return Settle(plan.settle_ms / 1000)
+    started = time.perf_counter()
+    state = await page.evaluate(_READY_JS, _ready_args(plan))
+    return Settle(time.perf_counter() - started, list(state.get("pending") or []))
+
+
+async def _apply_highlight(page: Any, plan: ShotPlan) -> None:
+    if not plan.highlight:
         return
+    await page.evaluate(_HIGHLIGHT_JS, plan.highlight)
+
+
+@dataclass
+class Settle:
+    """How long a shot waited to settle, and what was still busy if it ran out of time."""
+
+    seconds: float = 0.0
+    pending: list[str] = field(default_factory=list)
+
+    def describe(self) -> str:
+        text = f"settle {self.seconds * 1000:.0f} ms"
+        if self.pending:
+            text += f", still busy: {', '.join(self.pending)}"
+        return text
+
+
+@dataclass
+class ShotResult:
+    index: int
+    plan: ShotPlan
+    status: str  # "ok" | "fail" | "skip"
+    detail: str = ""
+    seconds: float = 0.0
+    bytes: int = 0
+    changed: bool = True
+    settle: Settle | None = None
+    width: int = 0
+    height: int = 0
+    attempts: int = 1
+    steps: list[dict[str, Any]] = field(default_factory=list)
+
+
+class SessionStore:
+    """Playwright storage state per (origin, username), shared by capture workers.
+
+    States are kept in memory for the run and persisted to `path`, readable
+    only by the owner, so the next run can skip logging in too; a stale
+    session just falls back to the directive's own login steps. Workers are
+    tasks on one event loop, so no locking is needed.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path
+        self.states: dict[str, dict[str, Any]] = {}
+        self.logins = 0
+        self.reused = 0
+
+    @staticmethod
+    def key_for(plan: ShotPlan) -> str:
+        parts = urlsplit(plan.url)
+        return f"{parts.scheme}://{parts.netloc}|{plan.username or ''}"
+
+    def load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict):
+            self.states = {k: v for k, v in data.items() if isinstance(v, dict)}
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        return self.states.get(key)
+
+    def put(self, key: str, state: dict[str, Any]) -> None:
+        self.states[key] = state
+        self.logins += 1
+
+    def hit(self) -> None:
+        self.reused += 1
+
+    def save(self) -> None:
+        if self.path is None or not self.states:
+            return
+        # Storage state holds session cookies, so keep it private like daemon.json.
+        _write_private(self.path, json.dumps(self.states, indent=2) + "\n")
+
+
+def _write_private(path: Path, text: str) -> None:
+    """Atomically write `text` to `path` with mode 0600."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    tmp.replace(path)
+
+
+@dataclass
+class CaptureManifest:
+    """What produced each output: spec, app build and viewport, plus the image hash.
+
+    With --incremental a shot is recaptured only when its key or the file on
+    disk no longer matches the recorded entry.
+    """
+
+    path: Path | None
+    root: Path
+    entries: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path | None, root: Path) -> "CaptureManifest":
+        manifest = cls(path=path, root=root)
+        if path is None or not path.exists():
+            return manifest
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return manifest
+        if isinstance(raw, dict) and raw.get("version") == MANIFEST_VERSION:
+            entries = raw.get("entries")
+            if isinstance(entries, dict):
+                manifest.entries = entries
+        return manifest
+
+    @staticmethod
+    def plan_keys(plans: list[ShotPlan], app_build: str) -> dict[Path, str]:
+        """One key per resolved output, covering every directive that writes it."""
+        hashers: dict[Path, Any] = {}
+        for plan in plans:
+            h = hashers.get(plan.output.resolve())
+            if h is None:
+                h = hashers[plan.output.resolve()] = hashlib.sha256()
+                h.update(f"{app_build}\0{DEFAULT_VIEWPORT_WIDTH}x{DEFAULT_VIEWPORT_HEIGHT}\0".encode("utf-8"))
+            spec = json.dumps(plan.raw, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+            h.update(spec.encode("utf-8") + b"\0")
+        return {output: h.hexdigest() for output, h in hashers.items()}
+
+    def _name(self, output: Path) -> str:
+        try:
+            return output.resolve().relative_to(self.root).as_posix()
+        except ValueError:
+            return os.fspath(output.resolve())
+
+    def fresh(self, output: Path, key: str) -> bool:
+        entry = self.entries.get(self._name(output))
+        if not isinstance(entry, dict) or entry.get("key") != key:
+            return False
+        try:
+            data = output.read_bytes()
+        except OSError:
+            return False
+        return hashlib.sha256(data).hexdigest() == entry.get("sha256")
+
+    def record(self, output: Path, key: str) -> None:
+        data = output.read_bytes()
+        self.entries[self._name(output)] = {
+            "key": key,
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "bytes": len(data),
+        }
+
+    def rehash(self, output: Path) -> None:
+        """Refresh the recorded hash after the file was rewritten in place (e.g. optimized)."""
+        entry = self.entries.get(self._name(output))
+        if isinstance(entry, dict) and output.exists():
+            data = output.read_bytes()
+            entry["sha256"] = hashlib.sha256(data).hexdigest()
+            entry["bytes"] = len(data)
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.entries = {
+            name: entry
+            for name, entry in sorted(self.entries.items())
+            if (self.root / name).exists()
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"version": MANIFEST_VERSION, "entries": self.entries}, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        tmp.replace(self.path)
+
+
+class HarFixtures:
+    """Recorded app traffic (HAR) for offline capture runs.
+
+    In "record" mode every browser context writes its own HAR under a
+    `<name>-parts/` directory, and merge() folds them into `path`, replacing
+    earlier responses to the same request. In "replay" mode every context is
+    routed from `path` and requests it does not cover are aborted, so the run
+    never reaches the device.
+    """
+
+    def __init__(self, path: Path, mode: str) -> None:
+        self.path = path
+        self.mode = mode
+        self.parts_dir = path.with_name(path.stem + "-parts")
+        self._next_part = 0
+
+    @staticmethod
+    def _key(entry: dict[str, Any]) -> tuple[str, str, str]:
+        request = entry.get("request") or {}
+        post = request.get("postData") or {}
+        return (str(request.get("method", "GET")), str(request.get("url", "")), str(post.get("text", "")))
+
+    @staticmethod
+    def _read(path: Path) -> dict[str, Any]:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        log = data.get("log") if isinstance(data, dict) else None
+        return log if isinstance(log, dict) else {}
+
+    def entry_count(self) -> int:
+        return len(self._read(self.path).get("entries") or [])
+
+    def context_args(self) -> dict[str, Any]:
+        if self.mode != "record":
+            return {}
+        part = self._next_part
+        self._next_part += 1
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        return {"record_har_path": str(self.parts_dir / f"{part:05d}.har"), "record_har_content": "embed"}
+
+    async def attach(self, context: Any) -> None:
+        if self.mode == "replay":
+            await context.route_from_har(str(self.path), not_found="abort")
+
+    def merge(self) -> tuple[int, int]:
+        """Fold the recorded parts into `path`; returns (entries, entries added or replaced)."""
+        log = self._read(self.path)
+        entries = {self._key(entry): entry for entry in log.get("entries") or [] if isinstance(entry, dict)}
+        creator = log.get("creator")
+        updated = 0
+        parts = sorted(self.parts_dir.glob("*.har")) if self.parts_dir.exists() else []
+        for part in parts:
+            part_log = self._read(part)
+            creator = creator or part_log.get("creator")
+            for entry in part_log.get("entries") or []:
+                # Aborted or failed requests have no response worth replaying.
+                if not isinstance(entry, dict) or (entry.get("response") or {}).get("status", 0) <= 0:
+                    continue
+                entry.pop("pageref", None)
+                entries[self._key(entry)] = entry
+                updated += 1
+            part.unlink()
+        if self.parts_dir.exists():
+            try:
+                self.parts_dir.rmdir()
+            except OSError:
+                pass
+        har = {
+            "log": {
+                "version": "1.2",
+                "creator": creator or {"name": "build-screenshots"},
+                "entries": list(entries.values()),
+            }
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(har) + "\n", encoding="utf-8")
+        tmp.replace(self.path)
+        return len(entries), updated
+
+
+class CircuitBreaker:
+    """Stops a run from hammering an app that is down.
+
+    After BREAKER_THRESHOLD shots in a row fail to load a page, further
+    shots fail immediately; once BREAKER_COOLDOWN_S has passed one shot is
+    let through to probe, and any shot that reaches the app closes it again.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown_s: float = BREAKER_COOLDOWN_S) -> None:
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.tripped = 0
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.cooldown_s:
+            # Half-open: this caller probes; callers until the cooldown passes again fail with CIRCUIT_OPEN.
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold and self.opened_at is None:
+            self.opened_at = time.monotonic()
+            self.tripped += 1
+
+
+@dataclass
+class CaptureOptions:
+    timeout_ms: int = DEFAULT_TIMEOUT_MS
+    overwrite: bool = False
+    incremental: bool = False
+    sessions: SessionStore | None = None
+    manifest: CaptureManifest | None = None
+    keys: dict[Path, str] = field(default_factory=dict)
+    unchanged: set[Path] = field(default_factory=set)
+    compare: bool = False
+    diff_threshold: float = DEFAULT_DIFF_THRESHOLD
+    fixed_settle: bool = False
+    shot_budget_ms: int = DEFAULT_SHOT_BUDGET_MS
+    retries: int = DEFAULT_RETRIES
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    har: HarFixtures | None = None
+
+
+async def _session_is_live(page: Any, plan: ShotPlan, prefix: int, timeout_ms: int) -> bool:
+    """Wait for either the post-login selector or the login form; True when past the form."""
+    user_sel = str(plan.click[0]["selector"])
+    ready_sel = str(plan.click[prefix - 1]["wait_for"])
+    try:
+        await page.wait_for_selector(f"{ready_sel}, {user_sel}", timeout=timeout_ms, state="visible")
+        return not await page.locator(user_sel).first.is_visible()
+    except Exception:
+        return False
+
+
+def _context_args(state: dict[str, Any] | None, har: HarFixtures | None = None) -> dict[str, Any]:
+    args: dict[str, Any] = {
+        "viewport": {"width": DEFAULT_VIEWPORT_WIDTH, "height": DEFAULT_VIEWPORT_HEIGHT}
+    }
+    if state is not None:
+        args["storage_state"] = state
+    if har is not None:
+        args.update(har.context_args())
+    return args
+
+
+def _stored_session(plan: ShotPlan, options: CaptureOptions) -> dict[str, Any] | None:
+    if options.sessions is None or not _login_prefix(plan):
+        return None
+    return options.sessions.get(SessionStore.key_for(plan))
+
+
+async def _enter_page(
+    page: Any,
+    context: Any,
+    plan: ShotPlan,
+    options: CaptureOptions,
+    signed_in: bool,
+    clock: ShotClock,
+) -> bool:
+    """Open plan.url and get past the login; returns whether the context is now signed in."""
+    timeout_ms = options.timeout_ms
+    with clock.step("goto", plan.url):
+        await _goto(page, plan.url, clock.ms(timeout_ms))
+    if plan.login:
+        with clock.step("login"):
+            await _run_login(page, plan, clock.ms(timeout_ms))
+    if plan.dark_toggle:
+        with clock.step("click", plan.dark_toggle):
+            await page.click(plan.dark_toggle, timeout=clock.ms(timeout_ms))
+    prefix = _login_prefix(plan)
+    if not prefix:
+        return signed_in
+    if signed_in:
+        with clock.step("session"):
+            live = await _session_is_live(page, plan, prefix, clock.ms(timeout_ms))
+        if live:
+            if options.sessions is not None:
+                options.sessions.hit()
+            return True
+    await _run_click_steps(page, plan, timeout_ms, clock, stop=prefix)
+    # A dark_toggle click may have written UI prefs into storage; don't hand those on.
+    if options.sessions is not None and not plan.dark_toggle:
+        options.sessions.put(SessionStore.key_for(plan), await context.storage_state())
+    return True
+
+
+async def _finish_shot(
+    page: Any, plan: ShotPlan, options: CaptureOptions, clock: ShotClock
+) -> tuple[bool, Settle]:
+    """Highlight, settle, capture and write; returns whether the output changed."""
+    if plan.highlight:
+        with clock.step("highlight"):
+            await _apply_highlight(page, plan)
+    with clock.step("settle"):
+        settle = await _settle(page, plan, options)
+    with clock.step("capture", plan.target):
+        data = await _capture(page, plan, clock.ms(options.timeout_ms))
+    with clock.step("write"):
+        masks = await _mask_boxes(page, plan) if options.compare else []
+        # Pixel diffing is CPU work; keep it off the event loop.
+        changed = await asyncio.to_thread(_finalize_output, plan, data, options, masks)
+    return changed, settle
+
+
+async def _open_page(
+    browser: Any,
+    plan: ShotPlan,
+    state: dict[str, Any] | None,
+    options: CaptureOptions,
+    assets: AssetCache | None,
+) -> tuple[Any, Any]:
+    context = await browser.new_context(**_context_args(state, options.har))
+    if options.har is not None:
+        await options.har.attach(context)
+    if not options.fixed_settle:
+        await context.add_init_script(_READY_INIT_JS)
+    if assets is not None:
+        await context.route("**/*", assets.handle)
+    page = await context.new_page()
+    if plan.dark_mode:
+        await page.emulate_media(color_scheme="dark")
+    return context, page
+
+
+async def _shoot(
+    browser: Any, plan: ShotPlan, options: CaptureOptions, assets: AssetCache | None, clock: ShotClock
+) -> tuple[bool, Settle]:
+    state = _stored_session(plan, options)
+    with clock.step("context"):
+        context, page = await _open_page(browser, plan, state, options, assets)
+    try:
+        await _enter_page(page, context, plan, options, state is not None, clock)
+        await _run_steps(page, _chain_path(plan, options.timeout_ms), clock)
+        return await _finish_shot(page, plan, options, clock)
+    finally:
+        await page.close()
+        await context.close()
+
+
+def _restart_point(path: list[ClickStep], common: int) -> int | None:
+    """Index of the last goto in the shared prefix, or of the goto `path` continues with.
+
+    A goto reloads the page, so a chain can replay from there instead of
+    re-entering from plan.url; None when there is no such goto.
+    """
+    for i in range(min(common, len(path) - 1), -1, -1):
+        if path[i].action == "goto":
+            return i
+    return None
+
+
+def _common_prefix(done: list[ClickStep], path: list[ClickStep]) -> int:
+    n = 0
+    while n < len(done) and n < len(path) and done[n].key == path[n].key:
+        n += 1
+    return n
+
+
+def _png_size(path: Path) -> tuple[int, int]:
+    """(width, height) from a PNG's IHDR chunk; (0, 0) if the file is not a PNG."""
+    with path.open("rb") as fh:
+        head = fh.read(24)
+    if len(head) < 24 or head[:8] != b"\x89PNG\r\n\x1a\n" or head[12:16] != b"IHDR":
+        return 0, 0
+    return int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big")
+
+
+def _ok_result(index: int, plan: ShotPlan, started: float, shot: tuple[bool, Settle]) -> ShotResult:
+    changed, settle = shot
+    width, height = _png_size(plan.output)
+    return ShotResult(
+        index,
+        plan,
+        "ok",
+        "" if changed else "unchanged",
+        time.perf_counter() - started,
+        plan.output.stat().st_size,
+        changed,
+        settle,
+        width,
+        height,
+    )
+
+
+CIRCUIT_OPEN = "not attempted: app unreachable (circuit breaker open)"
+
+
+def _retry_delay(options: CaptureOptions, clock: ShotClock) -> float | None:
+    """Backoff before retrying a shot that failed to navigate; None when out of retries or time."""
+    if clock.attempt >= options.retries:
+        return None
+    delay = RETRY_BACKOFF_S * 2**clock.attempt
+    return delay if delay < clock.remaining_s() else None
+
+
+async def _attempt(
+    index: int,
+    plan: ShotPlan,
+    options: CaptureOptions,
+    shoot: Callable[[ShotClock], Awaitable[tuple[bool, Settle]]],
+) -> ShotResult:
+    """Run `shoot` within one budget, retrying navigation errors and feeding the breaker.
 
-    if plan.with_frame:
-        page.screenshot(path=str(plan.output), full_page=plan.full_page)
+    Every attempt is cancelled once the budget runs out, which also bounds the
+    calls that take no Playwright timeout (evaluate, new_context, route.fetch).
+    """
+    started = time.perf_counter()
+    clock = ShotClock(options.shot_budget_ms)
+    while True:
+        if not options.breaker.allow():
+            result = ShotResult(index, plan, "fail", CIRCUIT_OPEN, time.perf_counter() - started)
+            break
+        try:
+            shot = await asyncio.wait_for(shoot(clock), clock.wait_s())
+        except NavigationError as exc:
+            delay = _retry_delay(options, clock)
+            if delay is not None:
+                await asyncio.sleep(delay)
+                clock.attempt += 1
+                continue
+            options.breaker.failure()
+            result = ShotResult(index, plan, "fail", str(exc), time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            options.breaker.success()
+            detail = f"shot budget of {options.shot_budget_ms} ms exhausted"
+            result = ShotResult(index, plan, "fail", detail, time.perf_counter() - started)
+        except Exception as exc:
+            # The app answered; whatever broke is the shot's own problem.
+            options.breaker.success()
+            result = ShotResult(index, plan, "fail", str(exc), time.perf_counter() - started)
+        else:
+            options.breaker.success()
+            result = _ok_result(index, plan, started, shot)
+        break
+    result.steps = clock.steps
+    result.attempts = clock.attempt + 1
+    return result
+
+
+async def _run_chain(
+    browser: Any,
+    indexes: list[int],
+    plans: list[ShotPlan],
+    options: CaptureOptions,
+    assets: AssetCache | None,
+    collect: Any,
+) -> None:
+    """Capture a chain (see _capture_units) on one page.
+
+    Each shot replays only the steps after what it shares with the previous
+    one. If the previous shot went past the shared prefix with anything but
+    `wait` steps, the shot replays from the last goto it shares with the
+    previous one (or its own next goto). Without one, or after highlight
+    styles were injected, the page is re-entered from plan.url in the same,
+    already signed-in, context instead.
+    """
+    first = plans[indexes[0]]
+    state = _stored_session(first, options)
+    signed_in = state is not None
+    try:
+        context, page = await asyncio.wait_for(
+            _open_page(browser, first, state, options, assets), ShotClock(options.shot_budget_ms).wait_s()
+        )
+    except Exception as exc:
+        for index in indexes:
+            collect(ShotResult(index, plans[index], "fail", str(exc)))
         return
+    done: list[ClickStep] | None = None
+
+    async def _chained(plan: ShotPlan, clock: ShotClock) -> tuple[bool, Settle]:
+        nonlocal done, signed_in
+        # Until this shot succeeds the page state is unknown; a failure re-enters.
+        previous, done = done, None
+        path = _chain_path(plan, options.timeout_ms)
+        common = 0
+        if previous is not None:
+            common = _common_prefix(previous, path)
+            if any(step.action != "wait" for step in previous[common:]):
+                restart = _restart_point(path, common)
+                if restart is None:
+                    previous = None
+                else:
+                    common = restart
+        if previous is None:
+            signed_in = await _enter_page(page, context, plan, options, signed_in, clock)
+            common = 0
+        await _run_steps(page, path[common:], clock)
+        shot = await _finish_shot(page, plan, options, clock)
+        if not plan.highlight:
+            done = path
+        return shot
+
+    try:
+        for index in indexes:
+            plan = plans[index]
+            skipped = _skip_result(index, plan, options)
+            if skipped is not None:
+                collect(skipped)
+                continue
+            collect(await _attempt(index, plan, options, lambda clock: _chained(plan, clock)))
+    finally:
+        await page.close()
+        await context.close()
+
+
+def _skip_result(index: int, plan: ShotPlan, options: CaptureOptions) -> ShotResult | None:
+    if options.overwrite:
+        return None
+    if options.incremental:
+        if plan.output.resolve() in options.unchanged:
+            return ShotResult(index, plan, "skip", "unchanged")
+    elif plan.output.exists():
+        return ShotResult(index, plan, "skip", "already exists")
+    return None
 
-    page.screenshot(path=str(plan.output), full_page=False)
 
+async def _run_plan(
+    browser: Any, index: int, plan: ShotPlan, options: CaptureOptions, assets: AssetCache | None
+) -> ShotResult:
+    skipped = _skip_result(index, plan, options)
+    if skipped is not None:
+        return skipped
+    return await _attempt(
+        index, plan, options, lambda clock: _shoot(browser, plan, options, assets, clock)
+    )
 
-def _apply_highlight(page: Any, plan: ShotPlan) -> None:
-    if not plan.highlight:
+
+def _report_result(result: ShotResult, profiler: Profiler) -> None:
+    plan = result.plan
+    label = f"{plan.source}:{plan.line} -> {plan.output}"
+    if result.status == "skip":
+        print(f"SKIP {label} ({result.detail})")
+        return
+    if result.status == "ok":
+        notes = [] if result.changed else ["unchanged"]
+        if result.settle is not None and plan.settle_ms > 0:
+            notes.append(result.settle.describe())
+            profiler.add_phase("settle", result.settle.seconds)
+            profiler.record("settle", label, result.settle.seconds)
+        print(f"OK   {label}" + (f" ({'; '.join(notes)})" if notes else ""))
+        if result.changed:
+            profiler.wrote(plan.output, result.bytes)
+    else:
+        print(f"FAIL {label} ({result.detail})")
+    profiler.add_phase("shot", result.seconds)
+    profiler.record("shots", label, result.seconds)
+
+
+def _report_record(result: ShotResult, docs_root: Path) -> dict[str, Any]:
+    plan = result.plan
+    try:
+        output = plan.output.resolve().relative_to(docs_root).as_posix()
+    except ValueError:
+        output = os.fspath(plan.output)
+    record: dict[str, Any] = {
+        "source": plan.source,
+        "line": plan.line,
+        "output": output,
+        "status": result.status,
+        "detail": result.detail,
+        "seconds": round(result.seconds, 4),
+        "attempts": result.attempts,
+        "bytes": result.bytes,
+        "width": result.width,
+        "height": result.height,
+        "changed": result.changed if result.status == "ok" else False,
+        "steps": result.steps,
+    }
+    if result.settle is not None:
+        record["settle_ms"] = round(result.settle.seconds * 1000, 1)
+        record["unsettled"] = result.settle.pending
+    return record
+
+
+def write_report(
+    path: Path,
+    results: list[ShotResult],
+    docs_root: Path,
+    totals: dict[str, int],
+    app_build: str,
+) -> None:
+    """One record per directive with per-step timings, plus time spent per step kind."""
+    shots = [_report_record(result, docs_root) for result in results]
+    step_ms: dict[str, float] = {}
+    for shot in shots:
+        for step in shot["steps"]:
+            step_ms[step["step"]] = step_ms.get(step["step"], 0.0) + step["ms"]
+    report = {
+        "version": REPORT_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "app_build": app_build,
+        "totals": totals,
+        "step_ms": {name: round(ms, 1) for name, ms in sorted(step_ms.items(), key=lambda e: -e[1])},
+        "shots": shots,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    tmp.replace(path)
+
+
+def _output_groups(plans: list[ShotPlan]) -> list[list[int]]:
+    """Plan indexes grouped by output file, so one worker owns each output."""
+    groups: dict[Path, list[int]] = {}
+    for index, plan in enumerate(plans):
+        groups.setdefault(plan.output.resolve(), []).append(index)
+    return list(groups.values())
+
+
+@dataclass
+class CaptureUnit:
+    """Plan indexes one worker runs in order; chained units share a page (_run_chain)."""
+
+    indexes: list[int]
+    chained: bool = False
+
+
+def _split_chain(indexes: list[int], paths: dict[int, list[tuple[Any, ...]]], limit: int) -> list[list[int]]:
+    """Cut a depth-first sorted chain into subtrees of at most `limit` plans where possible.
+
+    The chain is split at its first branch point, below the steps every plan
+    shares; subtrees still over the limit are split again at their own.
+    """
+    if len(indexes) <= limit:
+        return [indexes]
+    depth = 0
+    first = paths[indexes[0]]
+    while depth < len(first) and all(
+        depth < len(paths[i]) and paths[i][depth] == first[depth] for i in indexes
+    ):
+        depth += 1
+    subtrees: dict[Any, list[int]] = {}
+    for i in indexes:
+        subtrees.setdefault(paths[i][depth] if depth < len(paths[i]) else None, []).append(i)
+    if len(subtrees) == 1:
+        return [indexes]
+    out: list[list[int]] = []
+    for subtree in subtrees.values():
+        out += _split_chain(subtree, paths, limit)
+    return out
+
+
+def _capture_units(
+    plans: list[ShotPlan], timeout_ms: int, chain: bool, workers: int = 1
+) -> list[CaptureUnit]:
+    """Split plans into work units.
+
+    With `chain`, plans that enter the same way (url, dark mode, credentials,
+    login steps) form a prefix tree over their remaining steps. Sorting each
+    set by path walks that tree depth-first, so siblings sit next to each
+    other and a shot whose path extends the previous one continues on the
+    live page. With several workers, chains are cut into subtrees of about
+    an even share each so they spread across workers. Outputs written by
+    several directives, legacy login and dark_toggle plans keep their own
+    fresh-context units in directive order.
+    """
+    units: list[CaptureUnit] = []
+    chains: dict[tuple[Any, ...], list[int]] = {}
+    for group in _output_groups(plans):
+        plan = plans[group[0]]
+        if not chain or len(group) > 1 or plan.login or plan.dark_toggle:
+            units.append(CaptureUnit(group))
+            continue
+        prefix = _login_prefix(plan)
+        entry = (
+            plan.url,
+            plan.dark_mode,
+            plan.username,
+            plan.password,
+            tuple(step.key for step in _click_steps(plan, timeout_ms, stop=prefix)),
+        )
+        if entry not in chains:
+            chains[entry] = []
+            units.append(CaptureUnit(chains[entry], chained=True))
+        chains[entry].append(group[0])
+    paths = {
+        i: [step.key for step in _chain_path(plans[i], timeout_ms)]
+        for unit in units
+        if unit.chained
+        for i in unit.indexes
+    }
+    limit = math.ceil(len(paths) / workers) if workers > 1 else len(paths)
+    split: list[CaptureUnit] = []
+    for unit in units:
+        if not unit.chained:
+            split.append(unit)
+            continue
+        unit.indexes.sort(key=lambda i: paths[i])
+        split += [CaptureUnit(part, chained=True) for part in _split_chain(unit.indexes, paths, limit)]
+    return split
+
+
+async def _run_unit(
+    browser: Any,
+    unit: CaptureUnit,
+    plans: list[ShotPlan],
+    options: CaptureOptions,
+    assets: AssetCache | None,
+    collect: Any,
+) -> None:
+    if unit.chained:
+        await _run_chain(browser, unit.indexes, plans, options, assets, collect)
+    else:
+        for index in unit.indexes:
+            collect(await _run_plan(browser, index, plans[index], options, assets))
+
+
+def _unit_queue(units: list[CaptureUnit]) -> "asyncio.Queue[CaptureUnit]":
+    todo: asyncio.Queue[CaptureUnit] = asyncio.Queue()
+    for unit in units:
+        todo.put_nowait(unit)
+    return todo
+
+
+async def _capture_on_browser(
+    browser: Any,
+    plans: list[ShotPlan],
+    units: "asyncio.Queue[CaptureUnit]",
+    options: CaptureOptions,
+    pages: int,
+    collect: Any,
+    assets: AssetCache | None,
+) -> None:
+    """Drive up to `pages` pages of one browser until `units` is empty."""
+
+    async def _page() -> None:
+        # A unit's directives run in order, one page at a time.
+        while True:
+            try:
+                unit = units.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await _run_unit(browser, unit, plans, options, assets, collect)
+
+    await asyncio.gather(*(_page() for _ in range(pages)))
+
+
+async def _capture_worker(
+    playwright: Any,
+    plans: list[ShotPlan],
+    units: "asyncio.Queue[CaptureUnit]",
+    options: CaptureOptions,
+    headed: bool,
+    pages: int,
+    collect: Any,
+    profiler: Profiler,
+    assets: AssetCache | None,
+) -> Exception | None:
+    """Launch a browser and capture units off the shared queue; returns the launch error, if any."""
+    try:
+        with profiler.phase("browser.launch"):
+            browser = await playwright.chromium.launch(headless=not headed)
+    except Exception as exc:
+        # Leave the queue to the workers whose browser did start.
+        return exc
+    try:
+        await _capture_on_browser(browser, plans, units, options, pages, collect, assets)
+    finally:
+        await browser.close()
+    return None
+
+
+async def _run_capture_local(
+    plans: list[ShotPlan],
+    units: list[CaptureUnit],
+    options: CaptureOptions,
+    headed: bool,
+    browsers: int,
+    pages: int,
+    collect: Any,
+    profiler: Profiler,
+    assets: AssetCache | None,
+) -> None:
+    """Capture on `browsers` browsers with `pages` pages each, all from one event loop."""
+    from playwright.async_api import async_playwright
+
+    todo = _unit_queue(units)
+    async with async_playwright() as p:
+        errors = await asyncio.gather(
+            *(
+                _capture_worker(p, plans, todo, options, headed, pages, collect, profiler, assets)
+                for _ in range(browsers)
+            )
+        )
+    if any(error is None for error in errors):
         return
-    page.evaluate(
-        """(items) => {
-          for (const item of items) {
-            const nodes = document.querySelectorAll(item.selector);
-            nodes.forEach((el) => {
-              const prev = el.getAttribute("style") || "";
-              const next = prev ? `${prev}; ${item.style}` : item.style;
-              el.setAttribute("style", next);
-            });
-          }
-        }""",
-        plan.highlight,
-    )
-
-
-def run_capture(plans: list[ShotPlan], timeout_ms: int, headed: bool, overwrite: bool = False) -> tuple[int, int]:
+    # No browser started: fail every unit so the run still ends.
+    while not todo.empty():
+        unit = todo.get_nowait()
+        for index in unit.indexes:
+            collect(ShotResult(index, plans[index], "fail", f"browser error: {errors[0]}"))
+
+
+# --- static asset cache (--layout pages) -------------------------------------
+
+STATIC_RESOURCE_TYPES = {"script", "stylesheet", "font", "image"}
+_HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class AssetCache:
+    """Static GET responses shared by every context of one --layout pages run.
+
+    Concurrent requests for the same URL wait for the first fetch instead of
+    all going to the device. After expire() (the daemon calls it before each
+    run) an entry is served again only once the device confirms it with a
+    304 to a conditional request.
+    """
+
+    def __init__(self, timeout_ms: int = DEFAULT_TIMEOUT_MS) -> None:
+        self.timeout_ms = timeout_ms
+        self.entries: dict[str, tuple[int, dict[str, str], bytes]] = {}
+        self._fresh: set[str] = set()
+        self._pending: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.bytes_saved = 0
+
+    def expire(self) -> None:
+        """Start a new run: revalidate every entry, drop those that cannot be, reset the stats."""
+        self._fresh.clear()
+        self.entries = {url: entry for url, entry in self.entries.items() if _validators(entry[1])}
+        self.hits = self.misses = self.revalidated = self.bytes_saved = 0
+
+    async def handle(self, route: Any) -> None:
+        request = route.request
+        if request.method != "GET" or request.resource_type not in STATIC_RESOURCE_TYPES:
+            await route.continue_()
+            return
+        url = request.url
+        entry = self.entries.get(url) if url in self._fresh else None
+        if entry is None and url in self._pending:
+            entry = await self._pending[url]
+        if entry is not None:
+            status, headers, body = entry
+            self.hits += 1
+            self.bytes_saved += len(body)
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        stale = self.entries.get(url)
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[url] = future
+        try:
+            conditional = {**request.headers, **_validators(stale[1])} if stale is not None else None
+            response, body = await asyncio.wait_for(self._fetch(route, conditional), self.timeout_ms / 1000)
+        except Exception:
+            future.set_result(None)
+            self._pending.pop(url, None)
+            await route.continue_()
+            return
+        revalidated = response.status == 304 and stale is not None
+        if revalidated:
+            entry = stale
+            self.hits += 1
+            self.revalidated += 1
+            self.bytes_saved += len(stale[2])
+        else:
+            self.misses += 1
+            entry = None
+            self.entries.pop(url, None)
+            if response.status == 200:
+                headers = {k: v for k, v in response.headers.items() if k.lower() not in _HOP_HEADERS}
+                entry = (response.status, headers, body)
+                self.entries[url] = entry
+        if entry is not None:
+            self._fresh.add(url)
+        future.set_result(entry)
+        self._pending.pop(url, None)
+        if revalidated:
+            status, headers, body = stale
+            await route.fulfill(status=status, headers=headers, body=body)
+        else:
+            await route.fulfill(response=response, body=body)
+
+    @staticmethod
+    async def _fetch(route: Any, headers: dict[str, str] | None) -> tuple[Any, bytes]:
+        response = await route.fetch(headers=headers)
+        return response, await response.body()
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "entries": len(self.entries),
+        }
+
+
+def _validators(headers: dict[str, str]) -> dict[str, str]:
+    """Conditional request headers that revalidate a response with these headers."""
+    conditional: dict[str, str] = {}
+    for name, value in headers.items():
+        if name.lower() == "etag":
+            conditional["If-None-Match"] = value
+        elif name.lower() == "last-modified":
+            conditional["If-Modified-Since"] = value
+    return conditional
+
+
+# --- capture daemon (--serve) ------------------------------------------------
+# A long-lived process that keeps one browser, the login sessions and the
+# static asset cache warm. The CLI finds it through DAEMON_STATE and sends
+# its plans over HTTP instead of launching a browser itself. DAEMON_STATE is
+# private to the user (0600) and holds a token every request must carry, so
+# other local users and web pages cannot drive the browser or write files.
+
+
+def _plan_to_json(plan: ShotPlan) -> dict[str, Any]:
+    data = asdict(plan)
+    data["output"] = os.fspath(plan.output)
+    return data
+
+
+def _plan_from_json(data: dict[str, Any]) -> ShotPlan:
+    return ShotPlan(**{**data, "output": Path(data["output"])})
+
+
+def _result_to_json(result: ShotResult) -> dict[str, Any]:
+    return {
+        "index": result.index,
+        "status": result.status,
+        "detail": result.detail,
+        "seconds": result.seconds,
+        "bytes": result.bytes,
+        "changed": result.changed,
+        "settle": asdict(result.settle) if result.settle is not None else None,
+        "width": result.width,
+        "height": result.height,
+        "attempts": result.attempts,
+        "steps": result.steps,
+    }
+
+
+def _result_from_json(data: dict[str, Any], plans: list[ShotPlan]) -> ShotResult:
+    settle = data.get("settle")
+    return ShotResult(
+        index=data["index"],
+        plan=plans[data["index"]],
+        status=data["status"],
+        detail=data.get("detail", ""),
+        seconds=data.get("seconds", 0.0),
+        bytes=data.get("bytes", 0),
+        changed=data.get("changed", True),
+        settle=Settle(**settle) if settle else None,
+        width=data.get("width", 0),
+        height=data.get("height", 0),
+        attempts=data.get("attempts", 1),
+        steps=data.get("steps", []),
+    )
+
+
+class CaptureDaemon:
+    """Browser, sessions and asset cache shared by every request to one --serve process.
+
+    The capture engine runs on a private event loop thread; HTTP handler
+    threads hand requests to it and stream results back. Requests are
+    captured one at a time so two runs never write the same output at once.
+    """
+
+    def __init__(self, root: Path, headed: bool) -> None:
+        self.root = root
+        self.headed = headed
+        self.sessions = SessionStore(root / SESSION_CACHE)
+        self.sessions.load()
+        self.assets = AssetCache()
+        self.runs = 0
+        self.loop = asyncio.new_event_loop()
+        self._playwright: Any = None
+        self._browser: Any = None
+        self._lock: asyncio.Lock | None = None
+
+    def start(self) -> None:
+        threading.Thread(target=self.loop.run_forever, name="capture-daemon", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._launch(), self.loop).result()
+
+    def stop(self) -> None:
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(timeout=30)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def _launch(self) -> None:
+        from playwright.async_api import async_playwright
+
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+            self._lock = asyncio.Lock()
+        self._browser = await self._playwright.chromium.launch(headless=not self.headed)
+
+    async def _close(self) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    async def _capture(self, request: dict[str, Any], emit: Any) -> dict[str, Any]:
+        plans = [_plan_from_json(p) for p in request["plans"]]
+        options = CaptureOptions(
+            timeout_ms=int(request["timeout_ms"]),
+            overwrite=bool(request["overwrite"]),
+            incremental=bool(request["incremental"]),
+            sessions=self.sessions if request["session_reuse"] else None,
+            unchanged={Path(p) for p in request["unchanged"]},
+            compare=bool(request["compare"]),
+            diff_threshold=float(request["diff_threshold"]),
+            fixed_settle=bool(request["fixed_settle"]),
+            shot_budget_ms=int(request["shot_budget_ms"]),
+            retries=int(request["retries"]),
+        )
+        units = _capture_units(plans, options.timeout_ms, bool(request["chain"]), int(request["workers"]))
+        pages = max(1, min(int(request["workers"]), len(units)))
+        async with self._lock:
+            if not self._browser.is_connected():
+                await self._launch()
+            # Assets may have changed on the device since the last run, whatever --app-build says.
+            self.assets.expire()
+            self.assets.timeout_ms = options.timeout_ms
+            logins, reused = self.sessions.logins, self.sessions.reused
+            assets = self.assets if request["asset_cache"] else None
+            await _capture_on_browser(
+                self._browser,
+                plans,
+                _unit_queue(units),
+                options,
+                pages,
+                lambda r: emit(_result_to_json(r)),
+                assets,
+            )
+            self.sessions.save()
+            self.runs += 1
+        return {
+            "done": True,
+            "logins": self.sessions.logins - logins,
+            "reused": self.sessions.reused - reused,
+            "asset_cache": assets.stats() if assets is not None else None,
+        }
+
+    def capture(self, request: dict[str, Any], out: "queue.Queue[dict[str, Any] | None]") -> Any:
+        """Start a capture; result records go to `out`, then None once the future is done."""
+        future = asyncio.run_coroutine_threadsafe(self._capture(request, out.put), self.loop)
+        future.add_done_callback(lambda _: out.put(None))
+        return future
+
+
+@dataclass
+class DaemonAddress:
+    url: str
+    token: str
+
+    def headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+def _outside_root(request: dict[str, Any], root: Path) -> str | None:
+    """First plan output in `request` that does not resolve inside `root`, if any."""
+    for plan in request["plans"]:
+        if not Path(plan["output"]).resolve().is_relative_to(root):
+            return str(plan["output"])
+    return None
+
+
+class _DaemonHandler(BaseHTTPRequestHandler):
+    server: Any
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _authorized(self) -> bool:
+        sent = self.headers.get("Authorization", "")
+        if hmac.compare_digest(sent.encode("utf-8"), f"Bearer {self.server.token}".encode("utf-8")):
+            return True
+        self._send_json(403, {"error": "forbidden"})
+        return False
+
+    def _send_json(self, status: int, payload: dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if not self._authorized():
+            return
+        if self.path != "/status":
+            self._send_json(404, {"error": "not found"})
+            return
+        daemon: CaptureDaemon = self.server.capture_daemon
+        self._send_json(200, {"pid": os.getpid(), "root": os.fspath(daemon.root), "runs": daemon.runs})
+
+    def do_POST(self) -> None:
+        if not self._authorized():
+            return
+        if self.path != "/capture":
+            self._send_json(404, {"error": "not found"})
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._send_json(415, {"error": "expected application/json"})
+            return
+        daemon: CaptureDaemon = self.server.capture_daemon
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            outside = _outside_root(request, daemon.root)
+        except (ValueError, KeyError, TypeError) as exc:
+            self._send_json(400, {"error": f"bad request: {exc}"})
+            return
+        if outside is not None:
+            self._send_json(400, {"error": f"output outside {daemon.root}: {outside}"})
+            return
+        out: queue.Queue[dict[str, Any] | None] = queue.Queue()
+        started = time.perf_counter()
+        future = daemon.capture(request, out)
+        # One JSON record per line as shots finish; the connection close ends the stream.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self.close_connection = True
+        while (record := out.get()) is not None:
+            self.wfile.write(json.dumps(record).encode("utf-8") + b"\n")
+            self.wfile.flush()
+        try:
+            final = future.result()
+        except Exception as exc:
+            final = {"error": str(exc)}
+        self.wfile.write(json.dumps(final).encode("utf-8") + b"\n")
+        status = f"error: {final['error']}" if "error" in final else "done"
+        print(f"Served {len(request.get('plans', []))} shot(s) in {time.perf_counter() - started:.1f}s ({status})")
+
+
+def serve(docs_root: Path, headed: bool) -> None:
+    """Run the capture daemon until interrupted."""
+    daemon = CaptureDaemon(docs_root, headed)
+    daemon.start()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DaemonHandler)
+    server.capture_daemon = daemon
+    server.token = secrets.token_urlsafe(32)
+    host, port = server.server_address[:2]
+    state_path = docs_root / DAEMON_STATE
+    _write_private(state_path, json.dumps({"pid": os.getpid(), "port": port, "token": server.token}) + "\n")
+    print(f"Capture daemon listening on http://{host}:{port} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        state_path.unlink(missing_ok=True)
+        daemon.stop()
+
+
+def find_daemon(docs_root: Path) -> DaemonAddress | None:
+    """Address of a running daemon for this docs root, if any."""
     try:
-        from playwright.sync_api import sync_playwright
+        state = json.loads((docs_root / DAEMON_STATE).read_text(encoding="utf-8"))
+        daemon = DaemonAddress(f"http://127.0.0.1:{int(state['port'])}", str(state["token"]))
+        with urlopen(Request(f"{daemon.url}/status", headers=daemon.headers()), timeout=1) as response:
+            status = json.loads(response.read())
+    except (OSError, ValueError, KeyError, TypeError, URLError):
+        return None
+    if Path(status.get("root", "")) != docs_root:
+        return None
+    return daemon
+
+
+def _run_capture_remote(
+    daemon: DaemonAddress,
+    plans: list[ShotPlan],
+    options: CaptureOptions,
+    request: dict[str, Any],
+    collect: Any,
+) -> dict[str, Any]:
+    """Send plans to a daemon and collect its results; unreported shots fail."""
+    payload = {
+        **request,
+        "plans": [_plan_to_json(plan) for plan in plans],
+        "timeout_ms": options.timeout_ms,
+        "overwrite": options.overwrite,
+        "incremental": options.incremental,
+        "unchanged": sorted(os.fspath(p) for p in options.unchanged),
+        "compare": options.compare,
+        "diff_threshold": options.diff_threshold,
+        "fixed_settle": options.fixed_settle,
+        "shot_budget_ms": options.shot_budget_ms,
+        "retries": options.retries,
+    }
+    seen: set[int] = set()
+    final: dict[str, Any] = {}
+    try:
+        with urlopen(
+            Request(
+                f"{daemon.url}/capture",
+                data=json.dumps(payload).encode("utf-8"),
+                headers={**daemon.headers(), "Content-Type": "application/json"},
+            )
+        ) as response:
+            for line in response:
+                record = json.loads(line)
+                if "index" in record:
+                    seen.add(record["index"])
+                    collect(_result_from_json(record, plans))
+                else:
+                    final = record
+    except (OSError, ValueError, URLError) as exc:
+        final = {"error": str(exc)}
+    if "error" in final:
+        for index, plan in enumerate(plans):
+            if index not in seen:
+                collect(ShotResult(index, plan, "fail", f"capture daemon: {final['error']}"))
+    return final
+
+
+def run_capture(
+    plans: list[ShotPlan],
+    timeout_ms: int,
+    headed: bool,
+    overwrite: bool = False,
+    profiler: Profiler | None = None,
+    workers: int = 1,
+    sessions: SessionStore | None = None,
+    manifest: CaptureManifest | None = None,
+    incremental: bool = False,
+    app_build: str = "",
+    compare: bool = False,
+    diff_threshold: float = DEFAULT_DIFF_THRESHOLD,
+    layout: str = "browsers",
+    asset_cache: bool = True,
+    chain: bool = True,
+    fixed_settle: bool = False,
+    daemon: DaemonAddress | None = None,
+    shot_budget_ms: int = DEFAULT_SHOT_BUDGET_MS,
+    retries: int = DEFAULT_RETRIES,
+    results: list[ShotResult] | None = None,
+    har: HarFixtures | None = None,
+) -> dict[str, int]:
+    """Capture every plan; returns counts for ok/fail/skip and changed/unchanged outputs.
+
+    Captures run on asyncio. layout="browsers" launches one browser per
+    worker; layout="pages" drives up to `workers` pages of one browser, with
+    static assets served from a shared in-process cache. With `daemon` (from
+    find_daemon) the plans are captured by that process, always in the
+    "pages" layout and with the daemon's own sessions (passing
+    `sessions=None` still turns reuse off). Every result is appended to
+    `results`, in plan order, when given. With `har`, contexts record their
+    traffic to it or replay from it; the asset cache is then bypassed so each
+    context records (or is served) every request itself.
+    """
+    if profiler is None:
+        profiler = Profiler("build-screenshots", enabled=False)
+    totals = {"ok": 0, "fail": 0, "skip": 0, "changed": 0, "unchanged": 0}
+
+    def _tally(result: ShotResult) -> None:
+        _report_result(result, profiler)
+        totals[result.status] += 1
+        if results is not None:
+            results.append(result)
+        if result.status == "ok":
+            totals["changed" if result.changed else "unchanged"] += 1
+            if manifest is not None:
+                manifest.record(result.plan.output, options.keys[result.plan.output.resolve()])
+
+    options = CaptureOptions(
+        timeout_ms=timeout_ms,
+        overwrite=overwrite,
+        incremental=incremental,
+        sessions=sessions,
+        manifest=manifest,
+        keys=CaptureManifest.plan_keys(plans, app_build) if manifest is not None else {},
+        compare=compare,
+        diff_threshold=diff_threshold,
+        fixed_settle=fixed_settle,
+        shot_budget_ms=shot_budget_ms,
+        retries=retries,
+        har=har,
+    )
+    if compare and not pillow_available():
+        print("WARN --compare without Pillow only detects byte-identical images")
+    if incremental and manifest is not None:
+        # Decided once up front so every directive sharing an output agrees.
+        options.unchanged = {
+            output for output, key in options.keys.items() if manifest.fresh(output, key)
+        }
+    # Report in plan order regardless of completion order, as soon as each prefix is done.
+    pending: dict[int, ShotResult] = {}
+    next_index = 0
+
+    def _collect(result: ShotResult) -> None:
+        nonlocal next_index
+        pending[result.index] = result
+        while next_index in pending:
+            _tally(pending.pop(next_index))
+            next_index += 1
+
+    if daemon is not None:
+        request = {
+            "workers": workers,
+            "chain": chain,
+            "asset_cache": asset_cache,
+            "app_build": app_build,
+            "session_reuse": sessions is not None,
+        }
+        final = _run_capture_remote(daemon, plans, options, request, _collect)
+        if "error" in final:
+            print(f"WARN capture daemon failed: {final['error']}")
+        else:
+            print(f"Sessions: logins={final['logins']} reused={final['reused']} (daemon)")
+            if final.get("asset_cache"):
+                profiler.extra["asset_cache"] = final["asset_cache"]
+                stats = final["asset_cache"]
+                print(
+                    f"Asset cache: hits={stats['hits']} misses={stats['misses']} "
+                    f"({stats['hit_rate']:.0%} hit, daemon)"
+                )
+        return totals
+    try:
+        import playwright.async_api
     except Exception as exc:
         print(
             "Playwright is required for capture. Install it with '\n"
@@ -445,49 +2298,26 @@ def run_capture(plans: list[ShotPlan], timeout_ms: int, headed: bool, overwrite:
             f"Import error: {exc}",
             file=sys.stderr,
         )
-        return (0, len(plans))
-
-    ok = 0
-    fail = 0
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=not headed)
-        try:
-            for plan in plans:
-                if plan.output.exists() and not overwrite:
-                    print(f"SKIP {plan.source}:{plan.line} -> {plan.output} (already exists)")
-                    continue
-                context = browser.new_context(
-                    viewport={"width": DEFAULT_VIEWPORT_WIDTH, "height": DEFAULT_VIEWPORT_HEIGHT}
-                )
-                page = context.new_page()
-                try:
-                    if plan.dark_mode:
-                        page.emulate_media(color_scheme="dark")
-                    page.goto(plan.url, wait_until="domcontentloaded", timeout=timeout_ms)
-                    if plan.login:
-                        _run_login(page, plan, timeout_ms)
-                    if plan.dark_toggle:
-                        page.click(plan.dark_toggle, timeout=timeout_ms)
-                    _run_click_steps(page, plan, timeout_ms)
-                    if plan.next_url:
-                        page.goto(plan.next_url, wait_until="domcontentloaded", timeout=timeout_ms)
-                    if plan.wait_for:
-                        page.wait_for_selector(plan.wait_for, timeout=timeout_ms)
-                    _apply_highlight(page, plan)
-                    if plan.settle_ms > 0:
-                        page.wait_for_timeout(plan.settle_ms)
-                    _capture(page, plan, timeout_ms)
-                    print(f"OK   {plan.source}:{plan.line} -> {plan.output}")
-                    ok += 1
-                except Exception as exc:
-                    print(f"FAIL {plan.source}:{plan.line} -> {plan.output} ({exc})")
-                    fail += 1
-                finally:
-                    page.close()
-                    context.close()
-        finally:
-            browser.close()
-    return (ok, fail)
+        # Nothing can be captured, so every selected shot failed and belongs in the rerun file.
+        for index, plan in enumerate(plans):
+            _collect(ShotResult(index, plan, "fail", "Playwright is not installed"))
+        return totals
+
+    units = _capture_units(plans, timeout_ms, chain, workers)
+    workers = max(1, min(workers, len(units)))
+    browsers, pages = (1, workers) if layout == "pages" else (workers, 1)
+    assets = AssetCache(timeout_ms) if layout == "pages" and asset_cache and har is None else None
+    asyncio.run(
+        _run_capture_local(plans, units, options, headed, browsers, pages, _collect, profiler, assets)
+    )
+    if assets is not None:
+        stats = assets.stats()
+        profiler.extra["asset_cache"] = stats
+        print(
+            f"Asset cache: hits={stats['hits']} misses={stats['misses']} "
+            f"({stats['hit_rate']:.0%} hit, {stats['bytes_saved'] // 1024} KB served locally)"
+        )
+    return totals
 
 
 def parse_args() -> argparse.Namespace:
@@ -498,35 +2328,270 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Default password")
     parser.add_argument("--timeout-ms", type=int, default=DEFAULT_TIMEOUT_MS, help="Default timeout")
     parser.add_argument("--headed", action="store_true", help="Run browser with UI")
+    parser.add_argument(
+        "--shot-budget-ms",
+        type=int,
+        default=DEFAULT_SHOT_BUDGET_MS,
+        help=(
+            "Wall-clock limit for one shot including retries and backoff; "
+            "an attempt still running when it is spent is cancelled (0 = none)"
+        ),
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="Retries, with exponential backoff, for shots whose page failed to load",
+    )
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing image files")
     parser.add_argument("--dry-run", action="store_true", help="Print capture plan only")
+    parser.add_argument(
+        "--only",
+        action="append",
+        metavar="PATH",
+        help="Only directives from this markdown file or directory (repeatable)",
+    )
+    parser.add_argument(
+        "--output-glob",
+        action="append",
+        metavar="PATTERN",
+        help="Only directives whose output matches this glob, e.g. 'media/screenshot-feature-rules*' (repeatable)",
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="Only directives in markdown files changed since this git ref (including uncommitted edits)",
+    )
+    parser.add_argument(
+        "--from-rerun",
+        action="store_true",
+        help="Only directives that failed in the last run (see --rerun-file)",
+    )
+    parser.add_argument(
+        "--rerun-file",
+        type=Path,
+        default=DEFAULT_RERUN,
+        metavar="PATH",
+        help="Where failed directives are recorded, relative to --root (default .cache/build-screenshots/rerun.json)",
+    )
+    parser.add_argument(
+        "--list-outputs",
+        action="store_true",
+        help="Print the selected output paths, relative to --root, and exit",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Capture to memory and only replace files whose pixels meaningfully changed",
+    )
+    parser.add_argument(
+        "--diff-threshold",
+        type=float,
+        default=DEFAULT_DIFF_THRESHOLD,
+        metavar="FRACTION",
+        help=f"With --compare, fraction of unmasked pixels that must differ (default {DEFAULT_DIFF_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Recapture only shots whose directive, app build or viewport changed (see --manifest)",
+    )
+    parser.add_argument(
+        "--app-build",
+        default="",
+        metavar="ID",
+        help="App version/build id; part of each shot's manifest key",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=DEFAULT_MANIFEST,
+        metavar="PATH",
+        help="Capture manifest path, relative to --root (default .cache/build-screenshots/manifest.json)",
+    )
+    parser.add_argument(
+        "--no-optimize",
+        action="store_true",
+        help="Skip the image stage (lossless PNG recompression, WebP variants, image manifest)",
+    )
+    parser.add_argument(
+        "--optimize-only",
+        action="store_true",
+        help="Run only the image stage over existing screenshot outputs",
+    )
+    parser.add_argument("--avif", action="store_true", help="Also write AVIF variants in the image stage")
+    parser.add_argument(
+        "--no-session-reuse",
+        action="store_true",
+        help="Replay every directive's login steps instead of reusing a stored session",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Capture with N browsers in parallel (shots sharing an output stay serial); "
+        "with --layout pages, N concurrent pages in one browser",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=("browsers", "pages"),
+        default="browsers",
+        help="How workers are laid out; browsers runs one browser per worker, pages shares "
+        "one browser and a static asset cache across pages",
+    )
+    parser.add_argument(
+        "--no-asset-cache",
+        action="store_true",
+        help="With --layout pages, let every context fetch static assets itself",
+    )
+    parser.add_argument(
+        "--no-chain",
+        action="store_true",
+        help="Capture every directive from a fresh page instead of chaining shared click paths",
+    )
+    parser.add_argument(
+        "--fixed-settle",
+        action="store_true",
+        help="Always sleep the full settle_ms before a shot instead of waiting for the page to go quiet",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=DEFAULT_REPORT,
+        metavar="PATH",
+        help="JSON capture report with per-step timings, relative to --root "
+        "(default .cache/build-screenshots/report.json)",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run a capture daemon that keeps the browser, sessions and asset cache warm; "
+        "later runs against the same --root send their shots to it",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Capture in this process even when a --serve daemon is running",
+    )
+    parser.add_argument(
+        "--record-har",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Record the app's HTTP traffic into a HAR fixture for --replay-har, merged with what it "
+        "already holds (default .cache/build-screenshots/fixtures.har)",
+    )
+    parser.add_argument(
+        "--replay-har",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Serve every request from a recorded HAR fixture instead of the device; "
+        "requests it does not cover fail",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Write a JSON timing report (default .cache/profile/build-screenshots.json)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Also dump cProfile stats for the run to PATH",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
     docs_root = args.root.resolve()
+    if args.record_har is not None and args.replay_har is not None:
+        raise SystemExit("--record-har and --replay-har cannot be combined")
+    if args.serve:
+        serve(docs_root, args.headed)
+        return
+    report_path = profile_path(args.profile, docs_root, "build-screenshots")
+    profiler = Profiler("build-screenshots", enabled=report_path is not None)
+    try:
+        run_profiled(lambda: _main(args, docs_root, profiler), args.cprofile)
+    finally:
+        if report_path is not None:
+            profiler.write(report_path)
+
+
+def _optimize_outputs(
+    plans: list[ShotPlan],
+    docs_root: Path,
+    args: argparse.Namespace,
+    profiler: Profiler,
+    manifest: CaptureManifest,
+) -> None:
+    if not pillow_available():
+        print("Skipping image stage (Pillow not installed: pip install pillow)")
+        return
+    avif = args.avif
+    if avif and not avif_supported():
+        print("WARN Pillow was built without AVIF support; writing WebP only")
+        avif = False
+    outputs = sorted({plan.output for plan in plans})
+    with profiler.phase("optimize"):
+        stats = optimize_images(
+            outputs, docs_root, docs_root / IMAGE_MANIFEST, avif=avif, workers=args.workers
+        )
+    for output in outputs:
+        manifest.rehash(output)
+    profiler.extra["images"] = stats
+    print(
+        f"Optimized {stats['updated']}/{stats['images']} image(s): "
+        f"PNG -{stats['png_saved'] // 1024} KB, variants {stats['variant_bytes'] // 1024} KB"
+    )
+
+
+def _main(args: argparse.Namespace, docs_root: Path, profiler: Profiler) -> None:
     pages_root = docs_root / "pages"
 
-    parsed = parse_directives(pages_root, docs_root)
+    with profiler.phase("parse"):
+        parsed = parse_directives(pages_root, docs_root)
     if not parsed:
         print("No screenshot directives found.")
         return
 
     plans: list[ShotPlan] = []
-    for spec, source, line in parsed:
-        plan = build_plan(
-            spec=spec,
-            source=source,
-            line=line,
-            docs_root=docs_root,
-            default_domain=args.domain,
-            default_username=args.username,
-            default_password=args.password,
-        )
-        plans.append(plan)
-
-    print(f"Found {len(plans)} screenshot directives")
+    with profiler.phase("plan"):
+        for spec, source, line in parsed:
+            plan = build_plan(
+                spec=spec,
+                source=source,
+                line=line,
+                docs_root=docs_root,
+                default_domain=args.domain,
+                default_username=args.username,
+                default_password=args.password,
+            )
+            plans.append(plan)
+
+    found = len(plans)
+    rerun_path = args.rerun_file if args.rerun_file.is_absolute() else docs_root / args.rerun_file
+    rerun = load_rerun(rerun_path) if args.from_rerun else None
+    if args.only or args.output_glob or args.changed_since or rerun is not None:
+        plans = select_plans(plans, docs_root, args.only, args.output_glob, args.changed_since, rerun)
+    if args.list_outputs:
+        for output in dict.fromkeys(plan.output.resolve() for plan in plans):
+            print(output.relative_to(docs_root).as_posix() if output.is_relative_to(docs_root) else output)
+        return
+    if len(plans) < found:
+        print(f"Selected {len(plans)} of {found} screenshot directives")
+    else:
+        print(f"Found {len(plans)} screenshot directives")
+    if not plans:
+        return
     for plan in plans:
         target_label = plan.target or ("full-page" if plan.full_page else "window")
         if plan.login:
@@ -543,14 +2608,85 @@ def main() -> None:
     if args.dry_run:
         return
 
-    ok, fail = run_capture(
-        plans,
-        timeout_ms=args.timeout_ms,
-        headed=args.headed,
-        overwrite=args.overwrite,
+    manifest_path = args.manifest if args.manifest.is_absolute() else docs_root / args.manifest
+    manifest = CaptureManifest.load(manifest_path, docs_root)
+    if args.optimize_only:
+        if not pillow_available():
+            raise SystemExit("--optimize-only needs Pillow: pip install pillow")
+        _optimize_outputs(plans, docs_root, args, profiler, manifest)
+        manifest.save()
+        return
+
+    har = None
+    if args.record_har is not None or args.replay_har is not None:
+        mode = "record" if args.record_har is not None else "replay"
+        har_path = Path((args.record_har if mode == "record" else args.replay_har) or DEFAULT_HAR)
+        har = HarFixtures(har_path if har_path.is_absolute() else docs_root / har_path, mode)
+        if mode == "replay":
+            if not har.path.exists():
+                raise SystemExit(f"No HAR fixture at {har.path}; record one with --record-har")
+            entries = har.entry_count()
+            profiler.extra["har"] = {"mode": "replay", "entries": entries}
+            print(f"Replaying {entries} recorded response(s) from {har.path}")
+    # The daemon's contexts are not recorded or routed; stored sessions would skip the
+    # login requests a replay needs, so fixture runs log in every time.
+    daemon = None if args.no_daemon or har is not None else find_daemon(docs_root)
+    if daemon is not None:
+        print(f"Using capture daemon at {daemon.url}")
+    reuse_sessions = not args.no_session_reuse and har is None
+    sessions = SessionStore(docs_root / SESSION_CACHE) if reuse_sessions else None
+    if sessions is not None and daemon is None:
+        sessions.load()
+    results: list[ShotResult] = []
+    with profiler.phase("capture"):
+        totals = run_capture(
+            plans,
+            timeout_ms=args.timeout_ms,
+            headed=args.headed,
+            overwrite=args.overwrite,
+            profiler=profiler,
+            workers=args.workers,
+            sessions=sessions,
+            manifest=manifest,
+            incremental=args.incremental,
+            app_build=args.app_build,
+            compare=args.compare,
+            diff_threshold=args.diff_threshold,
+            layout=args.layout,
+            asset_cache=not args.no_asset_cache,
+            chain=not args.no_chain,
+            fixed_settle=args.fixed_settle,
+            daemon=daemon,
+            shot_budget_ms=args.shot_budget_ms,
+            retries=args.retries,
+            results=results,
+            har=har,
+        )
+    if har is not None and har.mode == "record":
+        entries, updated = har.merge()
+        profiler.extra["har"] = {"mode": "record", "entries": entries, "recorded": updated}
+        print(f"Recorded {updated} response(s) into {har.path} ({entries} total)")
+    if not args.no_optimize:
+        _optimize_outputs(plans, docs_root, args, profiler, manifest)
+    manifest.save()
+    if sessions is not None and daemon is None:
+        sessions.save()
+        profiler.extra["sessions"] = {"logins": sessions.logins, "reused": sessions.reused}
+        print(f"Sessions: logins={sessions.logins} reused={sessions.reused}")
+    profiler.extra["shots"] = {"planned": len(plans), **totals}
+    print(
+        f"Completed: ok={totals['ok']} fail={totals['fail']} "
+        f"changed={totals['changed']} unchanged={totals['unchanged']}"
     )
-    print(f"Completed: ok={ok} fail={fail}")
-    if fail:
+    report_path = args.report if args.report.is_absolute() else docs_root / args.report
+    write_report(report_path, results, docs_root, totals, args.app_build)
+    print(f"Capture report written to {report_path}")
+    # Shots the circuit breaker never let start are failures too, so they get rerun.
+    attempted = [result.plan for result in results if result.status != "skip"]
+    failed = [result.plan for result in results if result.status == "fail"]
+    write_rerun(rerun_path, attempted, failed)
+    if totals["fail"]:
+        print(f"Wrote {len(failed)} failed shot(s) to {rerun_path}; retry them with --from-rerun")
         raise SystemExit(1)
 
 
@@ -0,0 +1,122 @@
+"""Timing reports for the docs utilities (--profile / --cprofile).
+
+A Profiler collects wall and CPU time per named phase, per-item timings
+(pages, shots) and bytes written, and serialises them as JSON so runs can
+be compared across CI builds.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+DEFAULT_PROFILE_DIR = Path(".cache") / "profile"
+
+
+class Profiler:
+    def __init__(self, tool: str, enabled: bool = True) -> None:
+        self.tool = tool
+        self.enabled = enabled
+        self.started_at = datetime.now(timezone.utc)
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self.phases: dict[str, dict[str, float]] = {}
+        self.items: dict[str, list[tuple[str, float]]] = {}
+        self.bytes_written: dict[str, int] = {}
+        self.extra: dict[str, Any] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add_phase(self, name: str, wall_s: float, cpu_s: float = 0.0) -> None:
+        if not self.enabled:
+            return
+        entry = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0})
+        entry["wall_s"] += wall_s
+        entry["cpu_s"] += cpu_s
+        entry["calls"] += 1
+
+    def record(self, kind: str, label: str, seconds: float) -> None:
+        if self.enabled:
+            self.items.setdefault(kind, []).append((label, seconds))
+
+    def wrote(self, path: Path | str, nbytes: int) -> None:
+        if self.enabled:
+            self.bytes_written[os.fspath(path)] = nbytes
+
+    def write_text(self, path: Path, text: str, encoding: str = "utf-8") -> None:
+        """Write a text file and account for its encoded size."""
+        data = text.encode(encoding)
+        path.write_bytes(data)
+        self.wrote(path, len(data))
+
+    def report(self, top: int = 10) -> dict[str, Any]:
+        slowest = {
+            kind: [
+                {"label": label, "seconds": round(seconds, 6)}
+                for label, seconds in sorted(entries, key=lambda e: -e[1])[:top]
+            ]
+            for kind, entries in self.items.items()
+        }
+        return {
+            "tool": self.tool,
+            "started_at": self.started_at.isoformat(),
+            "wall_s": round(time.perf_counter() - self._wall0, 6),
+            "cpu_s": round(time.process_time() - self._cpu0, 6),
+            "phases": [
+                {
+                    "name": name,
+                    "wall_s": round(v["wall_s"], 6),
+                    "cpu_s": round(v["cpu_s"], 6),
+                    "calls": int(v["calls"]),
+                }
+                for name, v in self.phases.items()
+            ],
+            "slowest": slowest,
+            "bytes_written": {
+                "total": sum(self.bytes_written.values()),
+                "files": dict(sorted(self.bytes_written.items())),
+            },
+            **self.extra,
+        }
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), indent=2) + "\n", encoding="utf-8")
+        print(f"Profile written to {path}")
+
+
+def profile_path(value: str | None, root: Path, tool: str) -> Path | None:
+    """Resolve a --profile argument: None (off), "" (default location) or a path."""
+    if value is None:
+        return None
+    path = Path(value) if value else DEFAULT_PROFILE_DIR / f"{tool}.json"
+    return path if path.is_absolute() else root / path
+
+
+def run_profiled(func: Callable[[], Any], cprofile_path: Path | None) -> Any:
+    """Call `func`, dumping cProfile stats to `cprofile_path` when given."""
+    if cprofile_path is None:
+        return func()
+    import cProfile
+
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(func)
+    finally:
+        cprofile_path.parent.mkdir(parents=True, exist_ok=True)
+        prof.dump_stats(str(cprofile_path))
+        print(f"cProfile stats written to {cprofile_path}")
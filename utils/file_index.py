@@ -0,0 +1,112 @@
+"""Shared file index for the docs utilities.
+
+One walk records every path under the given roots with its size and mtime.
+File contents are read lazily and kept, so build-docs.py and
+build-screenshots.py read each markdown file at most once per run.
+"""
+from __future__ import annotations
+
+import os
+import stat
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass
+class FileEntry:
+    path: Path
+    is_file: bool
+    size: int
+    mtime_ns: int
+    _data: bytes | None = field(default=None, repr=False, compare=False)
+
+    def read_bytes(self) -> bytes:
+        if self._data is None:
+            self._data = self.path.read_bytes()
+        return self._data
+
+    def read_text(self, encoding: str = "utf-8") -> str:
+        return self.read_bytes().decode(encoding)
+
+
+def _key(path: Path | str) -> str:
+    return os.path.normpath(os.fspath(path))
+
+
+class FileIndex:
+    """Paths under one or more roots, keyed by normalised absolute path."""
+
+    def __init__(self, *roots: Path) -> None:
+        self.roots = [Path(r) for r in roots]
+        self.entries: dict[str, FileEntry] = {}
+        for root in self.roots:
+            self._walk(root)
+
+    def _walk(self, base: Path) -> None:
+        for dirpath, dirnames, filenames in os.walk(base):
+            for name in dirnames:
+                self._stat(Path(dirpath) / name)
+            for name in filenames:
+                self._stat(Path(dirpath) / name)
+
+    def _stat(self, path: Path) -> FileEntry | None:
+        try:
+            st = path.stat()
+        except OSError:
+            self.entries.pop(_key(path), None)
+            return None
+        is_file = not stat.S_ISDIR(st.st_mode)
+        entry = FileEntry(
+            path=path,
+            is_file=is_file,
+            size=st.st_size if is_file else 0,
+            mtime_ns=st.st_mtime_ns if is_file else 0,
+        )
+        self.entries[_key(path)] = entry
+        return entry
+
+    def __contains__(self, path: Path | str) -> bool:
+        return _key(path) in self.entries
+
+    def get(self, path: Path | str) -> FileEntry | None:
+        return self.entries.get(_key(path))
+
+    @property
+    def kinds(self) -> dict[str, bool]:
+        """Plain `{path: is_file}` map; cheap to pickle for worker processes."""
+        return {k: e.is_file for k, e in self.entries.items()}
+
+    def files(self, root: Path, suffix: str | None = None) -> list[FileEntry]:
+        """Files under `root` (optionally filtered by suffix), in Path sort order."""
+        prefix = _key(root) + os.sep
+        found = [
+            e
+            for k, e in self.entries.items()
+            if e.is_file
+            and k.startswith(prefix)
+            and (suffix is None or e.path.suffix.lower() == suffix)
+        ]
+        return sorted(found, key=lambda e: e.path)
+
+    def read_text(self, path: Path | str, encoding: str = "utf-8") -> str:
+        entry = self.get(path)
+        if entry is None or not entry.is_file:
+            raise FileNotFoundError(path)
+        return entry.read_text(encoding)
+
+    def refresh(self, paths: list[Path] | set[Path]) -> None:
+        """Re-stat changed paths; cached contents are dropped only when size or mtime moved."""
+        for path in paths:
+            old = self.get(path)
+            new = self._stat(Path(path))
+            if new is None:
+                # Deleted: forget anything that lived below it as well.
+                prefix = _key(path) + os.sep
+                for k in [k for k in self.entries if k.startswith(prefix)]:
+                    del self.entries[k]
+                continue
+            if not new.is_file:
+                self._walk(new.path)
+                continue
+            if old is not None and old.is_file and (old.size, old.mtime_ns) == (new.size, new.mtime_ns):
+                new._data = old._data
@@ -0,0 +1,237 @@
+"""Post-capture image stage for screenshots.
+
+PNGs are recompressed losslessly in place, and WebP (optionally AVIF)
+siblings are written at full size plus a few narrower widths. Dimensions and
+variants go into image-manifest.json at the docs root, which build-docs.py
+turns into <picture>/srcset markup with explicit width/height.
+
+Pillow is optional: without it the stage reports that and leaves files alone.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+try:
+    from PIL import Image as _Image  # type: ignore
+    from PIL import ImageChops as _ImageChops  # type: ignore
+    from PIL import ImageDraw as _ImageDraw  # type: ignore
+    from PIL import features as _features  # type: ignore
+except Exception:
+    _Image = None
+    _ImageChops = None
+    _ImageDraw = None
+    _features = None
+
+IMAGE_MANIFEST = Path("image-manifest.json")
+IMAGE_MANIFEST_VERSION = 1
+RESPONSIVE_WIDTHS = (720, 1080)
+WEBP_QUALITY = 85
+AVIF_QUALITY = 70
+VARIANT_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+# Per-pixel max channel difference (0-255) below which a pixel counts as unchanged.
+DIFF_PIXEL_TOLERANCE = 24
+
+
+def pillow_available() -> bool:
+    return _Image is not None
+
+
+def avif_supported() -> bool:
+    return _features is not None and bool(_features.check("avif"))
+
+
+def image_diff(
+    old: bytes,
+    new: bytes,
+    masks: list[tuple[int, int, int, int]] | None = None,
+    tolerance: int = DIFF_PIXEL_TOLERANCE,
+) -> float:
+    """Fraction of pixels outside `masks` that changed by more than `tolerance`.
+
+    Masks are (left, top, right, bottom) boxes in image pixels. Images of
+    different sizes count as fully changed.
+    """
+    with _Image.open(io.BytesIO(old)) as a, _Image.open(io.BytesIO(new)) as b:
+        before = a.convert("RGB")
+        after = b.convert("RGB")
+    if before.size != after.size:
+        return 1.0
+    red, green, blue = _ImageChops.difference(before, after).split()
+    delta = _ImageChops.lighter(_ImageChops.lighter(red, green), blue)
+    changed = delta.point(lambda v: 255 if v > tolerance else 0)
+    total = before.size[0] * before.size[1]
+    if masks:
+        masked = _Image.new("L", before.size, 0)
+        draw = _ImageDraw.Draw(masked)
+        for left, top, right, bottom in masks:
+            if right > left and bottom > top:
+                draw.rectangle((left, top, right - 1, bottom - 1), fill=255)
+        changed = _ImageChops.subtract(changed, masked)
+        total -= masked.histogram()[255]
+    if total <= 0:
+        return 0.0
+    return changed.histogram()[255] / total
+
+
+def load_image_manifest(path: Path) -> dict[str, dict[str, Any]]:
+    """`{site-relative png path: entry}`; empty when missing or unreadable."""
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(raw, dict) or raw.get("version") != IMAGE_MANIFEST_VERSION:
+        return {}
+    images = raw.get("images")
+    return images if isinstance(images, dict) else {}
+
+
+def prune_image_manifest(images: dict[str, dict[str, Any]], root: Path) -> dict[str, dict[str, Any]]:
+    """`images` without entries whose PNG is gone, and without variant files that are gone."""
+    kept: dict[str, dict[str, Any]] = {}
+    for name, entry in images.items():
+        if not (root / name).is_file():
+            continue
+        variants = entry.get("variants", [])
+        present = [v for v in variants if (root / v["path"]).is_file()]
+        kept[name] = entry if len(present) == len(variants) else {**entry, "variants": present}
+    return kept
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def _encode(image: Any, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "png":
+        image.save(buf, "PNG", optimize=True)
+    elif fmt == "webp":
+        image.save(buf, "WEBP", quality=WEBP_QUALITY, method=5)
+    else:
+        image.save(buf, "AVIF", quality=AVIF_QUALITY)
+    return buf.getvalue()
+
+
+def _variant_path(src: Path, width: int, full_width: int, fmt: str) -> Path:
+    if width == full_width:
+        return src.with_suffix(f".{fmt}")
+    return src.with_name(f"{src.stem}-{width}w.{fmt}")
+
+
+def optimize_image(
+    src: Path, root: Path, previous: dict[str, Any] | None, formats: tuple[str, ...]
+) -> tuple[dict[str, Any], int, int]:
+    """Process one PNG; returns (manifest entry, bytes saved on the PNG, variant bytes written)."""
+    data = src.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    if (
+        previous is not None
+        and previous.get("sha256") == digest
+        and previous.get("formats") == list(formats)
+        and all((root / v["path"]).exists() for v in previous.get("variants", []))
+    ):
+        return previous, 0, 0
+
+    with _Image.open(io.BytesIO(data)) as opened:
+        image = opened.copy()
+    saved = 0
+    packed = _encode(image, "png")
+    if len(packed) < len(data):
+        _write_atomic(src, packed)
+        saved = len(data) - len(packed)
+        data = packed
+        digest = hashlib.sha256(data).hexdigest()
+
+    width, height = image.size
+    widths = [w for w in RESPONSIVE_WIDTHS if w < width] + [width]
+    variants: list[dict[str, Any]] = []
+    written = 0
+    for w in widths:
+        h = max(1, round(height * w / width))
+        scaled = image if w == width else image.resize((w, h), _Image.LANCZOS)
+        for fmt in formats:
+            out = _variant_path(src, w, width, fmt)
+            encoded = _encode(scaled, fmt)
+            _write_atomic(out, encoded)
+            written += len(encoded)
+            variants.append(
+                {
+                    "path": out.relative_to(root).as_posix(),
+                    "type": VARIANT_TYPES[fmt],
+                    "width": w,
+                    "height": h,
+                    "bytes": len(encoded),
+                }
+            )
+
+    keep = {v["path"] for v in variants}
+    for old in (previous or {}).get("variants", []):
+        if old.get("path") not in keep:
+            (root / old["path"]).unlink(missing_ok=True)
+
+    entry = {
+        "width": width,
+        "height": height,
+        "bytes": len(data),
+        "sha256": digest,
+        "formats": list(formats),
+        "variants": variants,
+    }
+    return entry, saved, written
+
+
+def _optimize_task(
+    task: tuple[Path, Path, dict[str, Any] | None, tuple[str, ...]],
+) -> tuple[dict[str, Any], int, int]:
+    return optimize_image(*task)
+
+
+def optimize_images(
+    paths: list[Path],
+    root: Path,
+    manifest_path: Path,
+    avif: bool = False,
+    workers: int = 1,
+) -> dict[str, int]:
+    """Run the stage over existing PNGs under `root` and rewrite the manifest."""
+    formats = ("avif", "webp") if avif else ("webp",)
+    images = load_image_manifest(manifest_path)
+    todo = sorted(
+        {p.resolve() for p in paths if p.suffix.lower() == ".png" and p.exists()}
+    )
+    root = root.resolve()
+    todo = [p for p in todo if p.is_relative_to(root)]
+
+    names = [src.relative_to(root).as_posix() for src in todo]
+    tasks = [(src, root, images.get(name), formats) for src, name in zip(todo, names)]
+    if workers > 1 and len(tasks) > 1:
+        # Encoding is CPU-bound and mostly holds the GIL, so use processes.
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_optimize_task, tasks))
+    else:
+        results = [_optimize_task(task) for task in tasks]
+
+    stats = {"images": len(todo), "updated": 0, "png_saved": 0, "variant_bytes": 0}
+    for name, (entry, saved, written) in zip(names, results):
+        if entry != images.get(name):
+            stats["updated"] += 1
+        images[name] = entry
+        stats["png_saved"] += saved
+        stats["variant_bytes"] += written
+
+    images = prune_image_manifest(dict(sorted(images.items())), root)
+    tmp = manifest_path.with_name(manifest_path.name + ".tmp")
+    tmp.write_text(
+        json.dumps({"version": IMAGE_MANIFEST_VERSION, "images": images}, indent=2) + "\n",
+        encoding="utf-8",
+    )
+    os.replace(tmp, manifest_path)
+    return stats
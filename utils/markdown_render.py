@@ -0,0 +1,1928 @@
+"""Markdown to HTML for the docs site, without third-party dependencies.
+
+`render()` produces the same HTML as python-markdown 3.x called with the
+`fenced_code`, `tables` and `toc` extensions (xhtml tags, heading ids), so a
+page renders identically whether or not `markdown` is installed. The block,
+inline and tree passes follow python-markdown rule for rule, in the same
+order, because its output depends on that order (raw HTML stashing, lazy list
+continuations, nested emphasis).
+
+It is faster than python-markdown because nothing is set up per document
+(all patterns are compiled once), inline rules are skipped for text that
+does not contain their trigger characters, and the tree is a light node type
+that is serialised directly instead of through ElementTree.
+
+`build-docs.py --check-markdown` renders every page both ways and reports any
+page whose output differs.
+"""
+from __future__ import annotations
+
+import html
+import html.entities
+import importlib.util
+import re
+import unicodedata
+from collections import deque
+from xml.etree.ElementTree import HTML_EMPTY
+
+TAB_LENGTH = 4
+
+STX = "\x02"
+ETX = "\x03"
+_INLINE_PLACEHOLDER_PREFIX = STX + "klzzwxh:"
+_INLINE_PLACEHOLDER = _INLINE_PLACEHOLDER_PREFIX + "%s" + ETX
+_INLINE_PLACEHOLDER_RE = re.compile(_INLINE_PLACEHOLDER % r"([0-9]+)")
+_AMP_SUBSTITUTE = STX + "amp" + ETX
+_HTML_PLACEHOLDER = STX + "wzxhzdk:%s" + ETX
+_HTML_PLACEHOLDER_SUB_RE = re.compile(
+    "<p>{0}</p>|{0}".format(_HTML_PLACEHOLDER % r"([0-9]+)")
+)
+_ESCAPED_CHAR_RE = re.compile(STX + r"(\d+)" + ETX)
+
+BLOCK_LEVEL_ELEMENTS = frozenset([
+    "address", "article", "aside", "blockquote", "details", "div", "dl",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3",
+    "h4", "h5", "h6", "header", "hgroup", "hr", "main", "menu", "nav", "ol",
+    "p", "pre", "section", "table", "ul",
+    "canvas", "colgroup", "dd", "body", "dt", "group", "html", "iframe", "li", "legend",
+    "math", "map", "noscript", "output", "object", "option", "progress", "script",
+    "style", "summary", "tbody", "td", "textarea", "tfoot", "th", "thead", "tr", "video",
+    "center",
+])
+# python-markdown's defaults plus "|", which the tables extension adds.
+ESCAPED_CHARS = frozenset("\\`*_{}[]()>#+-.!|")
+TOC_MARKER = "[TOC]"
+
+
+def _is_block_level(tag: str) -> bool:
+    return tag.lower().rstrip("/") in BLOCK_LEVEL_ELEMENTS
+
+
+class _Element:
+    """Minimal stand-in for an ElementTree element.
+
+    `atomic` marks text that inline rules must leave alone (code, autolinks).
+    """
+
+    __slots__ = ("tag", "attrib", "text", "tail", "children", "atomic")
+
+    def __init__(self, tag: str, text: str | None = None, atomic: bool = False) -> None:
+        self.tag = tag
+        self.attrib: dict[str, str] = {}
+        self.text = text
+        self.tail: str | None = None
+        self.children: list[_Element] = []
+        self.atomic = atomic
+
+    def sub(self, tag: str) -> _Element:
+        el = _Element(tag)
+        self.children.append(el)
+        return el
+
+    def last(self) -> _Element | None:
+        return self.children[-1] if self.children else None
+
+    def iter(self):
+        stack = [self]
+        while stack:
+            el = stack.pop()
+            yield el
+            stack.extend(reversed(el.children))
+
+    def itertext(self):
+        if self.text:
+            yield self.text
+        for child in self.children:
+            yield from child.itertext()
+            if child.tail:
+                yield child.tail
+
+
+def _index(children: list[_Element], el: _Element) -> int:
+    for i, child in enumerate(children):
+        if child is el:
+            return i
+    raise ValueError("element is not a child")
+
+
+# --- serialisation -----------------------------------------------------------
+
+_RE_AMP = re.compile(r"&(?!(?:\#[0-9]+|\#x[0-9a-f]+|[0-9a-z]+);)", re.I)
+
+
+def _escape_cdata(text: str) -> str:
+    if "&" in text:
+        text = _RE_AMP.sub("&amp;", text)
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def _escape_attrib(text: str) -> str:
+    text = _escape_cdata(text)
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    return text
+
+
+def _serialize(el: _Element, out: list[str], tail: bool = True) -> None:
+    tag = el.tag
+    out.append("<" + tag)
+    if el.attrib:
+        for key, value in sorted(el.attrib.items()):
+            out.append(f' {key}="{_escape_attrib(value)}"')
+    if tag in HTML_EMPTY:
+        out.append(" />")
+    else:
+        out.append(">")
+        if el.text:
+            out.append(el.text if tag in ("script", "style") else _escape_cdata(el.text))
+        for child in el.children:
+            _serialize(child, out)
+        out.append(f"</{tag}>")
+    if tail and el.tail:
+        out.append(_escape_cdata(el.tail))
+
+
+def _to_xhtml(el: _Element, tail: bool = True) -> str:
+    out: list[str] = []
+    _serialize(el, out, tail)
+    return "".join(out)
+
+
+def _unescape(text: str) -> str:
+    """Turn backslash escapes (stored as STX<ord>ETX) back into characters."""
+    if STX not in text:
+        return text
+    return _ESCAPED_CHAR_RE.sub(lambda m: chr(int(m.group(1))), text)
+
+
+def _code_escape(text: str) -> str:
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+# --- raw HTML blocks ---------------------------------------------------------
+
+
+def _load_html_parser():
+    # A private copy of html.parser: the tokenizer patterns are patched below the
+    # same way python-markdown patches its copy, without touching the stdlib module.
+    spec = importlib.util.find_spec("html.parser")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.starttagopen = re.compile("<[a-zA-Z]|</>")
+    module.endtagopen = re.compile("</[a-zA-Z]?")
+    module.piclose = re.compile(r"\?>")
+    module.entityref = re.compile(r"&([a-zA-Z][-.a-zA-Z0-9]*);")
+    module.incomplete = module.entityref
+    module.locatestarttagend_tolerant = re.compile(r"""
+      <[a-zA-Z][^`\t\n\r\f />\x00]*
+      (?:[\s/]*
+        (?:(?<=['"\s/])[^`\s/>][^\s/=>]*
+          (?:\s*=+\s*
+            (?:'[^']*'
+              |"[^"]*"
+              |(?!['"])[^`>\s]*
+             )
+             (?:\s*,)*
+           )?(?:\s|/(?!>))*
+         )*
+       )?
+      \s*
+    """, re.VERBOSE)
+    module.locatetagend = re.compile(r"""
+      [a-zA-Z][^`\t\n\r\f />]*
+      [\t\n\r\f /]*
+      (?:(?<=['"\t\n\r\f /])[^`\t\n\r\f />][^\t\n\r\f /=>]*
+        (?:=
+          (?:'[^']*'
+            |"[^"]*"
+            |(?!['"])[^>\t\n\r\f ]*
+           )
+         )?
+        [\t\n\r\f /]*
+       )*
+       >?
+    """, re.VERBOSE)
+    return module
+
+
+_htmlparser = _load_html_parser()
+_COMMENT_CLOSE_RE = re.compile(r"--!?>")
+_BLANK_LINE_RE = re.compile(r"^([ ]*\n){2}")
+_INNER_BLANK_LINE_RE = re.compile(r"\n[ \t]*\n")
+_VOID_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+])
+
+
+class _HtmlBlockExtractor(_htmlparser.HTMLParser):
+    """Replace block-level raw HTML with stash placeholders before block parsing."""
+
+    def __init__(self, store) -> None:
+        self.store = store
+        self.empty_tags = {"hr"}
+        self.lineno_start_cache = [0]
+        self._starttag_text: str | None = None
+        super().__init__(convert_charrefs=False)
+
+    def reset(self) -> None:
+        self.inraw = False
+        self.intail = False
+        self.stack: list[str] = []
+        self.inline_stack: list[str] = []
+        self._cache: list[str] = []
+        self.cleandoc: list[str] = []
+        self.lineno_start_cache = [0]
+        super().reset()
+
+    def close(self) -> None:
+        super().close()
+        if len(self.rawdata):
+            self.handle_data(self.rawdata)
+        if len(self._cache):
+            self.cleandoc.append(self.store("".join(self._cache)))
+            self._cache = []
+
+    @property
+    def line_offset(self) -> int:
+        for ii in range(len(self.lineno_start_cache) - 1, self.lineno - 1):
+            last_line_start_pos = self.lineno_start_cache[ii]
+            lf_pos = self.rawdata.find("\n", last_line_start_pos)
+            if lf_pos == -1:
+                lf_pos = len(self.rawdata)
+            self.lineno_start_cache.append(lf_pos + 1)
+        return self.lineno_start_cache[self.lineno - 1]
+
+    def at_line_start(self) -> bool:
+        if self.offset == 0:
+            return True
+        if self.offset > 3:
+            return False
+        return self.rawdata[self.line_offset:self.line_offset + self.offset].strip() == ""
+
+    def get_endtag_text(self, tag: str) -> str:
+        start = self.line_offset + self.offset
+        m = _htmlparser.endendtag.search(self.rawdata, start)
+        if m:
+            return self.rawdata[start:m.end()]
+        return f"</{tag}>"
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in self.empty_tags:
+            self.handle_startendtag(tag, attrs)
+            return
+        if _is_block_level(tag) and (self.intail or (self.at_line_start() and not self.inraw)):
+            self.inraw = True
+            self.cleandoc.append("\n")
+        text = self.get_starttag_text()
+        if self.inraw:
+            self.stack.append(tag)
+            self._cache.append(text)
+        else:
+            self.cleandoc.append(text)
+            if not _is_block_level(tag) and tag not in _VOID_TAGS:
+                self.inline_stack.append(tag)
+            if tag in self.CDATA_CONTENT_ELEMENTS:
+                self.clear_cdata_mode()
+
+    def handle_endtag(self, tag) -> None:
+        text = self.get_endtag_text(tag)
+        if self.inraw:
+            self._cache.append(text)
+            if tag in self.stack:
+                while self.stack:
+                    if self.stack.pop() == tag:
+                        break
+            if len(self.stack) == 0:
+                if _BLANK_LINE_RE.match(self.rawdata[self.line_offset + self.offset + len(text):]):
+                    self._cache.append("\n")
+                else:
+                    self.intail = True
+                self.inraw = False
+                self.cleandoc.append(self.store("".join(self._cache)))
+                self.cleandoc.append("\n\n")
+                self._cache = []
+        else:
+            self.cleandoc.append(text)
+            if tag in self.inline_stack:
+                while self.inline_stack:
+                    if self.inline_stack.pop() == tag:
+                        break
+
+    def inline_close_follows(self, text: str) -> bool:
+        if not self.inline_stack:
+            return False
+        rest = _INNER_BLANK_LINE_RE.split(self.rawdata[self.line_offset + self.offset + len(text):], 1)[0]
+        return any(re.search(r"</\s*{}\s*>".format(re.escape(tag)), rest, re.I) for tag in self.inline_stack)
+
+    def handle_data(self, data) -> None:
+        if self.intail and "\n" in data:
+            self.intail = False
+        if self.inraw:
+            self._cache.append(data)
+        else:
+            if _INNER_BLANK_LINE_RE.search(data):
+                self.inline_stack = []
+            self.cleandoc.append(data)
+
+    def handle_empty_tag(self, data: str, is_block: bool) -> None:
+        if self.inraw or self.intail:
+            self._cache.append(data)
+        elif self.at_line_start() and is_block:
+            if _BLANK_LINE_RE.match(self.rawdata[self.line_offset + self.offset + len(data):]):
+                data += "\n"
+            else:
+                self.intail = True
+            item = self.cleandoc[-1] if self.cleandoc else ""
+            if not item.endswith("\n\n") and item.endswith("\n"):
+                self.cleandoc.append("\n")
+            self.cleandoc.append(self.store(data))
+            self.cleandoc.append("\n\n")
+        else:
+            self.cleandoc.append(data)
+
+    def handle_startendtag(self, tag, attrs) -> None:
+        self.handle_empty_tag(self.get_starttag_text(), is_block=_is_block_level(tag))
+
+    def handle_charref(self, name) -> None:
+        self.handle_empty_tag(f"&#{name};", is_block=False)
+
+    def handle_entityref(self, name) -> None:
+        self.handle_empty_tag(f"&{name};", is_block=False)
+
+    def handle_comment(self, data) -> None:
+        text = f"<!--{data}-->"
+        is_block = bool(_INNER_BLANK_LINE_RE.search(data)) or not self.inline_close_follows(text)
+        self.handle_empty_tag(text, is_block=is_block)
+
+    def handle_decl(self, data) -> None:
+        self.handle_empty_tag(f"<!{data}>", is_block=True)
+
+    def handle_pi(self, data) -> None:
+        self.handle_empty_tag(f"<?{data}?>", is_block=True)
+
+    def unknown_decl(self, data) -> None:
+        end = "]]>" if data.startswith("CDATA[") else "]>"
+        self.handle_empty_tag(f"<![{data}{end}", is_block=True)
+
+    def parse_pi(self, i: int) -> int:
+        if self.at_line_start() or self.intail:
+            return super().parse_pi(i)
+        self.handle_data("<?")
+        return i + 2
+
+    def parse_comment(self, i: int, report: bool = True) -> int:
+        rawdata = self.rawdata
+        match = _COMMENT_CLOSE_RE.search(rawdata, i + 4)
+        if not match:
+            self.handle_data("<")
+            return i + 1
+        if report:
+            self.handle_comment(rawdata[i + 4:match.start()])
+        return match.end()
+
+    def parse_html_declaration(self, i: int) -> int:
+        if self.at_line_start() or self.intail:
+            if self.rawdata[i:i + 3] == "<![" and not self.rawdata[i:i + 9] == "<![CDATA[":
+                result = self.parse_bogus_comment(i)
+                if result == -1:
+                    self.handle_data(self.rawdata[i:i + 1])
+                    return i + 1
+                return result
+            return super().parse_html_declaration(i)
+        self.handle_data("<!")
+        return i + 2
+
+    def parse_bogus_comment(self, i: int, report: int = 0) -> int:
+        pos = super().parse_bogus_comment(i, report)
+        if pos == -1:
+            return -1
+        self.handle_empty_tag(self.rawdata[i:pos], is_block=False)
+        return pos
+
+    def get_starttag_text(self) -> str | None:
+        return self._starttag_text
+
+    def parse_endtag(self, i: int) -> int:
+        start = self.rawdata[i:i + 3]
+        c = ord(start[-1])
+        is_data = len(start) < 3 or not (65 <= c <= 90 or 97 <= c <= 122)
+        pos = super().parse_endtag(i) if not is_data else -1
+        if pos == -1:
+            self.handle_data(self.rawdata[i:i + 2])
+            return i + 2
+        return pos
+
+    def parse_starttag(self, i: int) -> int:
+        rawdata = self.rawdata
+        if rawdata[i:i + 3] == "</>":
+            self.handle_data(rawdata[i:i + 3])
+            return i + 3
+        self._starttag_text = None
+        endpos = self.check_for_whole_start_tag(i)
+        if endpos < 0:
+            self.handle_data(rawdata[i:i + 1])
+            return i + 1
+        self._starttag_text = rawdata[i:endpos]
+        attrs = []
+        match = _htmlparser.tagfind_tolerant.match(rawdata, i + 1)
+        k = match.end()
+        self.lasttag = tag = match.group(1).lower()
+        while k < endpos:
+            m = _htmlparser.attrfind_tolerant.match(rawdata, k)
+            if not m:
+                break
+            attrname, rest, attrvalue = m.group(1, 2, 3)
+            if not rest:
+                attrvalue = None
+            elif attrvalue[:1] == "'" == attrvalue[-1:] or attrvalue[:1] == '"' == attrvalue[-1:]:
+                attrvalue = attrvalue[1:-1]
+            if attrvalue:
+                attrvalue = _htmlparser.unescape(attrvalue)
+            attrs.append((attrname.lower(), attrvalue))
+            k = m.end()
+        end = rawdata[k:endpos].strip()
+        if end not in (">", "/>"):
+            self.handle_data(rawdata[i:endpos])
+            return endpos
+        if end.endswith("/>"):
+            self.handle_startendtag(tag, attrs)
+        else:
+            if tag in self.CDATA_CONTENT_ELEMENTS:
+                self.set_cdata_mode(tag)
+            self.handle_starttag(tag, attrs)
+        return endpos
+
+
+# --- preprocessors -------------------------------------------------------------
+
+_SPACE_ONLY_LINE_RE = re.compile(r"(?<=\n) +\n")
+_FENCED_BLOCK_RE = re.compile(
+    r"""
+    (?P<fence>^(?:~{3,}|`{3,}))[ ]*
+    ((\{(?P<attrs>[^\n]*)\})|
+    (\.?(?P<lang>[\w#.+-]*)[ ]*)?
+    (hl_lines=(?P<quot>"|')(?P<hl_lines>.*?)(?P=quot)[ ]*)?)
+    \n
+    (?P<code>.*?)(?<=\n)
+    (?P=fence)[ ]*$
+    """,
+    re.MULTILINE | re.DOTALL | re.VERBOSE,
+)
+
+
+def _normalize(source: str) -> str:
+    source = source.replace(STX, "").replace(ETX, "")
+    source = source.replace("\r\n", "\n").replace("\r", "\n") + "\n\n"
+    source = source.expandtabs(TAB_LENGTH)
+    return _SPACE_ONLY_LINE_RE.sub("\n", source)
+
+
+def _fence_attrs(attrs: str) -> tuple[str, list[str]]:
+    # `{.lang #id}` fences; key=value options only configure syntax highlighting.
+    fence_id, classes = "", []
+    for token in attrs.split():
+        if token.startswith("."):
+            classes.append(token[1:])
+        elif token.startswith("#"):
+            fence_id = token[1:]
+    return fence_id, classes
+
+
+# --- emphasis --------------------------------------------------------------------
+
+_PUNCT: str | None = None
+
+
+def _punct_class() -> str:
+    """Regex class body for Unicode punctuation and symbols (categories P* and S*)."""
+    global _PUNCT
+    if _PUNCT is None:
+        category = unicodedata.category
+        ranges: list[str] = []
+        start = prev = -1
+        # Planes 2 and above hold no punctuation or symbols.
+        for code in range(0x20000):
+            if category(chr(code))[0] in "PS":
+                if start < 0:
+                    start = code
+                prev = code
+            elif start >= 0:
+                ranges.append(f"\\U{start:08x}" if start == prev else f"\\U{start:08x}-\\U{prev:08x}")
+                start = -1
+        _PUNCT = "".join(ranges)
+    return _PUNCT
+
+
+class _Delimiter:
+    def __init__(self, token: str, smart: bool) -> None:
+        self.token = token
+        self.tags = ("strong", "em")
+        self.stack: deque[tuple[int, int, bool, int]] = deque()
+        self.boundary = _boundary_re(token, smart)
+        self.bad = re.compile(re.escape(token) + "+")
+
+    def reset(self) -> None:
+        self.stack.clear()
+
+
+def _boundary_re(token: str, smart: bool) -> re.Pattern[str]:
+    punct = _punct_class()
+    etoken = re.escape(token)
+    stx, etx = STX, ETX
+    if smart:
+        xstart = rf"(?<![\w{etoken}])"
+        xend = rf"(?![\w{etoken}])"
+    else:
+        xstart = xend = ""
+    return re.compile(
+        rf"""(?x)
+        (?P<ambiguous>
+            (?<!^)(?<![\s{etoken}{punct}]){xstart}{etoken}{{1,}}{xend}(?![\s{etoken}{punct}])(?!$)|
+            (?<!^)(?<=[{punct}{etx}])(?<!{etoken}){etoken}{{1,}}(?!{etoken})(?=[{punct}{stx}])(?!$)
+        )|
+        (?P<end>
+            (?<!^)(?<![\s{etoken}{punct}]){etoken}{{1,}}{xend}|
+            (?<=[{punct}])(?<!{etoken}){etoken}{{1,}}(?!{etoken})(?=[\s{stx}{punct}]|$)
+        )|
+        (?P<start>
+            {xstart}{etoken}{{1,}}(?![\s{etoken}{punct}])(?!$)|
+            (?:(?<=[\s{etx}{punct}])|^)(?<!{etoken}){etoken}{{1,}}(?!{etoken})(?=[{punct}])
+        )
+        """,
+        flags=re.UNICODE,
+    )
+
+
+_EMPHASIS_TOKEN_RE = re.compile(r"[*_]")
+
+
+class _Emphasis:
+    """`*`/`_` emphasis and strong emphasis, resolved with a delimiter stack.
+
+    A match resolves every emphasis region in the text at once; later matches
+    in the same text are served from `regions`.
+    """
+
+    def __init__(self) -> None:
+        self.delimiters = {"*": _Delimiter("*", smart=False), "_": _Delimiter("_", smart=True)}
+        self.regions: list[tuple[int, int, int, int, tuple[str, str], int]] = []
+        self.stack: list[tuple[int, int, bool, int]] = []
+        self.cache_index = 0
+        self.cache_pos = 0
+
+    def reset(self) -> None:
+        for d in self.delimiters.values():
+            d.reset()
+        self.regions.clear()
+        self.stack.clear()
+        self.cache_index = 0
+        self.cache_pos = 0
+
+    def _build_element(self, data: str, start: int = 0, offset: int = 0) -> tuple[_Element, int]:
+        regions = self.regions
+        el = last = previous = None
+        outer: list[_Element] = []
+        outer_r: list = []
+        end = len(regions)
+        idx = 0
+        for idx, i in enumerate(range(start, end), 1):
+            r = regions[i]
+            if idx and r[0] >= regions[start][3]:
+                idx -= 1
+                break
+            el1 = _Element(r[4][0] if r[-1] == 2 else r[4][1])
+            if idx > 1:
+                if last.text is None:
+                    if previous[2] < r[0]:
+                        last.text = data[previous[1] + offset:previous[2] + offset]
+                    else:
+                        last.text = data[previous[1] + offset:r[0] + offset]
+                if last is not outer[-1] and last.tail is None:
+                    if r[0] < outer_r[-1][3]:
+                        last.tail = data[previous[3] + offset:r[0] + offset]
+                    else:
+                        last.tail = data[previous[3] + offset:outer_r[-1][2] + offset]
+                        outer[-1].tail = data[outer_r[-1][3] + offset:r[0] + offset]
+            if el is None:
+                el = el1
+                last = el
+                outer.append(el)
+                outer_r.append(r)
+            else:
+                while len(outer_r) > 1 and r[3] > outer_r[-1][3]:
+                    outer.pop()
+                    outer_r.pop()
+                outer[-1].children.append(el1)
+                if i + 1 < end and r[3] > regions[i + 1][3]:
+                    outer.append(el1)
+                    outer_r.append(r)
+                last = el1
+            previous = r
+        while outer:
+            if last.text is None:
+                last.text = data[previous[1] + offset:previous[2] + offset]
+            if last.tail is None and last is not outer[-1]:
+                last.tail = data[previous[3] + offset:outer_r[-1][2] + offset]
+            last = outer.pop()
+            previous = outer_r.pop()
+        return el, idx
+
+    def _increment_next_position(self, start: int, count: int) -> None:
+        self.cache_index += count
+        if self.cache_index < len(self.regions):
+            self.cache_pos = self.regions[self.cache_index][0]
+            while self.stack:
+                entry = self.stack.pop(0)
+                if start < entry[0] <= self.cache_pos:
+                    self.cache_pos = entry[0]
+                    break
+        else:
+            self.reset()
+
+    def _cached_result(self, pos: int, data: str) -> tuple[_Element, int, int]:
+        regions = self.regions
+        offset = pos - self.cache_pos if pos != self.cache_pos else pos - regions[self.cache_index][0]
+        start, end = regions[self.cache_index][0], regions[self.cache_index][3]
+        el, count = self._build_element(data, self.cache_index, offset)
+        self._increment_next_position(start, count)
+        return el, start + offset, end + offset
+
+    def _get_match(self, data: str, start: int):
+        for d in self.delimiters.values():
+            m = d.boundary.match(data, start)
+            if m is not None:
+                return m
+        return None
+
+    def _search(self, data: str, start: int):
+        for candidate in _EMPHASIS_TOKEN_RE.finditer(data, start):
+            i = candidate.start()
+            d = self.delimiters[data[i]]
+            m = d.boundary.match(data, i)
+            if m is not None:
+                if not d.stack and m.lastgroup[0] == "e":
+                    continue
+                return m
+        return None
+
+    def _add_region(self, delim: _Delimiter, a: int, b: int, c: int, d: int, size: int) -> None:
+        self.regions.append((a, b, c, d, delim.tags, size))
+        for other in self.delimiters.values():
+            while other.stack:
+                p = other.stack[-1][0]
+                if max(p, a) <= min(p, d - 1):
+                    other.stack.pop()
+                    continue
+                break
+
+    def _others_open(self, delim: _Delimiter) -> bool:
+        return any(d.stack for d in self.delimiters.values() if d is not delim)
+
+    def handle(self, m: re.Match[str], data: str):
+        if self.regions:
+            return self._cached_result(m.start(0), data)
+        m2 = self._get_match(data, m.start(0))
+        if m2 is None or m2.lastgroup[0] == "e":
+            if m2 is None:
+                m2 = self.delimiters[m.group(0)].bad.match(data, m.start(0))
+            return None, m2.start(0), m2.end(0)
+        delim = self.delimiters[data[m.start(0)]]
+        stack = delim.stack
+        start = m2.start(0)
+        end = m2.end(0)
+        length = end - start
+        stack.append((start, start + length, m2.lastgroup[0] != "s", length))
+        while any(d.stack for d in self.delimiters.values()):
+            m2 = self._search(data, end)
+            if m2 is None:
+                break
+            delim = self.delimiters[data[m2.start(0)]]
+            stack = delim.stack
+            start = m2.start(0)
+            end = m2.end(0)
+            current = len(m2.group(0))
+            is_start = m2.lastgroup[0] != "e"
+            is_end = not is_start or m2.lastgroup[0] != "s"
+            is_ambiguous = is_start and is_end
+            last = stack[-1][-1] if stack else 0
+            if stack and is_end and ((not is_ambiguous and current > last) or current == last or current >= 3):
+                is_start = False
+                original = current
+                while stack and current and last <= current:
+                    delimiter = stack.pop()
+                    size = min(delimiter[-1], 1 if delimiter[-1] == 3 else 2)
+                    self._add_region(delim, delimiter[1] - size, delimiter[1], start, start + size, size)
+                    start += size
+                    current -= size
+                    if size < delimiter[-1]:
+                        stack.append((delimiter[0], delimiter[1] - size, delimiter[2], delimiter[-1] - size))
+                    if not stack:
+                        if self._others_open(delim):
+                            delim.reset()
+                            continue
+                        is_end = False
+                        break
+                    last = stack[-1][-1]
+                if original >= 3 and current and is_ambiguous:
+                    delim.stack.append((m2.start(0) + (original - current), end, False, current))
+                    is_end = False
+                else:
+                    is_end = current and stack and last > current
+            if stack and is_end and (last >= 3 or not is_ambiguous) and last > current:
+                delimiter = stack.pop()
+                while stack and delimiter[-1] != 3 and delimiter[2]:
+                    delimiter = stack.pop()
+                    last = delimiter[-1]
+                if delimiter[2] and delimiter[-1] != 3:
+                    if self._others_open(delim):
+                        delim.reset()
+                        continue
+                    break
+                is_start = False
+                ds, de = delimiter[:2]
+                while current:
+                    size = min(current, 1 if current == 3 else 2)
+                    self._add_region(delim, ds + last - size, de, start, start + size, size)
+                    start += size
+                    current -= size
+                    last -= size
+                    de -= size
+                if last:
+                    stack.append((ds, de, False, last))
+            if is_start:
+                stack.append((start, end, is_ambiguous, current))
+        for d in self.delimiters.values():
+            self.stack.extend(d.stack)
+        self.stack.sort(key=lambda x: x[0])
+        if self.regions:
+            self.regions.sort(key=lambda x: x[0])
+            start, end = self.regions[0][0], self.regions[0][3]
+            el, count = self._build_element(data)
+            self._increment_next_position(start, count)
+            return el, start, end
+        start = m.start(0)
+        end = self.stack[-1][1] if self.stack else m.end(0)
+        self.reset()
+        return None, start, end
+
+
+# --- inline patterns ---------------------------------------------------------------
+
+_INLINE_FLAGS = re.DOTALL | re.UNICODE
+_BACKTICK_RE = re.compile(r"(?:(?<!\\)((?:\\{2})+)(?=`+)|(?<!\\)`)", _INLINE_FLAGS)
+_ESCAPE_RE = re.compile(r"\\(.)", _INLINE_FLAGS)
+_LINK_RE = re.compile(r"(?<!\!)\[", _INLINE_FLAGS)
+_IMAGE_LINK_RE = re.compile(r"\!\[", _INLINE_FLAGS)
+_AUTOLINK_RE = re.compile(r"<((?:[Ff]|[Hh][Tt])[Tt][Pp][Ss]?://[^<>]*)>", _INLINE_FLAGS)
+_AUTOMAIL_RE = re.compile(r"<([^<> !]+@[^@<> ]+)>", _INLINE_FLAGS)
+_LINE_BREAK_RE = re.compile(r"  \n", _INLINE_FLAGS)
+_HTML_RE = re.compile(
+    r"""(<(\/?+[a-zA-Z][^\s"'<>@]*+(?:\s+[^\s"'=<>]++(?:\s*+=\s*+(?:"[^"]*+"|'[^']*+'|[^\s"'=<>]++))?+)*+\s*+/?|"""
+    r"!--(?:(?!<!--|-->).)*--|"
+    r"[?](?:(?!<[?]|[?]>).)*[?]|"
+    r"!\[CDATA\[(?:(?!<!\[CDATA\[|\]\]>).)*\]\]"
+    ")>)",
+    _INLINE_FLAGS,
+)
+_ENTITY_RE = re.compile(r"(&(?:\#[0-9]+|\#x[0-9a-fA-F]+|[a-zA-Z0-9]+);)", _INLINE_FLAGS)
+_EMPHASIS_RE = re.compile(r"\*|_", _INLINE_FLAGS)
+_LINK_TARGET_RE = re.compile(r"""\(\s*(?:(<[^<>]*>)\s*(?:('[^']*'|"[^"]*")\s*)?\))?""", _INLINE_FLAGS)
+_REFERENCE_ID_RE = re.compile(r"\s?\[([^\]]*)\]", _INLINE_FLAGS)
+_WHITESPACE_RE = re.compile(r"\s+", re.MULTILINE)
+_TITLE_CLEAN_RE = re.compile(r"\s")
+_ESCAPED_BACKSLASH = f"{STX}{ord(chr(92))}{ETX}"
+
+
+def _dequote(string: str) -> str:
+    if (string.startswith('"') and string.endswith('"')) or (string.startswith("'") and string.endswith("'")):
+        return string[1:-1]
+    return string
+
+
+def _link_text(data: str, index: int) -> tuple[str, int, bool]:
+    bracket_count = 1
+    text = []
+    for pos in range(index, len(data)):
+        c = data[pos]
+        if c == "]":
+            bracket_count -= 1
+        elif c == "[":
+            bracket_count += 1
+        index += 1
+        if bracket_count == 0:
+            break
+        text.append(c)
+    return "".join(text), index, bracket_count == 0
+
+
+def _find_code_span(start: int, text: str) -> tuple[int, int] | None:
+    last = len(text)
+    max_ticks = 0
+    while start < last and text[start] == "`":
+        max_ticks += 1
+        start += 1
+    if not max_ticks:
+        return None
+    longest_span = 0
+    end = 0
+    i = start
+    while i < last:
+        span_length = 0
+        while i < last and text[i] == "`":
+            span_length += 1
+            i += 1
+        if not span_length:
+            i += 1
+            continue
+        if max_ticks == span_length:
+            return start, i - span_length
+        if span_length > longest_span:
+            longest_span = span_length
+            end = i
+    if longest_span:
+        return start - (max_ticks - longest_span), end - longest_span
+    return None
+
+
+# --- block patterns --------------------------------------------------------------
+
+_INDENT = " " * TAB_LENGTH
+_LIST_INDENT_RE = re.compile(r"^(([ ]{%d})+)" % TAB_LENGTH)
+_QUOTE_RE = re.compile(r"(^|\n)[ ]{0,3}>[ ]?(.*)")
+_OLIST_RE = re.compile(r"^[ ]{0,%d}\d+\.[ ]+(.*)" % (TAB_LENGTH - 1))
+_ULIST_RE = re.compile(r"^[ ]{0,%d}[*+-][ ]+(.*)" % (TAB_LENGTH - 1))
+_LIST_CHILD_RE = re.compile(r"^[ ]{0,%d}((\d+\.)|[*+-])[ ]+(.*)" % (TAB_LENGTH - 1))
+_LIST_ITEM_INDENT_RE = re.compile(r"^[ ]{%d,%d}((\d+\.)|[*+-])[ ]+.*" % (TAB_LENGTH, TAB_LENGTH * 2 - 1))
+_HASH_HEADER_RE = re.compile(r"(?:^|\n)(?P<level>#{1,6})(?P<header>(?:\\.|[^\\])*?)#*(?:\n|$)")
+_SETEXT_HEADER_RE = re.compile(r"^.*?\n(?:=+|-+)[ ]*(\n|$)", re.MULTILINE)
+_HR_RE = re.compile(
+    r"^[ ]{0,3}(?=(?P<atomicgroup>(-+[ ]{0,2}){3,}|(_+[ ]{0,2}){3,}|(\*+[ ]{0,2}){3,}))(?P=atomicgroup)[ ]*$",
+    re.MULTILINE,
+)
+_REFERENCE_RE = re.compile(
+    r"""^[ ]{0,3}\[([^\[\]]*)\]:[ ]*(?:\n[ ]*)?([^\s]+)[ ]*(?:\n[ ]*)?((["'])(.*)\4[ ]*|\((.*)\)[ ]*)?$""",
+    re.MULTILINE,
+)
+_TABLE_CODE_PIPES_RE = re.compile(r"(?:(\\\\)|(\\`+)|(`+)|(\\\|)|(\|))")
+_TABLE_END_BORDER_RE = re.compile(r"(?<!\\)(?:\\\\)*\|$")
+_PIPE_LEFT = 1
+_PIPE_RIGHT = 2
+
+# --- tree passes ---------------------------------------------------------------------
+
+_HEADER_RE = re.compile("[Hh][123456]")
+_HEADER_ID_COUNT_RE = re.compile(r"^(.*)_([0-9]+)$")
+_BLOCK_TAG_RE = re.compile(r"^\</?([^ >]+)")
+
+
+def _slugify(value: str, separator: str = "-") -> str:
+    value = unicodedata.normalize("NFKD", value)
+    value = value.encode("ascii", "ignore").decode("ascii")
+    value = re.sub(r"[^\w\s-]", "", value).strip().lower()
+    return re.sub(r"[{}\s]+".format(separator), separator, value)
+
+
+def _unique_id(value: str, ids: set[str]) -> str:
+    while value in ids or not value:
+        m = _HEADER_ID_COUNT_RE.match(value)
+        if m:
+            value = "%s_%d" % (m.group(1), int(m.group(2)) + 1)
+        else:
+            value = "%s_%d" % (value, 1)
+    ids.add(value)
+    return value
+
+
+def _strip_tags(text: str) -> str:
+    while (start := text.find("<!--")) != -1 and (end := text.find("-->", start)) != -1:
+        text = f"{text[:start]}{text[end + 3:]}"
+    while (start := text.find("<")) != -1 and (end := text.find(">", start)) != -1:
+        text = f"{text[:start]}{text[end + 1:]}"
+    return " ".join(text.split())
+
+
+def _prettify(el: _Element) -> None:
+    if _is_block_level(el.tag) and el.tag not in ("code", "pre"):
+        if (not el.text or not el.text.strip()) and el.children and _is_block_level(el.children[0].tag):
+            el.text = "\n"
+        for child in el.children:
+            if _is_block_level(child.tag):
+                _prettify(child)
+    if not el.tail or not el.tail.strip():
+        el.tail = "\n"
+
+
+def _prettify_tree(root: _Element) -> None:
+    _prettify(root)
+    for el in root.iter():
+        if el.tag == "br":
+            if not el.tail or not el.tail.strip():
+                el.tail = "\n"
+            else:
+                el.tail = "\n%s" % el.tail
+        elif el.tag == "pre" and el.children and el.children[0].tag == "code":
+            code = el.children[0]
+            if not code.children and code.text is not None:
+                code.text = code.text.rstrip() + "\n"
+                code.atomic = True
+
+
+def _unescape_tree(root: _Element) -> None:
+    for el in root.iter():
+        if el.text and el.tag != "code":
+            el.text = _unescape(el.text)
+        if el.tail:
+            el.tail = _unescape(el.tail)
+        for key, value in el.attrib.items():
+            el.attrib[key] = _unescape(value)
+
+
+def _nest_toc_tokens(toc_list: list[dict]) -> list[dict]:
+    ordered_list: list[dict] = []
+    if toc_list:
+        last = toc_list.pop(0)
+        last["children"] = []
+        levels = [last["level"]]
+        ordered_list.append(last)
+        parents: list[dict] = []
+        while toc_list:
+            t = toc_list.pop(0)
+            current_level = t["level"]
+            t["children"] = []
+            if current_level < levels[-1]:
+                levels.pop()
+                to_pop = 0
+                for p in reversed(parents):
+                    if current_level <= p["level"]:
+                        to_pop += 1
+                    else:
+                        break
+                if to_pop:
+                    levels = levels[:-to_pop]
+                    parents = parents[:-to_pop]
+                levels.append(current_level)
+            if current_level == levels[-1]:
+                (parents[-1]["children"] if parents else ordered_list).append(t)
+            else:
+                last["children"].append(t)
+                parents.append(last)
+                levels.append(current_level)
+            last = t
+    return ordered_list
+
+
+def _toc_div(toc_list: list[dict]) -> _Element:
+    div = _Element("div")
+    div.attrib["class"] = "toc"
+
+    def build_ul(items: list[dict], parent: _Element) -> None:
+        ul = parent.sub("ul")
+        for item in items:
+            li = ul.sub("li")
+            link = li.sub("a")
+            link.text = item["name"]
+            link.attrib["href"] = "#" + item["id"]
+            if item["children"]:
+                build_ul(item["children"], li)
+
+    build_ul(toc_list, div)
+    _prettify_tree(div)
+    return div
+
+
+def _replace_toc_marker(node: _Element, div: _Element) -> None:
+    for i, child in enumerate(node.children):
+        if _HEADER_RE.match(child.tag) or child.tag in ("pre", "code"):
+            continue
+        if not child.children and child.text and child.text.strip() == TOC_MARKER:
+            node.children[i] = div
+        else:
+            _replace_toc_marker(child, div)
+
+
+class _Document:
+    """Conversion state for one document (the html stash, references, parser state)."""
+
+    def __init__(self) -> None:
+        self.html_blocks: list[str] = []
+        self.references: dict[str, tuple[str, str | None]] = {}
+        self.state: list[str] = []
+        self.stashed_nodes: dict[str, _Element | str] = {}
+        self.emphasis: _Emphasis | None = None
+        self.table_border = 0
+        self.table_separator: list[str] = []
+        self.hr_match: re.Match[str] | None = None
+        self.block_processors = (
+            (self.test_empty, self.run_empty),
+            (self.test_list_indent, self.run_list_indent),
+            (self.test_code, self.run_code),
+            (self.test_table, self.run_table),
+            (self.test_hash_header, self.run_hash_header),
+            (self.test_setext_header, self.run_setext_header),
+            (self.test_hr, self.run_hr),
+            (self.test_olist, self.run_olist),
+            (self.test_ulist, self.run_ulist),
+            (self.test_quote, self.run_quote),
+            (self.test_any, self.run_reference),
+            (self.test_any, self.run_paragraph),
+        )
+
+    def convert(self, source: str) -> str:
+        text = self.stash_html_blocks(self.stash_fenced_code(_normalize(source)))
+        root = _Element("div")
+        self.parse_chunk(root, text)
+        self.run_inline(root)
+        _prettify_tree(root)
+        self.run_toc(root)
+        _unescape_tree(root)
+        out: list[str] = []
+        if root.text:
+            out.append(_escape_cdata(root.text))
+        for child in root.children:
+            _serialize(child, out)
+        return self.postprocess("".join(out).strip()).strip()
+
+    # stash
+
+    def store_html(self, raw: str) -> str:
+        self.html_blocks.append(raw)
+        return _HTML_PLACEHOLDER % (len(self.html_blocks) - 1)
+
+    def stash_fenced_code(self, text: str) -> str:
+        index = 0
+        while True:
+            m = _FENCED_BLOCK_RE.search(text, index)
+            if not m:
+                return text
+            fence_id, classes, lang = "", [], None
+            if m.group("attrs"):
+                fence_id, classes = _fence_attrs(m.group("attrs"))
+                if classes:
+                    lang = classes.pop(0)
+            elif m.group("lang"):
+                lang = m.group("lang")
+            id_attr = f' id="{html.escape(fence_id)}"' if fence_id else ""
+            class_attr = f' class="{html.escape(" ".join(classes))}"' if classes else ""
+            lang_attr = f' class="language-{html.escape(lang)}"' if lang else ""
+            code = html.escape(m.group("code"), quote=False).replace('"', "&quot;")
+            placeholder = self.store_html(f"<pre{id_attr}{class_attr}><code{lang_attr}>{code}</code></pre>")
+            text = f"{text[:m.start()]}\n{placeholder}\n{text[m.end():]}"
+            index = m.start() + 1 + len(placeholder)
+
+    def stash_html_blocks(self, text: str) -> str:
+        parser = _HtmlBlockExtractor(self.store_html)
+        parser.feed(text)
+        parser.close()
+        return "".join(parser.cleandoc)
+
+    def postprocess(self, text: str) -> str:
+        if self.html_blocks:
+            count = len(self.html_blocks)
+
+            def substitute(m: re.Match[str]) -> str:
+                key = m.group(1)
+                wrapped = bool(key)
+                if not wrapped:
+                    key = m.group(2)
+                if int(key) >= count:
+                    return m.group(0)
+                raw = self.html_blocks[int(key)]
+                if not wrapped or _is_raw_block_level(raw):
+                    return _HTML_PLACEHOLDER_SUB_RE.sub(substitute, raw)
+                return _HTML_PLACEHOLDER_SUB_RE.sub(substitute, f"<p>{raw}</p>")
+
+            text = _HTML_PLACEHOLDER_SUB_RE.sub(substitute, text)
+        return text.replace(_AMP_SUBSTITUTE, "&")
+
+    # block parser
+
+    def parse_chunk(self, parent: _Element, text: str) -> None:
+        self.parse_blocks(parent, text.split("\n\n"))
+
+    def parse_blocks(self, parent: _Element, blocks: list[str]) -> None:
+        processors = self.block_processors
+        while blocks:
+            for test, run in processors:
+                if test(parent, blocks[0]):
+                    if run(parent, blocks) is not False:
+                        break
+
+    def in_state(self, state: str) -> bool:
+        return bool(self.state) and self.state[-1] == state
+
+    @staticmethod
+    def detab(text: str) -> tuple[str, str]:
+        newtext = []
+        lines = text.split("\n")
+        for line in lines:
+            if line.startswith(_INDENT):
+                newtext.append(line[TAB_LENGTH:])
+            elif not line.strip():
+                newtext.append("")
+            else:
+                break
+        return "\n".join(newtext), "\n".join(lines[len(newtext):])
+
+    @staticmethod
+    def loose_detab(text: str, level: int = 1) -> str:
+        lines = text.split("\n")
+        width = TAB_LENGTH * level
+        prefix = " " * width
+        for i in range(len(lines)):
+            if lines[i].startswith(prefix):
+                lines[i] = lines[i][width:]
+        return "\n".join(lines)
+
+    @staticmethod
+    def test_any(parent: _Element, block: str) -> bool:
+        return True
+
+    @staticmethod
+    def test_empty(parent: _Element, block: str) -> bool:
+        return not block or block.startswith("\n")
+
+    def run_empty(self, parent: _Element, blocks: list[str]) -> None:
+        block = blocks.pop(0)
+        filler = "\n\n"
+        if block:
+            filler = "\n"
+            rest = block[1:]
+            if rest:
+                blocks.insert(0, rest)
+        sibling = parent.last()
+        if sibling is not None and sibling.tag == "pre" and sibling.children and sibling.children[0].tag == "code":
+            code = sibling.children[0]
+            code.text = f"{code.text}{filler}"
+
+    def test_list_indent(self, parent: _Element, block: str) -> bool:
+        return (
+            block.startswith(_INDENT)
+            and not self.in_state("detabbed")
+            and (parent.tag == "li" or (bool(parent.children) and parent.children[-1].tag in ("ul", "ol")))
+        )
+
+    def run_list_indent(self, parent: _Element, blocks: list[str]) -> None:
+        block = blocks.pop(0)
+        level, sibling = self.list_level(parent, block)
+        block = self.loose_detab(block, level)
+        self.state.append("detabbed")
+        if parent.tag == "li":
+            if parent.children and parent.children[-1].tag in ("ul", "ol"):
+                self.parse_blocks(parent.children[-1], [block])
+            else:
+                self.parse_blocks(parent, [block])
+        elif sibling.tag == "li":
+            self.parse_blocks(sibling, [block])
+        elif sibling.children and sibling.children[-1].tag == "li":
+            item = sibling.children[-1]
+            if item.text:
+                p = _Element("p", item.text)
+                item.text = ""
+                item.children.insert(0, p)
+            self.parse_chunk(item, block)
+        else:
+            li = sibling.sub("li")
+            self.parse_blocks(li, [block])
+        self.state.pop()
+
+    def list_level(self, parent: _Element, block: str) -> tuple[int, _Element]:
+        m = _LIST_INDENT_RE.match(block)
+        indent_level = len(m.group(1)) / TAB_LENGTH if m else 0
+        level = 1 if self.in_state("list") else 0
+        while indent_level > level:
+            child = parent.last()
+            if child is not None and child.tag in ("ul", "ol", "li"):
+                if child.tag in ("ul", "ol"):
+                    level += 1
+                parent = child
+            else:
+                break
+        return level, parent
+
+    @staticmethod
+    def test_code(parent: _Element, block: str) -> bool:
+        return block.startswith(_INDENT)
+
+    def run_code(self, parent: _Element, blocks: list[str]) -> None:
+        sibling = parent.last()
+        block = blocks.pop(0)
+        if sibling is not None and sibling.tag == "pre" and sibling.children and sibling.children[0].tag == "code":
+            code = sibling.children[0]
+            block, rest = self.detab(block)
+            code.text = "{}\n{}\n".format(code.text, _code_escape(block.rstrip()))
+        else:
+            pre = parent.sub("pre")
+            block, rest = self.detab(block)
+            pre.children.append(_Element("code", "%s\n" % _code_escape(block.rstrip()), atomic=True))
+        if rest:
+            blocks.insert(0, rest)
+
+    def test_table(self, parent: _Element, block: str) -> bool:
+        is_table = False
+        rows = [row.strip(" ") for row in block.split("\n")]
+        if len(rows) > 1:
+            header0 = rows[0]
+            self.table_border = 0
+            if header0.startswith("|"):
+                self.table_border |= _PIPE_LEFT
+            if _TABLE_END_BORDER_RE.search(header0) is not None:
+                self.table_border |= _PIPE_RIGHT
+            row = self.split_table_row(header0)
+            row0_len = len(row)
+            is_table = row0_len > 1
+            if not is_table and row0_len == 1 and self.table_border:
+                for index in range(1, len(rows)):
+                    is_table = rows[index].startswith("|")
+                    if not is_table:
+                        is_table = _TABLE_END_BORDER_RE.search(rows[index]) is not None
+                    if not is_table:
+                        break
+            if is_table:
+                row = self.split_table_row(rows[1])
+                is_table = len(row) == row0_len and set("".join(row)) <= set("|:- ")
+                if is_table:
+                    self.table_separator = row
+        return is_table
+
+    def run_table(self, parent: _Element, blocks: list[str]) -> None:
+        block = blocks.pop(0).split("\n")
+        header = block[0].strip(" ")
+        rows = [] if len(block) < 3 else block[2:]
+        align: list[str | None] = []
+        for c in self.table_separator:
+            c = c.strip(" ")
+            if c.startswith(":") and c.endswith(":"):
+                align.append("center")
+            elif c.startswith(":"):
+                align.append("left")
+            elif c.endswith(":"):
+                align.append("right")
+            else:
+                align.append(None)
+        table = parent.sub("table")
+        self.build_table_row(header, table.sub("thead"), align)
+        tbody = table.sub("tbody")
+        if not rows:
+            tr = tbody.sub("tr")
+            for _ in align:
+                tr.sub("td")
+        else:
+            for row in rows:
+                self.build_table_row(row.strip(" "), tbody, align)
+
+    def build_table_row(self, row: str, parent: _Element, align: list[str | None]) -> None:
+        tr = parent.sub("tr")
+        tag = "th" if parent.tag == "thead" else "td"
+        cells = self.split_table_row(row)
+        for i, a in enumerate(align):
+            c = tr.sub(tag)
+            c.text = cells[i].strip(" ") if i < len(cells) else ""
+            if a:
+                c.attrib["style"] = f"text-align: {a};"
+
+    def split_table_row(self, row: str) -> list[str]:
+        if self.table_border:
+            if row.startswith("|"):
+                row = row[1:]
+            row = _TABLE_END_BORDER_RE.sub("", row)
+        if "`" not in row and "\\" not in row:
+            return row.split("|")
+        return _split_code_pipes(row)
+
+    @staticmethod
+    def test_hash_header(parent: _Element, block: str) -> bool:
+        return "#" in block and bool(_HASH_HEADER_RE.search(block))
+
+    def run_hash_header(self, parent: _Element, blocks: list[str]) -> None:
+        block = blocks.pop(0)
+        m = _HASH_HEADER_RE.search(block)
+        before = block[:m.start()]
+        after = block[m.end():]
+        if before:
+            self.parse_blocks(parent, [before])
+        h = parent.sub("h%d" % len(m.group("level")))
+        h.text = m.group("header").strip()
+        if after:
+            if self.in_state("looselist"):
+                after = self.loose_detab(after)
+            blocks.insert(0, after)
+
+    @staticmethod
+    def test_setext_header(parent: _Element, block: str) -> bool:
+        return bool(_SETEXT_HEADER_RE.match(block))
+
+    def run_setext_header(self, parent: _Element, blocks: list[str]) -> None:
+        lines = blocks.pop(0).split("\n")
+        level = 1 if lines[1].startswith("=") else 2
+        h = parent.sub("h%d" % level)
+        h.text = lines[0].strip()
+        if len(lines) > 2:
+            blocks.insert(0, "\n".join(lines[2:]))
+
+    def test_hr(self, parent: _Element, block: str) -> bool:
+        m = _HR_RE.search(block)
+        if m:
+            self.hr_match = m
+            return True
+        return False
+
+    def run_hr(self, parent: _Element, blocks: list[str]) -> None:
+        block = blocks.pop(0)
+        match = self.hr_match
+        prelines = block[:match.start()].rstrip("\n")
+        if prelines:
+            self.parse_blocks(parent, [prelines])
+        parent.sub("hr")
+        postlines = block[match.end():].lstrip("\n")
+        if postlines:
+            blocks.insert(0, postlines)
+
+    @staticmethod
+    def test_olist(parent: _Element, block: str) -> bool:
+        return bool(_OLIST_RE.match(block))
+
+    def run_olist(self, parent: _Element, blocks: list[str]) -> None:
+        self.run_list(parent, blocks, "ol")
+
+    @staticmethod
+    def test_ulist(parent: _Element, block: str) -> bool:
+        return bool(_ULIST_RE.match(block))
+
+    def run_ulist(self, parent: _Element, blocks: list[str]) -> None:
+        self.run_list(parent, blocks, "ul")
+
+    def run_list(self, parent: _Element, blocks: list[str], tag: str) -> None:
+        items = self.list_items(blocks.pop(0))
+        sibling = parent.last()
+        if sibling is not None and sibling.tag in ("ol", "ul"):
+            lst = sibling
+            item = lst.children[-1]
+            if item.text:
+                p = _Element("p", item.text)
+                item.text = ""
+                item.children.insert(0, p)
+            lch = item.last()
+            if lch is not None and lch.tail:
+                item.sub("p").text = lch.tail.lstrip()
+                lch.tail = ""
+            li = lst.sub("li")
+            self.state.append("looselist")
+            self.parse_blocks(li, [items.pop(0)])
+            self.state.pop()
+        elif parent.tag in ("ol", "ul"):
+            lst = parent
+        else:
+            lst = parent.sub(tag)
+        self.state.append("list")
+        for item in items:
+            if item.startswith(_INDENT):
+                self.parse_blocks(lst.children[-1], [item])
+            else:
+                self.parse_blocks(lst.sub("li"), [item])
+        self.state.pop()
+
+    @staticmethod
+    def list_items(block: str) -> list[str]:
+        items: list[str] = []
+        for line in block.split("\n"):
+            m = _LIST_CHILD_RE.match(line)
+            if m:
+                items.append(m.group(3))
+            elif _LIST_ITEM_INDENT_RE.match(line):
+                if items[-1].startswith(_INDENT):
+                    items[-1] = "{}\n{}".format(items[-1], line)
+                else:
+                    items.append(line)
+            else:
+                items[-1] = "{}\n{}".format(items[-1], line)
+        return items
+
+    @staticmethod
+    def test_quote(parent: _Element, block: str) -> bool:
+        return ">" in block and bool(_QUOTE_RE.search(block))
+
+    def run_quote(self, parent: _Element, blocks: list[str]) -> None:
+        block = blocks.pop(0)
+        m = _QUOTE_RE.search(block)
+        if m:
+            self.parse_blocks(parent, [block[:m.start()]])
+            block = "\n".join(_clean_quote_line(line) for line in block[m.start():].split("\n"))
+        sibling = parent.last()
+        if sibling is not None and sibling.tag == "blockquote":
+            quote = sibling
+        else:
+            quote = parent.sub("blockquote")
+        self.state.append("blockquote")
+        self.parse_chunk(quote, block)
+        self.state.pop()
+
+    def run_reference(self, parent: _Element, blocks: list[str]) -> bool:
+        block = blocks.pop(0)
+        m = _REFERENCE_RE.search(block) if "]:" in block else None
+        if m:
+            ref_id = m.group(1).strip().lower()
+            link = m.group(2).lstrip("<").rstrip(">")
+            title = m.group(5) or m.group(6)
+            self.references[ref_id] = (link, title)
+            if block[m.end():].strip():
+                blocks.insert(0, block[m.end():].lstrip("\n"))
+            if block[:m.start()].strip():
+                blocks.insert(0, block[:m.start()].rstrip("\n"))
+            return True
+        blocks.insert(0, block)
+        return False
+
+    def run_paragraph(self, parent: _Element, blocks: list[str]) -> None:
+        block = blocks.pop(0)
+        if not block.strip():
+            return
+        if self.in_state("list"):
+            sibling = parent.last()
+            if sibling is not None:
+                if sibling.tail:
+                    sibling.tail = "{}\n{}".format(sibling.tail, block)
+                else:
+                    sibling.tail = "\n%s" % block
+            elif parent.text:
+                parent.text = "{}\n{}".format(parent.text, block)
+            else:
+                parent.text = block.lstrip()
+        else:
+            parent.sub("p").text = block.lstrip()
+
+    # inline
+
+    def inline_patterns(self):
+        """(trigger substrings, pattern, handler) in python-markdown's order.
+
+        Reference patterns can only produce output when the page defines link
+        references, so they are left out otherwise.
+        """
+        if self.emphasis is None:
+            self.emphasis = _Emphasis()
+        refs = bool(self.references)
+        patterns = [
+            (("`",), _BACKTICK_RE, self.handle_backtick),
+            (("\\",), _ESCAPE_RE, self.handle_escape),
+            (("[",), _LINK_RE, self.handle_reference) if refs else None,
+            (("[",), _LINK_RE, self.handle_link),
+            (("![",), _IMAGE_LINK_RE, self.handle_image),
+            (("![",), _IMAGE_LINK_RE, self.handle_image_reference) if refs else None,
+            (("[",), _LINK_RE, self.handle_short_reference) if refs else None,
+            (("![",), _IMAGE_LINK_RE, self.handle_short_image_reference) if refs else None,
+            (("<",), _AUTOLINK_RE, self.handle_autolink),
+            (("<",), _AUTOMAIL_RE, self.handle_automail),
+            (("  \n",), _LINE_BREAK_RE, self.handle_line_break),
+            (("<",), _HTML_RE, self.handle_html),
+            (("&",), _ENTITY_RE, self.handle_html),
+            (("*", "_"), _EMPHASIS_RE, self.emphasis.handle),
+        ]
+        return [p for p in patterns if p is not None]
+
+    def run_inline(self, tree: _Element) -> None:
+        self.patterns = self.inline_patterns()
+        self.stashed_nodes = {}
+        stack = [tree]
+        while stack:
+            current = stack.pop(0)
+            insert_queue = []
+            # Tail results are inserted while iterating, and are visited too.
+            for child in current.children:
+                if child.text and not child.atomic:
+                    text = child.text
+                    child.text = None
+                    lst = self.process_placeholders(self.handle_inline(text), child)
+                    stack += lst
+                    insert_queue.append((child, lst))
+                if child.tail:
+                    tail = self.handle_inline(child.tail)
+                    dummy = _Element("d")
+                    child.tail = None
+                    tail_result = self.process_placeholders(tail, dummy, False)
+                    if dummy.tail:
+                        child.tail = dummy.tail
+                    pos = _index(current.children, child) + 1
+                    for new_child in reversed(tail_result):
+                        current.children.insert(pos, new_child)
+                if child.children:
+                    stack.append(child)
+            for element, lst in insert_queue:
+                element.children[0:0] = lst
+
+    def stash_node(self, node: _Element | str) -> str:
+        key = "%04d" % len(self.stashed_nodes)
+        self.stashed_nodes[key] = node
+        return _INLINE_PLACEHOLDER % key
+
+    def handle_inline(self, data: str, index: int = 0, atomic: bool = False) -> str:
+        if atomic:
+            return data
+        patterns = self.patterns
+        count = len(patterns)
+        start = 0
+        while index < count:
+            triggers, pattern, handler = patterns[index]
+            for trigger in triggers:
+                if trigger in data:
+                    break
+            else:
+                index += 1
+                start = 0
+                continue
+            match = None
+            for match in pattern.finditer(data, start):
+                node, mstart, mend = handler(match, data)
+                if mstart is None or mend is None:
+                    match = None
+                    continue
+                break
+            if match is None:
+                index += 1
+                start = 0
+                continue
+            if node is None:
+                start = mend
+                continue
+            if not isinstance(node, str) and not node.atomic:
+                for child in [node] + node.children:
+                    if child.text:
+                        child.text = self.handle_inline(child.text, index + 1, child.atomic)
+                    if child.tail:
+                        child.tail = self.handle_inline(child.tail, index)
+            placeholder = self.stash_node(node)
+            data = f"{data[:mstart]}{placeholder}{data[mend:]}"
+            start = mstart + len(placeholder)
+        return data
+
+    def process_element_text(self, node: _Element, subnode: _Element, is_text: bool = True) -> None:
+        if is_text:
+            text, atomic = subnode.text, subnode.atomic
+            subnode.text = None
+        else:
+            text, atomic = subnode.tail, False
+            subnode.tail = None
+        child_result = self.process_placeholders(text, subnode, is_text, atomic)
+        if not is_text and node is not subnode:
+            pos = _index(node.children, subnode) + 1
+        else:
+            pos = 0
+        for new_child in reversed(child_result):
+            node.children.insert(pos, new_child)
+
+    def process_placeholders(
+        self, data: str | None, parent: _Element, is_text: bool = True, atomic: bool = False
+    ) -> list[_Element]:
+        result: list[_Element] = []
+
+        def link_text(text: str | None, text_atomic: bool = False) -> None:
+            if not text:
+                return
+            if result:
+                target = result[-1]
+                target.tail = target.tail + text if target.tail else text
+            elif not is_text:
+                parent.tail = parent.tail + text if parent.tail else text
+            elif parent.text:
+                parent.text += text
+                parent.atomic = False
+            else:
+                parent.text = text
+                parent.atomic = text_atomic
+
+        start = 0
+        while data:
+            index = data.find(_INLINE_PLACEHOLDER_PREFIX, start)
+            if index == -1:
+                link_text(data[start:], atomic)
+                break
+            m = _INLINE_PLACEHOLDER_RE.search(data, index)
+            key, end = (m.group(1), m.end()) if m else (None, index + 1)
+            node = self.stashed_nodes.get(key)
+            if node is None:
+                end = index + len(_INLINE_PLACEHOLDER_PREFIX)
+                link_text(data[start:end])
+                start = end
+                continue
+            if index > 0:
+                link_text(data[start:index])
+            if isinstance(node, str):
+                link_text(node)
+                start = end
+                continue
+            for child in [node] + node.children:
+                if child.tail and child.tail.strip():
+                    self.process_element_text(node, child, False)
+                if child.text and child.text.strip():
+                    self.process_element_text(child, child)
+            start = end
+            result.append(node)
+        return result
+
+    def stash_text(self, text: str) -> str:
+        """Replace inline placeholders with the plain text of what they stand for."""
+
+        def get_stash(m: re.Match[str]) -> str:
+            value = self.stashed_nodes.get(m.group(1))
+            if value is None:
+                return ""
+            if isinstance(value, str):
+                return value
+            return "".join(value.itertext())
+
+        return _INLINE_PLACEHOLDER_RE.sub(get_stash, text)
+
+    def stash_html(self, text: str) -> str:
+        def get_stash(m: re.Match[str]) -> str:
+            value = self.stashed_nodes.get(m.group(1))
+            if value is None:
+                return ""
+            if isinstance(value, str):
+                return "\\%s" % value
+            return self.stash_html(_to_xhtml(value))
+
+        return _INLINE_PLACEHOLDER_RE.sub(get_stash, text)
+
+    def handle_backtick(self, m: re.Match[str], data: str):
+        if m.group(1):
+            return m.group(1).replace("\\\\", _ESCAPED_BACKSLASH), m.start(0), m.end(0)
+        begin = m.start(0)
+        result = _find_code_span(begin, data)
+        if result is not None:
+            start, end = result
+            el = _Element("code", _code_escape(data[start:end].strip()), atomic=True)
+            return el, begin, end + (start - begin)
+        return None, None, None
+
+    @staticmethod
+    def handle_escape(m: re.Match[str], data: str):
+        char = m.group(1)
+        if char in ESCAPED_CHARS:
+            return f"{STX}{ord(char)}{ETX}", m.start(0), m.end(0)
+        return None, m.start(0), m.end(0)
+
+    def handle_link(self, m: re.Match[str], data: str):
+        text, index, handled = _link_text(data, m.end(0))
+        if not handled:
+            return None, None, None
+        href, title, index, handled = self.link_target(data, index)
+        if not handled:
+            return None, None, None
+        el = _Element("a", text)
+        el.attrib["href"] = href
+        if title is not None:
+            el.attrib["title"] = title
+        return el, m.start(0), index
+
+    def handle_image(self, m: re.Match[str], data: str):
+        text, index, handled = _link_text(data, m.end(0))
+        if not handled:
+            return None, None, None
+        src, title, index, handled = self.link_target(data, index)
+        if not handled:
+            return None, None, None
+        el = _Element("img")
+        el.attrib["src"] = src
+        if title is not None:
+            el.attrib["title"] = title
+        el.attrib["alt"] = self.stash_text(text)
+        return el, m.start(0), index
+
+    def link_target(self, data: str, index: int) -> tuple[str, str | None, int, bool]:
+        href = ""
+        title: str | None = None
+        handled = False
+        m = _LINK_TARGET_RE.match(data, pos=index)
+        if m and m.group(1):
+            href = m.group(1)[1:-1].strip()
+            if m.group(2):
+                title = m.group(2)[1:-1]
+            index = m.end(0)
+            handled = True
+        elif m:
+            bracket_count = 1
+            backtrack_count = 1
+            start_index = m.end()
+            index = start_index
+            last_bracket = -1
+            quote = None
+            start_quote = -1
+            exit_quote = -1
+            ignore_matches = False
+            alt_quote = None
+            start_alt_quote = -1
+            exit_alt_quote = -1
+            last = ""
+            for pos in range(index, len(data)):
+                c = data[pos]
+                if c == "(":
+                    if not ignore_matches:
+                        bracket_count += 1
+                    elif backtrack_count > 0:
+                        backtrack_count -= 1
+                elif c == ")":
+                    if (exit_quote != -1 and quote == last) or (exit_alt_quote != -1 and alt_quote == last):
+                        bracket_count = 0
+                    elif not ignore_matches:
+                        bracket_count -= 1
+                    elif backtrack_count > 0:
+                        backtrack_count -= 1
+                        if backtrack_count == 0:
+                            last_bracket = index + 1
+                elif c in ("'", '"'):
+                    if not quote:
+                        ignore_matches = True
+                        backtrack_count = bracket_count
+                        bracket_count = 1
+                        start_quote = index + 1
+                        quote = c
+                    elif c != quote and not alt_quote:
+                        start_alt_quote = index + 1
+                        alt_quote = c
+                    elif c == quote:
+                        exit_quote = index + 1
+                    elif alt_quote and c == alt_quote:
+                        exit_alt_quote = index + 1
+                index += 1
+                if bracket_count == 0:
+                    if exit_quote >= 0 and quote == last:
+                        href = data[start_index:start_quote - 1]
+                        title = data[start_quote:exit_quote - 1]
+                    elif exit_alt_quote >= 0 and alt_quote == last:
+                        href = data[start_index:start_alt_quote - 1]
+                        title = data[start_alt_quote:exit_alt_quote - 1]
+                    else:
+                        href = data[start_index:index - 1]
+                    break
+                if c != " ":
+                    last = c
+            if bracket_count != 0 and backtrack_count == 0:
+                href = data[start_index:last_bracket - 1]
+                index = last_bracket
+                bracket_count = 0
+            handled = bracket_count == 0
+        if title is not None:
+            title = _TITLE_CLEAN_RE.sub(" ", _dequote(self.stash_text(title.strip())))
+        href = self.stash_text(href).strip()
+        return href, title, index, handled
+
+    def handle_reference(self, m: re.Match[str], data: str, image: bool = False, short: bool = False):
+        text, index, handled = _link_text(data, m.end(0))
+        if not handled:
+            return None, None, None
+        if short:
+            ref_id, end = text.lower(), index
+        else:
+            ref = _REFERENCE_ID_RE.match(data, pos=index)
+            if not ref:
+                return None, None, None
+            ref_id, end = ref.group(1).lower(), ref.end(0)
+            if not ref_id:
+                ref_id = text.lower()
+        ref_id = _WHITESPACE_RE.sub(" ", ref_id)
+        if ref_id not in self.references:
+            return None, m.start(0), end
+        href, title = self.references[ref_id]
+        if image:
+            el = _Element("img")
+            el.attrib["src"] = href
+            if title:
+                el.attrib["title"] = title
+            el.attrib["alt"] = self.stash_text(text)
+        else:
+            el = _Element("a", text)
+            el.attrib["href"] = href
+            if title:
+                el.attrib["title"] = title
+        return el, m.start(0), end
+
+    def handle_image_reference(self, m: re.Match[str], data: str):
+        return self.handle_reference(m, data, image=True)
+
+    def handle_short_reference(self, m: re.Match[str], data: str):
+        return self.handle_reference(m, data, short=True)
+
+    def handle_short_image_reference(self, m: re.Match[str], data: str):
+        return self.handle_reference(m, data, image=True, short=True)
+
+    def handle_autolink(self, m: re.Match[str], data: str):
+        el = _Element("a", m.group(1), atomic=True)
+        el.attrib["href"] = self.stash_text(m.group(1))
+        return el, m.start(0), m.end(0)
+
+    def handle_automail(self, m: re.Match[str], data: str):
+        email = self.stash_text(m.group(1))
+        if email.startswith("mailto:"):
+            email = email[len("mailto:"):]
+        letters = []
+        for letter in email:
+            entity = html.entities.codepoint2name.get(ord(letter))
+            letters.append(f"{_AMP_SUBSTITUTE}{entity};" if entity else "%s#%d;" % (_AMP_SUBSTITUTE, ord(letter)))
+        el = _Element("a", "".join(letters), atomic=True)
+        el.attrib["href"] = "".join(_AMP_SUBSTITUTE + "#%d;" % ord(letter) for letter in "mailto:" + email)
+        return el, m.start(0), m.end(0)
+
+    @staticmethod
+    def handle_line_break(m: re.Match[str], data: str):
+        return _Element("br"), m.start(0), m.end(0)
+
+    def handle_html(self, m: re.Match[str], data: str):
+        raw = _unescape(self.stash_html(m.group(1)))
+        return self.store_html(raw), m.start(0), m.end(0)
+
+    # toc
+
+    def run_toc(self, root: _Element) -> None:
+        used_ids = {el.attrib["id"] for el in root.iter() if "id" in el.attrib}
+        tokens = []
+        for el in root.iter():
+            if _HEADER_RE.match(el.tag):
+                inner = _unescape(_to_xhtml(el, tail=False))
+                inner = self.postprocess(inner[inner.index(">") + 1:inner.rindex("<")].strip()).strip()
+                name = _strip_tags(inner)
+                if "id" not in el.attrib:
+                    el.attrib["id"] = _unique_id(_slugify(html.unescape(name)), used_ids)
+                tokens.append({"level": int(el.tag[-1]), "id": _unescape(el.attrib["id"]), "name": name})
+        if any(TOC_MARKER in (el.text or "") for el in root.iter()):
+            _replace_toc_marker(root, _toc_div(_nest_toc_tokens(tokens)))
+
+
+def _split_code_pipes(row: str) -> list[str]:
+    """Split a table row on `|`, ignoring escaped pipes and pipes inside code spans."""
+    elements = []
+    pipes = []
+    tics = []
+    tic_points = []
+    tic_region = []
+    good_pipes = []
+    for m in _TABLE_CODE_PIPES_RE.finditer(row):
+        if m.group(2):
+            tics.append(len(m.group(2)) - 1)
+            tic_points.append((m.start(2), m.end(2) - 1, 1))
+        elif m.group(3):
+            tics.append(len(m.group(3)))
+            tic_points.append((m.start(3), m.end(3) - 1, 0))
+        elif m.group(5):
+            pipes.append(m.start(5))
+    pos = 0
+    tic_len = len(tics)
+    while pos < tic_len:
+        try:
+            tic_size = tics[pos] - tic_points[pos][2]
+            if tic_size == 0:
+                raise ValueError
+            index = tics[pos + 1:].index(tic_size) + 1
+            tic_region.append((tic_points[pos][0], tic_points[pos + index][1]))
+            pos += index + 1
+        except ValueError:
+            pos += 1
+    for pipe in pipes:
+        throw_out = False
+        for region in tic_region:
+            if pipe < region[0]:
+                break
+            if region[0] <= pipe <= region[1]:
+                throw_out = True
+                break
+        if not throw_out:
+            good_pipes.append(pipe)
+    pos = 0
+    for pipe in good_pipes:
+        elements.append(row[pos:pipe])
+        pos = pipe + 1
+    elements.append(row[pos:])
+    return elements
+
+
+def _clean_quote_line(line: str) -> str:
+    m = _QUOTE_RE.match(line)
+    if line.strip() == ">":
+        return ""
+    if m:
+        return m.group(2)
+    return line
+
+
+def _is_raw_block_level(raw: str) -> bool:
+    m = _BLOCK_TAG_RE.match(raw)
+    if m:
+        if m.group(1)[0] in ("!", "?", "@", "%"):
+            return True
+        return _is_block_level(m.group(1))
+    return False
+
+
+def render(text: str) -> str:
+    """Render Markdown `text` to an HTML fragment."""
+    if not text.strip():
+        return ""
+    return _Document().convert(text)
@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
-"""Rebuild everything: clear media images, then build docs and screenshots."""
+"""Rebuild everything: clear media images, then build screenshots and docs.
+
+With --only/--output-glob/--changed-since only the selected screenshots are
+deleted and recaptured.
+"""
 
 from __future__ import annotations
 
@@ -8,10 +12,12 @@ import subprocess
 import sys
 from pathlib import Path
 
+from shot_selection import add_selection_args, selection_args
+
 UTILS_DIR = Path(__file__).resolve().parent
 DEFAULT_ROOT = UTILS_DIR.parent
 DEFAULT_WEBSITE_ROOT = DEFAULT_ROOT.parent / "pinballctl-website"
-IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", ".svg"}
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".avif", ".gif", ".bmp", ".svg"}
 
 
 def _run(cmd: list[str]) -> None:
@@ -30,9 +36,32 @@ def _clear_media_images(media_dir: Path) -> int:
     return removed
 
 
+def _clear_outputs(root: Path, outputs: list[str]) -> int:
+    removed = 0
+    for name in outputs:
+        path = root / name
+        if path.is_file():
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def _selected_outputs(root: Path, selection: list[str]) -> list[str]:
+    cmd = [
+        sys.executable,
+        str(UTILS_DIR / "build-screenshots.py"),
+        "--root",
+        str(root),
+        "--list-outputs",
+        *selection,
+    ]
+    proc = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return [line for line in proc.stdout.splitlines() if line.strip()]
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
-        description="Delete media images, then run build-docs.py and build-screenshots.py"
+        description="Delete media images, then run build-screenshots.py and build-docs.py"
     )
     parser.add_argument("--root", type=Path, default=DEFAULT_ROOT, help="Docs repo root")
     parser.add_argument(
@@ -49,6 +78,21 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--headed", action="store_true", help="Run screenshot browser headed")
     parser.add_argument("--dry-run", action="store_true", help="Screenshot dry-run")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing screenshots")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Keep media/ and recapture only screenshots whose directive or app build changed",
+    )
+    parser.add_argument("--app-build", default="", metavar="ID", help="App version/build id for screenshots")
+    parser.add_argument(
+        "--replay-har",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Capture screenshots from a recorded HAR fixture instead of the device",
+    )
+    add_selection_args(parser)
     return parser.parse_args()
 
 
@@ -58,8 +102,15 @@ def main() -> None:
     website_root = args.website_root.resolve()
     media_dir = args.media_dir.resolve() if args.media_dir else (root / "media")
 
-    removed = _clear_media_images(media_dir)
-    print(f"Removed {removed} image(s) from {media_dir}")
+    selection = selection_args(args)
+    if args.incremental:
+        print(f"Keeping images in {media_dir} (incremental)")
+    elif selection:
+        removed = _clear_outputs(root, _selected_outputs(root, selection))
+        print(f"Removed {removed} selected screenshot(s)")
+    else:
+        removed = _clear_media_images(media_dir)
+        print(f"Removed {removed} image(s) from {media_dir}")
 
     build_docs = [
         sys.executable,
@@ -90,9 +141,21 @@ def main() -> None:
         build_shots.append("--dry-run")
     if args.overwrite:
         build_shots.append("--overwrite")
-
+    if args.incremental:
+        build_shots.append("--incremental")
+    if args.app_build:
+        build_shots += ["--app-build", args.app_build]
+    if args.replay_har is not None:
+        build_shots += ["--replay-har", args.replay_har] if args.replay_har else ["--replay-har"]
+    build_shots += selection
+
+    try:
+        _run(build_shots)
+    except subprocess.CalledProcessError as exc:
+        # Still publish the docs with the images already on disk, then report the failure.
+        _run(build_docs)
+        raise SystemExit(f"build-screenshots.py failed (exit {exc.returncode}); docs built with existing images")
     _run(build_docs)
-    _run(build_shots)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+"""Screenshot selection flags that build-all.py and rebuild-all.py pass through.
+
+Both wrappers accept --only, --output-glob and --changed-since and forward
+them unchanged to build-screenshots.py, which does the actual selection.
+"""
+from __future__ import annotations
+
+import argparse
+
+
+def add_selection_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--only",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="Only screenshots from this markdown file or directory (repeatable)",
+    )
+    parser.add_argument(
+        "--output-glob",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Only screenshots whose output matches this glob (repeatable)",
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="Only screenshots from markdown files changed since this git ref",
+    )
+
+
+def selection_args(args: argparse.Namespace) -> list[str]:
+    """build-screenshots.py flags that narrow the run to some directives."""
+    out: list[str] = []
+    for path in args.only:
+        out += ["--only", path]
+    for pattern in args.output_glob:
+        out += ["--output-glob", pattern]
+    if args.changed_since:
+        out += ["--changed-since", args.changed_since]
+    return out
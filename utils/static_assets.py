@@ -0,0 +1,122 @@
+"""Fingerprinted and precompressed copies of the docs site's static files.
+
+build-docs.py copies stylesheets, scripts and the search index to
+content-hashed names (`main.<hash>.js`) so a static host can serve them as
+immutable, and writes `.gz`/`.br` siblings of every text artifact at maximum
+compression so it can skip compressing on the fly.
+
+Hashed copies and compressed siblings are derived files: the watcher ignores
+them and stale ones are removed when their source changes.
+
+Brotli is optional (`pip install brotli`): without it only `.gz` is written.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import re
+from pathlib import Path
+
+try:
+    import brotli as _brotli  # type: ignore
+except Exception:
+    _brotli = None
+
+FINGERPRINT_LENGTH = 10
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+COMPRESSED_SUFFIXES = (".gz", ".br")
+_FINGERPRINTED_RE = re.compile(rf"\.[0-9a-f]{{{FINGERPRINT_LENGTH}}}\.[^.]+(?:\.gz|\.br)?$")
+
+
+def brotli_available() -> bool:
+    return _brotli is not None
+
+
+def is_derived(name: str) -> bool:
+    """True for hashed copies and compressed siblings written by this module."""
+    return name.endswith(COMPRESSED_SUFFIXES) or bool(_FINGERPRINTED_RE.search(name))
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def _stale_copies(src: Path) -> list[Path]:
+    pattern = re.compile(
+        rf"^{re.escape(src.stem)}\.[0-9a-f]{{{FINGERPRINT_LENGTH}}}{re.escape(src.suffix)}(?:\.gz|\.br)?$"
+    )
+    return [p for p in src.parent.glob(f"{src.stem}.*") if pattern.match(p.name)]
+
+
+def fingerprint(src: Path) -> Path:
+    """Copy `src` to `<stem>.<hash><suffix>` beside it and return that path.
+
+    The copy is only written when missing, so unchanged files keep their
+    mtime. Hashed copies of earlier versions, and their compressed siblings,
+    are removed.
+    """
+    data = src.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+    out = src.with_name(f"{src.stem}.{digest}{src.suffix}")
+    if not out.exists():
+        _write_atomic(out, data)
+    for stale in _stale_copies(src):
+        if stale != out and stale.name not in {out.name + s for s in COMPRESSED_SUFFIXES}:
+            stale.unlink(missing_ok=True)
+    return out
+
+
+def clear_fingerprints(src: Path) -> None:
+    """Remove every hashed copy of `src` (used when fingerprinting is off)."""
+    for stale in _stale_copies(src):
+        stale.unlink(missing_ok=True)
+
+
+def _decompress(packed: bytes, suffix: str) -> bytes | None:
+    try:
+        return gzip.decompress(packed) if suffix == ".gz" else _brotli.decompress(packed)
+    except Exception:
+        # Truncated or corrupt sibling; it is rewritten.
+        return None
+
+
+def precompress(path: Path) -> dict[str, int]:
+    """Write `.gz` (and `.br` when available) siblings of `path`.
+
+    Siblings that already decompress to the content of `path` are left
+    alone. Their mtimes are not trusted: coarse timestamps or a copied tree
+    can make a stale sibling look newer than its source. Decompressing costs
+    far less than compressing at maximum level. Returns the size of each
+    sibling keyed by suffix; stale `.br` files are removed when Brotli is not
+    installed.
+    """
+    data = path.read_bytes()
+    sizes: dict[str, int] = {}
+    for suffix in COMPRESSED_SUFFIXES:
+        out = path.with_name(path.name + suffix)
+        if suffix == ".br" and _brotli is None:
+            out.unlink(missing_ok=True)
+            continue
+        try:
+            existing = out.read_bytes()
+        except OSError:
+            existing = None
+        if existing is not None and _decompress(existing, suffix) == data:
+            sizes[suffix] = len(existing)
+            continue
+        if suffix == ".gz":
+            # mtime=0 keeps the output byte-identical across rebuilds.
+            packed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+        else:
+            packed = _brotli.compress(data, quality=BROTLI_QUALITY)
+        _write_atomic(out, packed)
+        sizes[suffix] = len(packed)
+    return sizes
+
+
+def clear_compressed(path: Path) -> None:
+    for suffix in COMPRESSED_SUFFIXES:
+        path.with_name(path.name + suffix).unlink(missing_ok=True)